@@ -1,13 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
+import os
+import time
 from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from stable_baselines3 import PPO, DQN
-import numpy as np
 import uuid
+import numpy as np
 from typing import Optional
 
-from boop_env import BoopEnv
+from boop_gate import CURRENT_POINTER
+from game_archive import GameArchive
+from game_registry import build_registry
+from policy_analysis import action_dims, analyze, game_positions
+from session_store import LocalSessions, SessionStore
+from static_assets import mount_static
 
 import logging
 
@@ -20,8 +28,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# === Models ===
+# Every game's env factory, model versions and difficulty levels (see game_registry.py).
+# Workers started by `python api_server.py --workers N` attach to weights the parent
+# exported to SHARED_WEIGHTS_DIR instead of loading their own copies. POLICY_QUANTIZE=float32
+# (or float16, int8) serves PPO policies through quantized_policy's NumPy actor.
+games = build_registry(shared_dir=os.environ.get("SHARED_WEIGHTS_DIR"), quantize=os.environ.get("POLICY_QUANTIZE"))
+
+# === Game archive ===
+# Finished and abandoned games go to SQLite through a background writer (see game_archive.py)
+archive = GameArchive(os.environ.get("GAME_ARCHIVE", "ppo_boop/games.db"))
+SESSION_IDLE_SECONDS = 3600  # games without a move for this long are archived as abandoned
+
+async def expire_sessions_periodically(interval=60):
+    while True:
+        await asyncio.sleep(interval)
+        # Off the event loop: with SessionStore the sweep unpickles every session
+        await asyncio.to_thread(expire_sessions)
+
+def pointer_version(path=CURRENT_POINTER):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+async def reload_on_promotion(interval=5):
+    # boop_gate.py replaces the pointer atomically; load the new model off the event loop,
+    # then swap it in, so games keep being served while it loads
+    seen = pointer_version()
+    while True:
+        await asyncio.sleep(interval)
+        if pointer_version() != seen:
+            seen = pointer_version()
+            await asyncio.to_thread(games["boop"].reload, "current")
+            logger.info("Reloaded current boop model from %s", CURRENT_POINTER)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm up every model before the first request, not on the first AI move
+    for name, spec in games.items():
+        spec.load()
+        logger.info("Loaded %s models: %s", name, ", ".join(spec.models))
+    archive.start()
+    tasks = [asyncio.create_task(expire_sessions_periodically()), asyncio.create_task(reload_on_promotion())]
+    yield
+    for task in tasks:
+        task.cancel()
+    archive.close()
+
 # === FastAPI setup ===
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -32,34 +85,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# === Models ===
-games = {
-    "tictactoe": {'env': None,
-                  'model': "tictactoe_dqn" }, # DQN.load
-    "boop": {'env': BoopEnv,
-             'model': PPO.load("ppo_boop_v0") } # ppo_boop/gen_02/v8
-    }
-
 # === Session store ===
-game_sessions = {}
+# A dict in a single process; with several workers, SQLite so any worker can continue a game
+game_sessions = SessionStore(os.environ["SESSION_DB"]) if os.environ.get("SESSION_DB") else LocalSessions()
 
 # === Init new game ===
 class NewGameRequest(BaseModel):
     players: list[str]
+    version: Optional[str] = None     # model version, see GET /api/games
+    difficulty: Optional[str] = None  # easy, medium or hard
+
+@app.get("/api/games")
+def list_games():
+    return {name: spec.describe() for name, spec in games.items()}
 
 @app.post("/api/games/{game}/new")
 def new_game(game: str, config: NewGameRequest):
     if game not in games:
         raise HTTPException(status_code=404, detail=f"Game '{game}' not supported")
+    try:
+        version, difficulty = games[game].resolve(config.version, config.difficulty)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
 
     game_id = str(uuid.uuid4())
-    env = games[game]['env']()
+    env = games[game].env_factory()
     env.reset()
 
-    # Store player types in the session
+    # Store player types and the AI settings in the session
+    now = time.time()
     game_sessions[game_id] = {
+        "game": game,
         "env": env,
-        "players": config.players
+        "players": config.players,
+        "version": version,
+        "difficulty": difficulty,
+        "moves": [],
+        "move_times": [],  # seconds from the start of the game
+        "started": now,
+        "last_move": now
     }
     
     # Get the initial state
@@ -73,9 +137,59 @@ def new_game(game: str, config: NewGameRequest):
     if config.players[current_player] == "ai":
         status = "AI is thinking..."
         
-    return {"game_id": game_id, "state": state, "status": status}
+    return {"game_id": game_id, "state": state, "status": status, "version": version, "difficulty": difficulty}
 
 # === Game move ===
+def _piece(cell):
+    # Boop cells are planes [p0, p1, cat, stock, stock]; only the first three say what is on it
+    return cell[:3] if isinstance(cell, list) else cell
+
+def board_delta(before, after):
+    # [row, col, piece] for every cell whose piece the move changed, so clients repaint just those
+    return [[r, c, _piece(cell)] for r, (row_before, row_after) in enumerate(zip(before, after))
+            for c, (old, cell) in enumerate(zip(row_before, row_after)) if _piece(old) != _piece(cell)]
+
+def record_move(session, action):
+    session["moves"].append([int(x) for x in action])
+    session["last_move"] = time.time()
+    session["move_times"].append(round(session["last_move"] - session["started"], 3))
+
+def archive_game(game_id, session, outcome, winner=None):
+    # Queue the game for the archive (no disk I/O here)
+    archive.record({
+        "game_id": game_id, "game": session["game"], "version": session["version"],
+        "difficulty": session["difficulty"], "players": session["players"], "moves": session["moves"],
+        "move_times": session["move_times"], "outcome": outcome, "winner": winner,
+        "plies": len(session["moves"]), "started": session["started"], "finished": time.time()
+    })
+
+def finish_game(game_id, session, outcome, winner=None):
+    # Drop the session and archive the game, unless the idle sweep got to it first
+    if not game_sessions.discard(game_id):
+        raise HTTPException(status_code=400, detail="Game expired")
+    archive_game(game_id, session, outcome, winner)
+
+def move_status(env, terminated, truncated):
+    # Status line after a move; the winner is still the player to move when the game ends
+    if truncated:
+        return "Game over! It's a draw."
+    if terminated:
+        return f"Game over! Player {env.current_player_num} wins!"
+    return f"Player {env.current_player_num}'s turn."
+
+def save_session(game_id, session):
+    # Write back after a move (a no-op for the in-process dict), unless the sweep expired it meanwhile
+    if not game_sessions.replace(game_id, session):
+        raise HTTPException(status_code=400, detail="Game expired")
+
+def expire_sessions(max_idle=SESSION_IDLE_SECONDS):
+    cutoff = time.time() - max_idle
+    for game_id, session in list(game_sessions.items()):
+        last_move = session["last_move"]
+        # discard() skips a game that was played after items() read it
+        if last_move < cutoff and game_sessions.discard(game_id, last_move):
+            archive_game(game_id, session, "abandoned")
+
 class MoveRequest(BaseModel):
     game_id: str
     action: Optional[list[int]]
@@ -85,10 +199,10 @@ def make_move(game: str, request: MoveRequest):
     game_id = request.game_id
     action = request.action
 
-    if game_id not in game_sessions:
+    session = game_sessions.get(game_id)
+    if session is None:
         raise HTTPException(status_code=400, detail="Invalid game ID")
 
-    session = game_sessions[game_id]
     env = session["env"]
     players = session["players"]
 
@@ -101,45 +215,35 @@ def make_move(game: str, request: MoveRequest):
                 "game_over": False
             }
 
-        legal = env.legal_actions()
-        obs = env.observation.reshape(1, *env.observation.shape)
-        model = games[game]["model"]
-        ai_action, _ = model.predict(obs, deterministic=True)
-        
-        # Convert numpy array to list of regular Python integers
-        if isinstance(ai_action, np.ndarray):
-            ai_action = [int(x) for x in ai_action[0]]
-        else:
-            ai_action = [int(x) for x in ai_action]
-            
-        ai_action = tuple(ai_action)
-
-        if ai_action not in legal:
-            ai_action = legal[np.random.choice(len(legal))]
+        # Opening book (hard only), then the session's model version and difficulty
+        spec = games[game]
+        ai_action = spec.choose(env, session["version"], session["difficulty"])
 
         # Store board state before AI move
         board_before = env.get_state()["board"]
+        effects = spec.effects(env, ai_action)
         
         obs, reward, terminated, truncated, info = env.step(ai_action)
+        record_move(session, ai_action)
+        if terminated or truncated:
+            finish_game(game_id, session, "draw" if truncated else "win",
+                        None if truncated else env.current_player_num)
+        else:
+            save_session(game_id, session)
 
-        # Convert AI move details to regular Python types
-        action_type, row, col, piece_type = [int(x) for x in ai_action]
-        
         # Get updated state and ensure all numpy values are converted
         state = env.get_state()
         state["players"] = players
 
+        ai_move = dict(zip(spec.move_fields, (int(x) for x in ai_action)))
+        ai_move["board_before"] = board_before
         return {
             "state": state,
-            "status": f"Player {env.current_player_num}'s turn.",
+            "status": move_status(env, terminated, truncated),
             "game_over": terminated or truncated,
-            "ai_move": {
-                "action_type": action_type,
-                "row": row,
-                "col": col,
-                "piece_type": piece_type,
-                "board_before": board_before
-            }
+            "ai_move": ai_move,
+            "delta": board_delta(board_before, state["board"]),
+            "effects": effects
         }
 
     else:
@@ -150,32 +254,106 @@ def make_move(game: str, request: MoveRequest):
                 "game_over": False
             }
 
+        board_before = env.get_state()["board"]
+        effects = games[game].effects(env, action)
         obs, reward, terminated, truncated, info = env.step(action)
+        record_move(session, action)
+        if not (terminated or truncated):
+            save_session(game_id, session)
 
     # When returning state, include player types
     state = env.get_state()
     state["players"] = players
     
     if terminated or truncated:
-        del game_sessions[game_id]
+        finish_game(game_id, session, "draw" if truncated else "win",
+                    None if truncated else env.current_player_num)
         return {
             "state": state,
-            "status": f"Game over! Player {env.current_player_num} wins!",
-            "game_over": True
+            "status": move_status(env, terminated, truncated),
+            "game_over": True,
+            "delta": board_delta(board_before, state["board"]),
+            "effects": effects
         }
 
     return {
         "state": state,
-        "status": f"Player {env.current_player_num}'s turn.",
-        "game_over": False
+        "status": move_status(env, terminated, truncated),
+        "game_over": False,
+        "delta": board_delta(board_before, state["board"]),
+        "effects": effects
+    }
+
+# === Position analysis ===
+class AnalysisRequest(BaseModel):
+    game_id: Optional[str] = None             # the current position of a live game
+    moves: Optional[list[list[int]]] = None   # or every position of a game replayed from the start
+    version: Optional[str] = None             # model version, see GET /api/games
+
+@app.post("/api/games/{game}/analysis")
+def analyze_positions(game: str, request: AnalysisRequest):
+    # Masked move probabilities (indexed like boop_env.action_to_index) and value estimates,
+    # all positions in one forward pass
+    if game not in games:
+        raise HTTPException(status_code=404, detail=f"Game '{game}' not supported")
+    spec = games[game]
+    try:
+        version, _ = spec.resolve(request.version)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    model = spec.analysis_model(version)  # the torch policy even when a quantized actor serves moves
+    if model is None:  # search players, lookup tables and DQN
+        raise HTTPException(status_code=400, detail=f"{game} version '{version}' has no policy to analyze")
+
+    env = spec.env_factory()
+    shape = model.observation_space.shape
+    if request.moves is not None:
+        try:
+            obs, masks, movers = game_positions(env, request.moves, shape)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
+    else:
+        session = game_sessions.get(request.game_id) if request.game_id else None
+        if session is None:
+            raise HTTPException(status_code=400, detail="Send the moves of a game or a live game ID")
+        env = session["env"]
+        obs, masks, movers = env.observation_as(shape)[None], env.legal_action_mask()[None], [env.current_player_num]
+
+    probs, values = analyze(model, obs, masks)
+    return {
+        "version": version,
+        "action_dims": action_dims(env.action_space),
+        "positions": [{"player": player, "value": round(float(value), 4), "policy": np.round(p, 4).tolist()}
+                      for player, value, p in zip(movers, values, probs)]
     }
 
 # === Static file serving ===
-app.mount("/python", StaticFiles(directory="test/python"), name="python")
-app.mount("/css", StaticFiles(directory="test/css"), name="css")
-app.mount("/images", StaticFiles(directory="test/images"), name="images")
-app.mount("/", StaticFiles(directory="test/html", html=True), name="html")
+@app.get("/python/boop_rules.py")
+def rules_module():
+    # The client imports the server's rule module, so both sides always play the same rules
+    return FileResponse(os.path.join(os.path.dirname(os.path.abspath(__file__)), "boop_rules.py"),
+                        media_type="text/x-python")
+
+# dist/ (hashed, precompressed, long-cached) once `python static_assets.py` has built it,
+# otherwise test/ as it is
+mount_static(app)
     
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run("api_server:app", host="0.0.0.0", port=8001, log_level="debug")
+    from shared_weights import export_registry
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--log-level", default="debug")
+    parser.add_argument("--shared-dir", default="ppo_boop/shared")
+    parser.add_argument("--session-db", default="ppo_boop/sessions.db")
+    args = parser.parse_args()
+    if args.workers > 1:
+        # Load every model once here; the workers map the exported weights read-only
+        exported = export_registry(build_registry(), args.shared_dir)
+        logger.info("Exported %d models to %s", len(exported), args.shared_dir)
+        os.environ["SHARED_WEIGHTS_DIR"] = args.shared_dir
+        os.environ["SESSION_DB"] = args.session_db
+    uvicorn.run("api_server:app", host="0.0.0.0", port=args.port, log_level=args.log_level, workers=args.workers)
@@ -0,0 +1,103 @@
+# Opening book for Boop.
+#
+# Every game starts from the same empty board, so the first few plies are shared by all
+# sessions. build_book() searches those positions once, offline, with the strongest
+# player we have and writes a sorted array of (position key, move) pairs. OpeningBook
+# memory-maps that file and answers with a binary search; positions not in the book
+# return None and the caller falls through to the model.
+#
+# Positions are keyed up to the 8 board symmetries (see boop_symmetry), so one entry
+# covers every rotated or mirrored copy of a position.
+#
+#   python boop_book.py 3 opening_book.npy        # expand the first 3 plies
+
+import hashlib
+import os
+
+import numpy as np
+
+from boop_env import BoopEnv, action_to_index, index_to_action
+from boop_symmetry import N_SYMMETRIES, transform_actions, transform_obs
+
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("move", "<u2")])
+
+def _cells(env):
+    # 0 empty, 1/2 player 0 kitten/cat, 3/4 player 1 kitten/cat
+    codes = [0 if piece is None else 1 + 2 * piece.player + piece.is_cat for piece in env.board.flat]
+    return np.array(codes, dtype=np.uint8).reshape(env.grid_shape)
+
+def _inverse(k):
+    # Rotations undo with the opposite rotation; the four mirror images are their own inverse
+    return (4 - k) % 4 if k < 4 else k
+
+def canonical_key(env):
+    """(key, k): 64-bit key of the position's canonical image, and the symmetry k mapping env onto it."""
+    cells = _cells(env)
+    tail = bytes([env.players[0].stock['kitten'], env.players[0].stock['cat'],
+                  env.players[1].stock['kitten'], env.players[1].stock['cat'], env.current_player_num])
+    images = [transform_obs(cells, k, spatial_axes=(0, 1)).tobytes() + tail for k in range(N_SYMMETRIES)]
+    k = min(range(N_SYMMETRIES), key=images.__getitem__)
+    key = int.from_bytes(hashlib.blake2b(images[k], digest_size=8).digest(), "little")
+    return key, k
+
+class OpeningBook:
+    def __init__(self, path):
+        self.entries = np.load(path, mmap_mode="r")
+        self.keys = self.entries["key"]
+
+    @classmethod
+    def load_if_exists(cls, path):
+        return cls(path) if os.path.exists(path) else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, env):
+        """Book move for env's position as an action tuple, or None if the position is not in the book."""
+        key, k = canonical_key(env)
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        move = np.array(index_to_action(int(self.entries["move"][i])))
+        action = tuple(int(x) for x in transform_actions(move, _inverse(k), size=env.rows))
+        return action if env.is_legal(action) else None  # guards against 64-bit key collisions
+
+def build_book(path, plies=3, player=None, verbose=True):
+    """Search every position reachable in the first `plies` plies and write the book to path."""
+    from boop_bots import choose_action
+    if player is None:
+        from boop_search import AlphaBetaPlayer
+        player = AlphaBetaPlayer(time_limit=1.0)
+
+    book = {}
+    frontier = [[]]  # move sequences leading to the positions of the current ply
+    for ply in range(plies):
+        next_frontier = []
+        for moves in frontier:
+            env = BoopEnv()
+            for move in moves:
+                env.step(move)
+            key, k = canonical_key(env)
+            if key in book:
+                continue
+            best = choose_action(player, env, deterministic=True)
+            if not env.is_legal(best):
+                continue
+            book[key] = action_to_index(transform_actions(np.array(best), k, size=env.rows))
+            for action in env.legal_actions():
+                next_frontier.append(moves + [action])
+        if verbose:
+            print(f"ply {ply}: {len(book)} positions in book")
+        frontier = next_frontier
+
+    entries = np.array(sorted(book.items()), dtype=BOOK_DTYPE)
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, entries)
+    os.replace(tmp, path)
+    return len(entries)
+
+if __name__ == "__main__":
+    import sys
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    out = sys.argv[2] if len(sys.argv) > 2 else "opening_book.npy"
+    build_book(out, plies=plies)
@@ -0,0 +1,302 @@
+# Cheap scripted opponents that only ever play legal moves.
+#
+# Bots follow the SB3 predict() signature plus two keywords that SelfPlayBoopEnv (and
+# choose_action below) fill in: action_masks, the BoopEnv.legal_action_mask() of the
+# position, and player, whose turn it is. obs / action_masks may be a single position or a
+# batch (N, 6, 6, 5) / (N, 144) from a vector env; one call then answers every position.
+# Any board size works (the size is read off the observation); scratch arrays are allocated
+# once per board size and reused.
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+import gymnasium as gym
+import numpy as np
+
+from boop_env import ACTION_DIMS
+
+ROWS, COLS = ACTION_DIMS[1], ACTION_DIMS[2]
+CELLS = ROWS * COLS
+DIRECTIONS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0)]
+
+def _line_table(rows, cols):
+    lines = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                cells = [(r + i * dr, c + i * dc) for i in range(3)]
+                if all(0 <= pr < rows and 0 <= pc < cols for pr, pc in cells):
+                    lines.append([pr * cols + pc for pr, pc in cells])
+    return np.array(lines)
+
+def _boop_table(rows, cols):
+    # For every placement cell and direction: the neighbour cell and where it gets pushed to
+    # (-1 when off the board)
+    neighbour = np.full((len(DIRECTIONS), rows * cols), -1)
+    target = np.full((len(DIRECTIONS), rows * cols), -1)
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        for r in range(rows):
+            for c in range(cols):
+                if 0 <= r + dr < rows and 0 <= c + dc < cols:
+                    neighbour[d, r * cols + c] = (r + dr) * cols + c + dc
+                    if 0 <= r + 2 * dr < rows and 0 <= c + 2 * dc < cols:
+                        target[d, r * cols + c] = (r + 2 * dr) * cols + c + 2 * dc
+    return neighbour, target
+
+@lru_cache(maxsize=None)
+def board_tables(rows, cols):
+    """(LINES, NEIGHBOUR, TARGET) for a rows x cols board."""
+    return (_line_table(rows, cols),) + _boop_table(rows, cols)
+
+LINES, NEIGHBOUR, TARGET = board_tables(ROWS, COLS)
+
+def board_from_obs(obs, player, out=None, scratch=None):
+    """Flat int8 board from one (rows, cols, 5) observation: +1/+2 own kitten/cat, -1/-2 opponent's.
+
+    scratch: an optional float (rows, cols) buffer, so that nothing is allocated.
+    """
+    out = np.empty(obs.shape[0] * obs.shape[1], dtype=np.int8) if out is None else out
+    scratch = np.empty(obs.shape[:2]) if scratch is None else scratch
+    board = out.reshape(obs.shape[:2])
+    np.subtract(obs[..., player], obs[..., 1 - player], out=scratch)
+    np.add(obs[..., 2], 1, out=board, casting="unsafe")  # 2 on cats, 1 elsewhere
+    np.multiply(scratch, board, out=board, casting="unsafe")
+    return out
+
+class ScriptedOpponent(ABC):
+    observation_space = gym.spaces.Box(low=0, high=1, shape=(ROWS, COLS, 5), dtype=np.float32)
+    uses_action_masks = True
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self._resize(ROWS, COLS)
+
+    def _resize(self, rows, cols):
+        # Called when a position on a different board size comes in
+        dims = (2, rows, cols, 2)
+        self.dims = dims
+        size = int(np.prod(dims))
+        self._noise = np.empty(size)
+        self._illegal = np.empty(size, dtype=bool)
+        self._cells = np.empty((rows, cols))
+        self._unravel = np.stack(np.unravel_index(np.arange(size), dims), axis=-1)
+        self._env_mask = np.zeros(size, dtype=bool)  # filled by choose_action
+        self._guessed = np.zeros((1, size), dtype=bool)
+        self._choices = np.empty(1, dtype=np.int64)
+
+    def _reserve(self, n):
+        # Per-position buffers grow to the largest batch seen and are reused after that
+        if len(self._choices) < n:
+            self._guessed = np.zeros((n, self._guessed.shape[1]), dtype=bool)
+            self._choices = np.empty(n, dtype=np.int64)
+
+    def mask_buffer(self, rows, cols):
+        """Scratch buffer for the legal-move mask of a rows x cols position (see choose_action)."""
+        if self.dims[1:3] != (rows, cols):
+            self._resize(rows, cols)
+        return self._env_mask
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=False, action_masks=None, player=1):
+        obs = np.asarray(obs)
+        batched = obs.ndim == 4
+        obs_batch = obs if batched else obs[None]
+        if obs_batch.shape[1:3] != self.dims[1:3]:
+            self._resize(*obs_batch.shape[1:3])
+        n = len(obs_batch)
+        self._reserve(n)
+        if action_masks is None:
+            masks = self._guessed[:n]
+            for o, m in zip(obs_batch, masks):
+                self._guess_mask(o, m)
+        else:
+            masks = np.asarray(action_masks, dtype=bool).reshape(n, -1)
+        players = np.broadcast_to(player, n)
+        for i in range(n):
+            self._choices[i] = self.choose(obs_batch[i], masks[i], int(players[i]), deterministic)
+        # The result is the only per-call allocation: the caller keeps it, so it cannot be a scratch buffer
+        actions = self._unravel[self._choices[:n]]
+        return (actions if batched else actions[0]), None
+
+    def _guess_mask(self, obs, out):
+        # Without a mask all we know is which cells are empty; assume kittens are in stock
+        out[:] = False
+        np.add(obs[..., 0], obs[..., 1], out=self._cells)
+        np.equal(self._cells, 0, out=out.reshape(self.dims)[0, :, :, 0])
+        return out
+
+    def _random_legal(self, mask):
+        self.rng.random(out=self._noise)
+        np.logical_not(mask, out=self._illegal)
+        np.copyto(self._noise, -1.0, where=self._illegal)
+        return int(self._noise.argmax())
+
+    @abstractmethod
+    def choose(self, obs, mask, player, deterministic):
+        """Flat index of the move to play in one (rows, cols, 5) position with legal-move mask."""
+
+class UniformLegalOpponent(ScriptedOpponent):
+    """Uniformly random legal move."""
+
+    def choose(self, obs, mask, player, deterministic):
+        return self._random_legal(mask)
+
+class GreedyOpponent(ScriptedOpponent):
+    """One-ply lookahead: wins first, then promotions, then booping opponent pieces off the board."""
+
+    WIN, PROMOTION, BOOP_OFF, SELF_BOOP_OFF, GRADUATE = 1000.0, 100.0, 10.0, -10.0, 5.0
+
+    def _resize(self, rows, cols):
+        super()._resize(rows, cols)
+        cells = rows * cols
+        self.lines, self.neighbour, self.target = board_tables(rows, cols)
+        self._board = np.empty(cells, dtype=np.int8)
+        self._after = np.empty((2, cells, cells), dtype=np.int8)  # [piece_type, placement cell, board cell]
+        self._scores = np.empty((2, rows, cols, 2))
+        self._rows = np.arange(cells)
+        # Per direction, flat indices into one (cells, cells) slice of _after: the neighbour of
+        # each placement cell and the cell it is pushed to (clamped to 0 where there is none)
+        offsets = self._rows[None] * cells
+        self._has_n = self.neighbour >= 0
+        self._has_t = self.target >= 0
+        self._off_edge = self._has_n & ~self._has_t
+        self._n_flat = offsets + np.where(self._has_n, self.neighbour, 0)
+        self._t_flat = offsets + np.where(self._has_t, self.target, 0)
+        # Scratch for simulate() and the line counts
+        self._sim = np.empty((2, cells))
+        self._moved = np.empty(cells, dtype=np.int8)
+        self._landing = np.empty(cells, dtype=np.int8)
+        self._gain = np.empty(cells)
+        self._boopable = np.empty(cells, dtype=bool)
+        self._off = np.empty(cells, dtype=bool)
+        self._slide = np.empty(cells, dtype=bool)
+        self._negative = np.empty(cells, dtype=bool)
+        self._count = np.empty(cells)
+        self._lines = np.empty((cells, len(self.lines), 3), dtype=np.int8)
+        self._hits = np.empty((cells, len(self.lines), 3), dtype=bool)
+        self._full = np.empty((cells, len(self.lines)), dtype=bool)
+        self._found = np.empty((cells, len(self.lines)), dtype=bool)
+        self._line_count = np.empty((cells, len(self.lines)), dtype=np.int8)
+
+    def _gather_lines(self, b):
+        np.take(b, self.lines, axis=1, out=self._lines)
+        return self._lines
+
+    def _count_lines(self, lines, test, value):
+        """Per placement cell, how many lines have all three cells test(cell, value) (into self._count)."""
+        test(lines, value, out=self._hits)
+        self._hits.all(-1, out=self._full)
+        self._full.sum(-1, out=self._count)
+        return self._count
+
+    def simulate(self, board):
+        """Play every placement on board; fills self._after and returns one-ply scores (2, cells)."""
+        after = self._after
+        after[:] = board
+        after[0, self._rows, self._rows] = 1
+        after[1, self._rows, self._rows] = 2
+        scores = self._sim
+        scores[:] = 0.0
+        moved, landing, gain = self._moved, self._landing, self._gain
+        boopable, off, slide, negative = self._boopable, self._off, self._slide, self._negative
+        for piece_type in (0, 1):
+            b = after[piece_type]
+            flat = b.reshape(-1)
+            for d in range(len(DIRECTIONS)):
+                np.take(flat, self._n_flat[d], out=moved)
+                np.multiply(moved, self._has_n[d], out=moved)
+                if piece_type == 1:
+                    np.not_equal(moved, 0, out=boopable)
+                else:  # kittens cannot boop cats
+                    np.equal(moved, 1, out=boopable)
+                    np.equal(moved, -1, out=negative)
+                    boopable |= negative
+                np.logical_and(boopable, self._off_edge[d], out=off)
+                np.take(flat, self._t_flat[d], out=landing)
+                np.equal(landing, 0, out=slide)
+                slide &= self._has_t[d]
+                slide &= boopable
+                # opponent pieces pushed off score BOOP_OFF per size, own pieces SELF_BOOP_OFF
+                np.multiply(moved, self.SELF_BOOP_OFF, out=gain)
+                np.less(moved, 0, out=negative)
+                np.multiply(moved, -self.BOOP_OFF, out=gain, where=negative)
+                np.multiply(gain, off, out=gain)
+                scores[piece_type] += gain
+                # the index arrays of the pieces that actually move are the one allocation left
+                flat[self._t_flat[d][slide]] = moved[slide]
+                off |= slide
+                flat[self._n_flat[d][off]] = 0
+            lines = self._gather_lines(b)
+            np.equal(lines, 2, out=self._hits)
+            self._hits.all(-1, out=self._full)
+            self._full.any(-1, out=self._boopable)
+            np.multiply(self._boopable, self.WIN, out=gain)
+            scores[piece_type] += gain
+            np.multiply(self._count_lines(lines, np.greater, 0), self.PROMOTION, out=gain)
+            scores[piece_type] += gain
+        return scores
+
+    def evaluate(self, obs, player):
+        if obs.shape[:2] != self._scores.shape[1:3]:
+            self._resize(*obs.shape[:2])
+        board_from_obs(obs, player, out=self._board, scratch=self._cells)
+        scores = self._scores
+        scores[0] = self.simulate(self._board).reshape(2, *obs.shape[:2]).transpose(1, 2, 0)
+        scores[1] = 0.0
+        scores[1, :, :, 0] = self.GRADUATE  # a kitten becoming a cat beats taking a cat back
+        return scores.reshape(-1)
+
+    def choose(self, obs, mask, player, deterministic):
+        scores = self.evaluate(obs, player)  # a view of self._scores, free to modify
+        if not deterministic:
+            self.rng.random(out=self._noise)
+            scores += self._noise  # random tie-break between equal moves
+        np.logical_not(mask, out=self._illegal)
+        np.copyto(scores, -np.inf, where=self._illegal)
+        return int(scores.argmax())
+
+class DefensiveOpponent(GreedyOpponent):
+    """Greedy, minus the threats (two in a line with an empty third cell) it leaves the opponent."""
+
+    KITTEN_THREAT, CAT_THREAT = 30.0, 300.0
+
+    def _threats(self, lines, test, value):
+        """Per placement cell, lines with exactly one empty cell and two cells test(cell, value)."""
+        test(lines, value, out=self._hits)
+        self._hits.sum(-1, out=self._line_count)
+        np.equal(self._line_count, 2, out=self._full)
+        self._full &= self._found
+        self._full.sum(-1, out=self._count)
+        return self._count
+
+    def evaluate(self, obs, player):
+        scores = super().evaluate(obs, player).reshape(self._scores.shape)
+        for piece_type in (0, 1):
+            lines = self._gather_lines(self._after[piece_type])
+            np.equal(lines, 0, out=self._hits)
+            self._hits.sum(-1, out=self._line_count)
+            np.equal(self._line_count, 1, out=self._found)  # open lines
+            for weight, test, value in ((self.KITTEN_THREAT, np.less, 0), (self.CAT_THREAT, np.equal, -2)):
+                np.multiply(self._threats(lines, test, value), weight, out=self._gain)
+                scores[0, :, :, piece_type] -= self._gain.reshape(obs.shape[:2])
+        return scores.reshape(-1)
+
+BOTS = {"random": UniformLegalOpponent, "greedy": GreedyOpponent, "defensive": DefensiveOpponent}
+
+def choose_action(predictor, env, deterministic=False):
+    """Ask a model, bot or search player for a move in env's current position (not checked for legality)."""
+    if getattr(predictor, "uses_env", False):
+        return predictor.choose_move(env)  # e.g. boop_search.AlphaBetaPlayer, which needs the full state
+    if isinstance(predictor, ScriptedOpponent):
+        obs = env.planes  # bots read any board size in (rows, cols, 5) layout
+    else:
+        obs = env.observation_as(predictor.observation_space.shape)
+    if getattr(predictor, "uses_action_masks", False):
+        if isinstance(predictor, ScriptedOpponent):
+            mask = env.legal_action_mask(out=predictor.mask_buffer(*obs.shape[:2]))
+        else:
+            mask = env.legal_action_mask()
+        action, _ = predictor.predict(obs, deterministic=deterministic, action_masks=mask,
+                                      player=env.current_player_num)
+    else:
+        action, _ = predictor.predict(obs, deterministic=deterministic)
+    return tuple(int(x) for x in np.atleast_1d(action))  # Discrete models return a bare index
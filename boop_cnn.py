@@ -0,0 +1,119 @@
+# Convolutional policy for Boop on channel-first (5, 6, 6) observations.
+#
+#   env = SelfPlayBoopEnv(opponent_model=..., channel_first=True)
+#   model = PPO("BoopCnnPolicy", env)
+#
+# The conv stack does not depend on the board size, and its output is pooled onto a fixed
+# grid x grid map before the linear layer, so a policy trained on a 4x4 or 5x5 variant can be
+# carried over to 6x6 with transfer_weights() (see boop_curriculum.py).
+#
+# Running this file benchmarks the CNN against the default MlpPolicy.
+
+import time
+
+import numpy as np
+import torch
+from torch import nn
+from stable_baselines3 import PPO
+from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+class BoopCNN(BaseFeaturesExtractor):
+    """Small 3x3 conv stack; padding keeps the board size so edge cells (boop-offs) keep their own features."""
+
+    def __init__(self, observation_space, features_dim=256, channels=64, grid=6):
+        super().__init__(observation_space, features_dim)
+        in_channels = observation_space.shape[0]
+        self.cnn = nn.Sequential(
+            nn.Conv2d(in_channels, channels, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(channels, channels, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(channels, channels, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool2d(grid),  # a no-op on a grid x grid board
+            nn.Flatten(),
+        )
+        self.linear = nn.Sequential(nn.Linear(channels * grid * grid, features_dim), nn.ReLU())
+
+    def forward(self, observations):
+        return self.linear(self.cnn(observations))
+
+class BoopCnnPolicy(ActorCriticPolicy):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("features_extractor_class", BoopCNN)
+        kwargs.setdefault("net_arch", dict(pi=[64], vf=[64]))
+        kwargs.setdefault("normalize_images", False)
+        super().__init__(*args, **kwargs)
+
+PPO.policy_aliases["BoopCnnPolicy"] = BoopCnnPolicy
+
+def transfer_weights(source, target):
+    """Copy every policy tensor whose shape matches from source to target model; returns the names copied.
+
+    Between board sizes that is everything except the action head, whose row/col logits
+    depend on the board size and keep their fresh initialisation.
+    """
+    target_state = target.policy.state_dict()
+    copied = [name for name, tensor in source.policy.state_dict().items()
+              if name in target_state and target_state[name].shape == tensor.shape]
+    source_state = source.policy.state_dict()
+    target.policy.load_state_dict({**target_state, **{name: source_state[name] for name in copied}})
+    return copied
+
+# === Benchmark: CNN vs MLP ===
+
+def win_rate(model, games=50, max_steps=400):
+    from boop_selfplay import SelfPlayBoopEnv, RandomOpponent
+    env = SelfPlayBoopEnv(opponent_model=RandomOpponent(),
+                          channel_first=model.observation_space.shape[0] == 5)
+    wins = 0
+    for _ in range(games):
+        obs, _ = env.reset()
+        for _ in range(max_steps):
+            action, _ = model.predict(obs, deterministic=True)
+            obs, reward, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                wins += reward > 0
+                break
+    return wins / games
+
+def inference_latency(model, batch_size=1, repeats=200):
+    obs = np.stack([model.observation_space.sample() for _ in range(batch_size)])
+    model.predict(obs, deterministic=True)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(obs, deterministic=True)
+    return (time.perf_counter() - start) / repeats
+
+def benchmark(total_timesteps=200_000, eval_every=25_000, eval_games=50):
+    from boop_selfplay import SelfPlayBoopEnv, RandomOpponent
+
+    results = {}
+    for name, policy, channel_first in (("mlp", "MlpPolicy", False), ("cnn", "BoopCnnPolicy", True)):
+        env = SelfPlayBoopEnv(opponent_model=RandomOpponent(), channel_first=channel_first)
+        model = PPO(policy, env, verbose=0)
+        curve = []
+        train_time = 0.0
+        for step in range(eval_every, total_timesteps + 1, eval_every):
+            start = time.perf_counter()
+            model.learn(total_timesteps=eval_every, reset_num_timesteps=False)
+            train_time += time.perf_counter() - start
+            curve.append((step, train_time, win_rate(model, games=eval_games)))
+            print(f"{name}: {step} steps, {train_time:.0f}s, win rate vs random {curve[-1][2]:.2f}")
+        results[name] = {
+            "curve": curve,
+            "latency_1": inference_latency(model, 1),
+            "latency_64": inference_latency(model, 64),
+            "params": sum(p.numel() for p in model.policy.parameters()),
+        }
+
+    print(f"\n{'policy':<6} {'params':>9} {'1 obs (ms)':>11} {'64 obs (ms)':>12}  steps/s_wall -> win rate")
+    for name, r in results.items():
+        curve = ", ".join(f"{s // 1000}k/{t:.0f}s->{w:.2f}" for s, t, w in r["curve"])
+        print(f"{name:<6} {r['params']:>9} {r['latency_1'] * 1e3:>11.3f} {r['latency_64'] * 1e3:>12.3f}  {curve}")
+    return results
+
+if __name__ == "__main__":
+    torch.set_num_threads(1)
+    benchmark()
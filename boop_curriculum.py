@@ -0,0 +1,64 @@
+# Curriculum training: learn Boop on small boards first, then carry the weights up to 6x6.
+#
+# Games on a 4x4 board with 5 pieces each are a few moves long and cheap to simulate, yet
+# they already teach booping, promotion and cat lines. Each stage trains a BoopCnnPolicy
+# (whose conv stack is board-size agnostic, see boop_cnn.py) against a league of the
+# scripted bots and itself, then hands its weights to the next, larger stage with
+# boop_cnn.transfer_weights(). Only the final 6x6 model is a normal checkpoint for
+# tournament.py, api_server.py or evolve().
+#
+#   python boop_curriculum.py                 # 4x4 -> 5x5 -> 6x6 into ppo_boop/curriculum
+#
+# Stage models are saved as ppo_boop/curriculum/{rows}x{cols}; a rerun skips finished stages.
+
+import os
+
+from stable_baselines3 import PPO
+
+from boop_bots import GreedyOpponent
+from boop_cnn import transfer_weights
+from boop_league import League
+from boop_selfplay import SelfPlayBoopEnv, RandomOpponent
+from boop_symmetry import SymmetricPPO
+
+# (rows, cols, pieces per player, timesteps); the last stage is the real game
+DEFAULT_STAGES = [
+    (4, 4, 5, 100_000),
+    (5, 5, 6, 150_000),
+    (6, 6, 8, 250_000),
+]
+
+def stage_path(out_dir, rows, cols):
+    return os.path.join(out_dir, f"{rows}x{cols}")
+
+def make_stage_env(rows, cols, pieces):
+    league = League()
+    league.add("random", RandomOpponent())
+    league.add("greedy", GreedyOpponent())
+    return SelfPlayBoopEnv(channel_first=True, league=league, rows=rows, cols=cols, pieces=pieces)
+
+def curriculum(stages=DEFAULT_STAGES, out_dir="ppo_boop/curriculum", augment=True, verbose=1):
+    """Train every stage in order, warm-starting each from the one before; returns the final model's path."""
+    os.makedirs(out_dir, exist_ok=True)
+    algo = SymmetricPPO if augment else PPO  # the small boards are square too, so all 8 symmetries apply
+    previous = None
+    for rows, cols, pieces, timesteps in stages:
+        path = stage_path(out_dir, rows, cols)
+        if os.path.exists(path + ".zip"):
+            previous = algo.load(path)
+            print(f"{rows}x{cols}: already trained, reusing {path}")
+            continue
+        env = make_stage_env(rows, cols, pieces)
+        model = algo("BoopCnnPolicy", env, verbose=verbose)
+        if previous is not None:
+            copied = transfer_weights(previous, model)
+            print(f"{rows}x{cols}: copied {len(copied)} tensors from the previous stage")
+        env.league.add("self", model)
+        model.learn(total_timesteps=int(timesteps))
+        model.save(path)
+        print(f"{rows}x{cols}: league win rates {env.league.summary()}")
+        previous = model
+    return path
+
+if __name__ == "__main__":
+    curriculum()
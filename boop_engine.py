@@ -0,0 +1,407 @@
+# Array-based Boop rule engine with optional numba compilation.
+#
+# Same rules as BoopEnv (is_legal, boop_adjacent, find_three_in_a_row, promotion and
+# graduation in step), but the state lives in small integer arrays:
+#
+#   board   int8  (rows, cols)  0 empty, +1/+2 player 0 kitten/cat, -1/-2 player 1 kitten/cat
+#   stock   int8  (2, 2)        [player, kitten/cat] pieces in hand
+#   placed  int8  (2, 2)        [player, kitten/cat] pieces on the board
+#   player  int                 whose turn it is
+#
+# With numba installed the kernels are compiled with njit, including step_batch() which
+# advances many games in one call. Without it they would run as plain Python, which is
+# correct but slower than BoopEnv, so make_engine() and make_batch_engine() then return
+# engines with the same arrays and methods whose moves are played by a scratch BoopEnv:
+#
+#   engine = make_batch_engine(256, rows=4, cols=4, pieces=5)
+#   rewards, dones = engine.step(actions)
+#
+# crosscheck() plays seeded random games on BoopEnv and BoopEngine side by side and stops at
+# the first difference; it is quick enough to run after any change to either rule set:
+#
+#   python boop_engine.py crosscheck --games 20 --seed 0
+#   python boop_engine.py benchmark
+
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA = True
+    njit = numba.njit(cache=True, nogil=True)
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(fn):
+        return fn
+
+KITTEN, CAT = 0, 1
+
+@njit
+def _owner(code):
+    return 0 if code > 0 else 1
+
+@njit
+def is_legal(board, stock, placed, player, action_type, row, col, piece_type, pieces):
+    rows, cols = board.shape
+    if not (0 <= row < rows and 0 <= col < cols):
+        return False
+    code = board[row, col]
+    if action_type == 0:
+        return code == 0 and stock[player, piece_type] > 0
+    # Graduation/removal: only once all pieces are on the board and no cat is in hand
+    if placed[player, 0] + placed[player, 1] < pieces or stock[player, CAT] != 0:
+        return False
+    if code == 0 or _owner(code) != player:
+        return False
+    is_cat = abs(code) == 2
+    return (piece_type == 0 and not is_cat) or (piece_type == 1 and is_cat)
+
+@njit
+def legal_mask(board, stock, placed, player, pieces, out):
+    """Fill out (2, rows, cols, 2) with is_legal for every action."""
+    rows, cols = board.shape
+    for a in range(2):
+        for r in range(rows):
+            for c in range(cols):
+                for t in range(2):
+                    out[a, r, c, t] = is_legal(board, stock, placed, player, a, r, c, t, pieces)
+
+@njit
+def boop_adjacent(board, stock, placed, row, col):
+    rows, cols = board.shape
+    booper_is_cat = abs(board[row, col]) == 2
+    for dr in range(-1, 2):
+        for dc in range(-1, 2):
+            if dr == 0 and dc == 0:
+                continue
+            r, c = row + dr, col + dc
+            if not (0 <= r < rows and 0 <= c < cols) or board[r, c] == 0:
+                continue
+            boopee = board[r, c]
+            if not booper_is_cat and abs(boopee) == 2:
+                continue  # kittens cannot boop cats
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                if board[nr, nc] == 0:
+                    board[nr, nc] = boopee
+                    board[r, c] = 0
+            else:
+                # Piece falls off the board and goes back to its owner's hand
+                owner, kind = _owner(boopee), abs(boopee) - 1
+                placed[owner, kind] -= 1
+                stock[owner, kind] += 1
+                board[r, c] = 0
+
+@njit
+def _line_mark(board, player, only_cats, marks):
+    """Mark every cell in a three-in-a-row of player's pieces; returns how many lines were found."""
+    rows, cols = board.shape
+    sign = 1 if player == 0 else -1
+    found = 0
+    for r in range(rows):
+        for c in range(cols):
+            for d in range(4):
+                dr, dc = (0, 1, 1, 1)[d], (1, 0, 1, -1)[d]
+                ok = True
+                for i in range(3):
+                    pr, pc = r + i * dr, c + i * dc
+                    if not (0 <= pr < rows and 0 <= pc < cols):
+                        ok = False
+                        break
+                    code = board[pr, pc] * sign
+                    if code <= 0 or (only_cats and code != 2):
+                        ok = False
+                        break
+                if ok:
+                    found += 1
+                    for i in range(3):
+                        marks[r + i * dr, c + i * dc] = True
+    return found
+
+@njit
+def step(board, stock, placed, player, action_type, row, col, piece_type):
+    """Apply a legal action in place. Returns (reward, done, next player)."""
+    sign = 1 if player == 0 else -1
+    if action_type == 1:
+        kind = abs(board[row, col]) - 1
+        board[row, col] = 0
+        placed[player, kind] -= 1
+        stock[player, CAT] += 1
+        return 0.1, False, player  # graduating keeps the turn, as in BoopEnv
+
+    stock[player, piece_type] -= 1
+    placed[player, piece_type] += 1
+    board[row, col] = sign * (piece_type + 1)
+    boop_adjacent(board, stock, placed, row, col)
+
+    reward = 0.0
+    marks = np.zeros(board.shape, dtype=np.bool_)
+    if _line_mark(board, player, False, marks):
+        rows, cols = board.shape
+        for r in range(rows):
+            for c in range(cols):
+                if marks[r, c] and board[r, c] * sign == 1:
+                    board[r, c] = 0
+                    placed[player, KITTEN] -= 1
+                    stock[player, CAT] += 1
+                    reward += 0.1
+
+    marks[:] = False
+    if _line_mark(board, player, True, marks):
+        return 1.0, True, player
+    return reward, False, 1 - player
+
+@njit
+def step_batch(boards, stocks, placed, players, actions, rewards, dones):
+    """step() for N games at once; games already done are left alone."""
+    for i in range(boards.shape[0]):
+        if dones[i]:
+            continue
+        a = actions[i]
+        rewards[i], dones[i], players[i] = step(boards[i], stocks[i], placed[i], players[i], a[0], a[1], a[2], a[3])
+
+@njit
+def legal_mask_batch(boards, stocks, placed, players, pieces, out):
+    for i in range(boards.shape[0]):
+        legal_mask(boards[i], stocks[i], placed[i], players[i], pieces, out[i])
+
+class BoopEngine:
+    """One game on the array engine, with the BoopEnv-style methods search code needs."""
+
+    def __init__(self, rows=6, cols=6, pieces=8):
+        self.rows, self.cols, self.pieces = rows, cols, pieces
+        self._mask = np.zeros((2, rows, cols, 2), dtype=np.bool_)
+        self.reset()
+
+    def reset(self):
+        self.board = np.zeros((self.rows, self.cols), dtype=np.int8)
+        self.stock = np.array([[self.pieces, 0], [self.pieces, 0]], dtype=np.int8)
+        self.placed = np.zeros((2, 2), dtype=np.int8)
+        self.current_player_num = 0
+        self.done = False
+
+    @classmethod
+    def from_env(cls, env):
+        engine = cls(env.rows, env.cols, sum(env.players[0].stock.values()) + sum(env.players[0].placed.values()))
+        read_env(env, engine.board, engine.stock, engine.placed)
+        engine.current_player_num = env.current_player_num
+        return engine
+
+    def is_legal(self, action):
+        a, r, c, t = (int(x) for x in action)
+        return bool(is_legal(self.board, self.stock, self.placed, self.current_player_num, a, r, c, t, self.pieces))
+
+    def legal_action_mask(self, out=None):
+        legal_mask(self.board, self.stock, self.placed, self.current_player_num, self.pieces, self._mask)
+        if out is None:
+            return self._mask.reshape(-1).copy()
+        out[:] = self._mask.reshape(-1)
+        return out
+
+    def apply_action(self, action):
+        a, r, c, t = (int(x) for x in action)
+        reward, self.done, self.current_player_num = step(self.board, self.stock, self.placed,
+                                                          self.current_player_num, a, r, c, t)
+        return reward, self.done, {}
+
+class BatchBoopEngine:
+    """N independent games stepped together with step_batch()."""
+
+    def __init__(self, n, rows=6, cols=6, pieces=8):
+        self.n, self.rows, self.cols, self.pieces = n, rows, cols, pieces
+        self.boards = np.zeros((n, rows, cols), dtype=np.int8)
+        self.stocks = np.zeros((n, 2, 2), dtype=np.int8)
+        self.placed = np.zeros((n, 2, 2), dtype=np.int8)
+        self.players = np.zeros(n, dtype=np.int64)
+        self.rewards = np.zeros(n, dtype=np.float64)
+        self.dones = np.zeros(n, dtype=np.bool_)
+        self.masks = np.zeros((n, 2, rows, cols, 2), dtype=np.bool_)
+        self.reset()
+
+    def reset(self, which=None):
+        which = slice(None) if which is None else which
+        self.boards[which] = 0
+        self.stocks[which] = [[self.pieces, 0], [self.pieces, 0]]
+        self.placed[which] = 0
+        self.players[which] = 0
+        self.dones[which] = False
+
+    def load(self, boards, stocks, placed, players):
+        """Set all N games to the given positions (engine arrays, as from boop_solver's decode)."""
+        self.boards[:], self.stocks[:], self.placed[:], self.players[:] = boards, stocks, placed, players
+        self.dones[:] = False
+
+    def legal_masks(self):
+        legal_mask_batch(self.boards, self.stocks, self.placed, self.players, self.pieces, self.masks)
+        return self.masks.reshape(self.n, -1)
+
+    def step(self, actions):
+        """Apply one legal action (N, 4) per game; returns (rewards, dones) views."""
+        step_batch(self.boards, self.stocks, self.placed, self.players,
+                   np.asarray(actions, dtype=np.int64), self.rewards, self.dones)
+        return self.rewards, self.dones
+
+# === Without numba: the same engines on BoopEnv's rules ===
+
+def read_env(env, board, stock, placed):
+    """Write env's position into engine arrays (the side to move is env.current_player_num)."""
+    board[:] = 0
+    for (r, c), piece in np.ndenumerate(env.board):
+        if piece is not None:
+            board[r, c] = (2 if piece.is_cat else 1) * (1 if piece.player == 0 else -1)
+    for p, player in enumerate(env.players):
+        stock[p] = player.stock['kitten'], player.stock['cat']
+        placed[p] = player.placed['kitten'], player.placed['cat']
+
+def load_env(env, board, stock, placed, player):
+    """Set env, a BoopEnv of the same size, to the position given as engine arrays."""
+    from boop_env import Kitten
+    # Pieces are never mutated in place (see BoopEnv.push), so cells can share them
+    pieces = {1: Kitten(0), 2: Kitten(0, is_cat=True), -1: Kitten(1), -2: Kitten(1, is_cat=True)}
+    env.board = np.full(env.grid_shape, None)
+    for r, c in zip(*np.nonzero(board)):
+        env.board[r, c] = pieces[int(board[r, c])]
+    for p, player_state in enumerate(env.players):
+        player_state.stock = {'kitten': int(stock[p, 0]), 'cat': int(stock[p, 1])}
+        player_state.placed = {'kitten': int(placed[p, 0]), 'cat': int(placed[p, 1])}
+    env.current_player_num = int(player)
+    env.done = False
+
+class EnvBoopEngine(BoopEngine):
+    """BoopEngine whose moves are checked and played by a scratch BoopEnv."""
+
+    def __init__(self, rows=6, cols=6, pieces=8):
+        from boop_env import BoopEnv
+        self._env = BoopEnv(rows=rows, cols=cols, pieces=pieces)
+        super().__init__(rows, cols, pieces)
+
+    def _loaded(self):
+        load_env(self._env, self.board, self.stock, self.placed, self.current_player_num)
+        return self._env
+
+    def is_legal(self, action):
+        return bool(self._loaded().is_legal(tuple(int(x) for x in action)))
+
+    def legal_action_mask(self, out=None):
+        return self._loaded().legal_action_mask(out)
+
+    def apply_action(self, action):
+        env = self._loaded()
+        reward, self.done, info = env.apply_action(tuple(int(x) for x in action))
+        read_env(env, self.board, self.stock, self.placed)
+        self.current_player_num = env.current_player_num
+        return reward, self.done, info
+
+class EnvBatchBoopEngine(BatchBoopEngine):
+    """BatchBoopEngine that plays one game at a time on a scratch BoopEnv."""
+
+    def __init__(self, n, rows=6, cols=6, pieces=8):
+        from boop_env import BoopEnv
+        self._env = BoopEnv(rows=rows, cols=cols, pieces=pieces)
+        super().__init__(n, rows, cols, pieces)
+
+    def legal_masks(self):
+        masks = self.masks.reshape(self.n, -1)
+        for i in range(self.n):
+            load_env(self._env, self.boards[i], self.stocks[i], self.placed[i], self.players[i])
+            self._env.legal_action_mask(out=masks[i])
+        return masks
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        for i in np.flatnonzero(~self.dones):
+            load_env(self._env, self.boards[i], self.stocks[i], self.placed[i], self.players[i])
+            self.rewards[i], self.dones[i], _ = self._env.apply_action(tuple(int(x) for x in actions[i]))
+            read_env(self._env, self.boards[i], self.stocks[i], self.placed[i])
+            self.players[i] = self._env.current_player_num
+        return self.rewards, self.dones
+
+def make_engine(rows=6, cols=6, pieces=8):
+    """BoopEngine when numba compiles its kernels, else EnvBoopEngine."""
+    return (BoopEngine if HAVE_NUMBA else EnvBoopEngine)(rows, cols, pieces)
+
+def make_batch_engine(n, rows=6, cols=6, pieces=8):
+    """BatchBoopEngine when numba compiles its kernels, else EnvBatchBoopEngine."""
+    return (BatchBoopEngine if HAVE_NUMBA else EnvBatchBoopEngine)(n, rows, cols, pieces)
+
+# === Cross-check against BoopEnv ===
+
+def crosscheck(games=20, max_plies=200, seed=0):
+    """Play random games on BoopEnv and BoopEngine side by side and assert they never diverge."""
+    import random
+    from boop_env import BoopEnv
+    rng = random.Random(seed)
+    env, engine = BoopEnv(), BoopEngine()
+    positions = 0
+    for _ in range(games):
+        env.reset()
+        engine.reset()
+        for _ in range(max_plies):
+            expected = BoopEngine.from_env(env)
+            assert np.array_equal(engine.board, expected.board), "board diverged"
+            assert np.array_equal(engine.stock, expected.stock) and np.array_equal(engine.placed, expected.placed)
+            assert engine.current_player_num == expected.current_player_num
+            assert np.array_equal(engine.legal_action_mask(), env.legal_action_mask()), "legal moves diverged"
+            legal = env.legal_actions()
+            positions += 1
+            if not legal:
+                break
+            action = rng.choice(legal)
+            reward, done, _ = env.apply_action(action)
+            engine_reward, engine_done, _ = engine.apply_action(action)
+            assert abs(reward - engine_reward) < 1e-9 and done == engine_done, "step result diverged"
+            if done:
+                break
+    return positions
+
+def benchmark(n_games=256, plies=60, seed=0):
+    import time
+    from boop_env import BoopEnv
+    rng = np.random.default_rng(seed)
+
+    def random_actions(masks):
+        scores = rng.random(masks.shape)
+        scores[~masks] = -1
+        return np.stack(np.unravel_index(scores.argmax(1), (2, 6, 6, 2)), axis=1)
+
+    batch = make_batch_engine(n_games)
+    batch.step(random_actions(batch.legal_masks()))  # compile
+    batch.reset()
+    start = time.perf_counter()
+    steps = 0
+    for _ in range(plies):
+        masks = batch.legal_masks()
+        live = ~batch.dones & masks.any(1)
+        batch.dones |= ~live
+        batch.step(random_actions(masks))
+        steps += int(live.sum())
+    engine_rate = steps / (time.perf_counter() - start)
+
+    env = BoopEnv()
+    start = time.perf_counter()
+    steps = 0
+    while steps < 2000:
+        env.reset()
+        for _ in range(plies):
+            legal = env.legal_actions()
+            if not legal:
+                break
+            _, done, _ = env.apply_action(legal[rng.integers(len(legal))])
+            steps += 1
+            if done:
+                break
+    env_rate = steps / (time.perf_counter() - start)
+    print(f"BoopEnv: {env_rate:,.0f} steps/s (legal_actions + step)")
+    print(f"{type(batch).__name__}: {engine_rate:,.0f} steps/s (mask + step)")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["crosscheck", "benchmark"])
+    parser.add_argument("--games", type=int, default=20, help="crosscheck: random games to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.command == "crosscheck":
+        print(f"cross-checked {crosscheck(args.games, seed=args.seed)} positions against BoopEnv")
+    else:
+        benchmark(seed=args.seed)
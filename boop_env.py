@@ -1,14 +1,26 @@
-# TODO: change to CNN policy! If you want to later use a CNN policy, you'll need to change the observation format to channel-first (5, 6, 6) and adjust the policy accordingly.
+# Observations are (6, 6, 5) by default; BoopEnv(channel_first=True) gives (5, 6, 6) for the CNN policy in boop_cnn.py.
+# Board size and pieces per player are parameters: BoopEnv(rows=4, cols=4, pieces=5) plays the same
+# rules on a smaller board, with observations (4, 4, 5) and actions [2, 4, 4, 2].
 
 import gymnasium as gym
 import numpy as np
 import random
+from collections import Counter
+
+ACTION_DIMS = (2, 6, 6, 2)  # action_type, row, col, piece_type
+N_ACTIONS = int(np.prod(ACTION_DIMS))
+
+def action_to_index(action, dims=ACTION_DIMS):
+    return int(np.ravel_multi_index(tuple(int(x) for x in action), dims))
+
+def index_to_action(index, dims=ACTION_DIMS):
+    return tuple(int(x) for x in np.unravel_index(index, dims))
 
 class Player:
-    def __init__(self, id, token):
+    def __init__(self, id, token, pieces=8):
         self.id = id
         self.token = token
-        self.stock = {'kitten': 8, 'cat': 0}
+        self.stock = {'kitten': pieces, 'cat': 0}
         self.placed = {'kitten': 0, 'cat': 0}
 
 class Kitten:
@@ -21,38 +33,63 @@ class Kitten:
 
 class BoopEnv(gym.Env):
 
-    def __init__(self):
+    def __init__(self, channel_first=False, max_plies=200, max_repetitions=3, rows=6, cols=6, pieces=8):
         super().__init__()
-        self.rows, self.cols = 6, 6
+        self.rows, self.cols = rows, cols
+        self.pieces = pieces  # kittens each player starts with
+        self.action_dims = (2, rows, cols, 2)
+        self.channel_first = channel_first
+        # Games are truncated as a draw after max_plies moves, or when the same position
+        # (board, stock and side to move) comes up max_repetitions times; None disables either
+        self.max_plies = max_plies
+        self.max_repetitions = max_repetitions
         self.grid_shape = (self.rows, self.cols)
-        self.action_space = gym.spaces.MultiDiscrete([2, self.rows, self.cols, 2])  # action_type, row, col, piece_type
-        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(self.rows, self.cols, 5), dtype=np.float32)
+        self.action_space = gym.spaces.MultiDiscrete(self.action_dims)  # action_type, row, col, piece_type
+        obs_shape = (5, self.rows, self.cols) if channel_first else (self.rows, self.cols, 5)
+        self.observation_space = gym.spaces.Box(low=0, high=1, shape=obs_shape, dtype=np.float32)
         self.reset()
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
         self.board = np.full(self.grid_shape, None)
-        self.players = [Player(0, 'K'), Player(1, 'O')]
+        self.players = [Player(0, 'K', self.pieces), Player(1, 'O', self.pieces)]
         self.current_player_num = 0
         self.done = False
         self.turns_taken = 0
+        self._undo = []
+        self.position_counts = Counter([self.position_key()])
         return self.observation.astype(np.float32), {}
 
     @property
     def observation(self):
+        planes = self.planes
+        return planes.transpose(2, 0, 1) if self.channel_first else planes
+
+    def observation_as(self, shape):
+        # Observation in whichever layout (HWC or CHW) a given model was trained on
+        planes = self.planes
+        chw = (planes.shape[2], self.rows, self.cols)
+        if tuple(shape) == planes.shape and (tuple(shape) != chw or not self.channel_first):
+            return planes
+        # On a 5x5 board both layouts are (5, 5, 5); assume the model uses this env's layout
+        return planes.transpose(2, 0, 1)
+
+    @property
+    def planes(self):
+        # (rows, cols, 5): p0 pieces, p1 pieces, cats, p0 stock, p1 stock
         pos0 = np.array([[1 if isinstance(c, Kitten) and c.player == 0 else 0 for c in row] for row in self.board])
         pos1 = np.array([[1 if isinstance(c, Kitten) and c.player == 1 else 0 for c in row] for row in self.board])
         cats = np.array([[1 if isinstance(c, Kitten) and c.is_cat else 0 for c in row] for row in self.board])
 
         # Encode stock for each player in all cells
-        stock_p0 = np.full(self.grid_shape, (self.players[0].stock['kitten'] + self.players[0].stock['cat']) / 8.0)
-        stock_p1 = np.full(self.grid_shape, (self.players[1].stock['kitten'] + self.players[1].stock['cat']) / 8.0)
+        stock_p0 = np.full(self.grid_shape, (self.players[0].stock['kitten'] + self.players[0].stock['cat']) / self.pieces)
+        stock_p1 = np.full(self.grid_shape, (self.players[1].stock['kitten'] + self.players[1].stock['cat']) / self.pieces)
 
         return np.stack([pos0, pos1, cats, stock_p0, stock_p1], axis=-1)
 
     def get_state(self):
         return {
-            "board": self.observation.tolist(),
+            "board": self.planes.tolist(),
             "stock": {
                 "0": self.players[0].stock,
                 "1": self.players[1].stock
@@ -81,7 +118,7 @@ class BoopEnv(gym.Env):
         elif action_type == 1:
             # Graduation/removal action
 
-            if sum(player.placed.values()) < 8:
+            if sum(player.placed.values()) < self.pieces:
                 return False  # can't graduate/remove unless board is full
             
             piece = self.board[row, col]
@@ -106,6 +143,25 @@ class BoopEnv(gym.Env):
                             legal.append((a, r, c, t))
         return legal
 
+    def legal_action_mask(self, out=None):
+        # Same rules as is_legal, evaluated for every action at once; shape (prod(action_dims),)
+        # out: a bool buffer of that size to fill instead of allocating a new mask
+        player = self.players[self.current_player_num]
+        if out is None:
+            mask = np.zeros(self.action_dims, dtype=bool)
+        else:
+            mask = out.reshape(self.action_dims)
+            mask[:] = False
+        occupied = np.not_equal(self.board, None)
+        mask[0, :, :, 0] = ~occupied & (player.stock['kitten'] > 0)
+        mask[0, :, :, 1] = ~occupied & (player.stock['cat'] > 0)
+        if sum(player.placed.values()) >= self.pieces and player.stock['cat'] == 0:
+            for r, c in zip(*np.nonzero(occupied)):
+                piece = self.board[r, c]
+                if piece.player == self.current_player_num:
+                    mask[1, r, c, 1 if piece.is_cat else 0] = True
+        return mask.reshape(-1)
+
     def boop_adjacent(self, row, col):
         for dr in [-1, 0, 1]:
             for dc in [-1, 0, 1]:
@@ -153,6 +209,28 @@ class BoopEnv(gym.Env):
 
     
     def step(self, action):
+        reward, terminated, info = self.apply_action(action)
+        self.turns_taken += 1
+        truncated = False
+        if not terminated:
+            key = self.position_key()
+            self.position_counts[key] += 1
+            if self.max_repetitions and self.position_counts[key] >= self.max_repetitions:
+                truncated, info = True, {**info, "draw": "repetition"}
+            elif self.max_plies and self.turns_taken >= self.max_plies:
+                truncated, info = True, {**info, "draw": "max_plies"}
+        self.done = terminated or truncated
+        return self.observation.astype(np.float32), reward, terminated, truncated, info
+
+    def position_key(self):
+        # Hash of everything that decides the rest of the game
+        cells = tuple(0 if k is None else 1 + 2 * k.player + k.is_cat for k in self.board.flat)
+        stock = tuple(v for p in self.players for v in p.stock.values())
+        return hash((cells, stock, self.current_player_num))
+
+    def apply_action(self, action):
+        # The rules half of step(): mutates the game and returns (reward, terminated, info)
+        # without building an observation
         reward = 0.0
 
         player = self.players[self.current_player_num]
@@ -163,7 +241,7 @@ class BoopEnv(gym.Env):
                 action = random.choice(legal_actions)
             else:
                 # No legal actions exist: game ends (very rare edge case)
-                return self.observation.astype(np.float32), 0.0, True, False, {"reason": "no_legal_moves"}
+                return 0.0, True, {"reason": "no_legal_moves"}
         """    
         action_type, row, col, piece_type = action
 
@@ -189,10 +267,10 @@ class BoopEnv(gym.Env):
 
             winning = self.find_three_in_a_row(self.current_player_num, only_cats=True)
             if winning:
-                return self.observation.astype(np.float32), 1.0, True, False, {"winning_positions": winning}
+                return 1.0, True, {"winning_positions": winning}
 
             self.current_player_num = 1 - self.current_player_num
-            return self.observation.astype(np.float32), reward, False, False, {}
+            return reward, False, {}
 
         elif action_type == 1:
             # Graduation/removal action (already legal)
@@ -206,7 +284,22 @@ class BoopEnv(gym.Env):
                 player.placed['cat'] -= 1
                 player.stock['cat'] += 1
 
-            return self.observation.astype(np.float32), 0.1, False, False, {"status": "Graduated or removed piece"}
+            return 0.1, False, {"status": "Graduated or removed piece"}
+
+    # === Undo-able moves for tree search ===
+    # push() plays a move and remembers how to take it back; pop() takes back the last one.
+    # Pieces are never mutated in place, so a shallow copy of the board is a full snapshot.
+
+    def push(self, action):
+        self._undo.append((self.board.copy(), [(dict(p.stock), dict(p.placed)) for p in self.players],
+                           self.current_player_num, self.done, self.turns_taken))
+        return self.apply_action(action)
+
+    def pop(self):
+        board, players, self.current_player_num, self.done, self.turns_taken = self._undo.pop()
+        self.board = board
+        for player, (stock, placed) in zip(self.players, players):
+            player.stock, player.placed = stock, placed
 
 
     def render(self):
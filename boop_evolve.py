@@ -1,27 +1,41 @@
 
 from stable_baselines3 import PPO
+from stable_baselines3.common.utils import get_schedule_fn
 import os
 import random
 import numpy as np
 from boop_env import BoopEnv
 from boop_selfplay import SelfPlayBoopEnv, RandomOpponent
+from boop_pretrain import pretrain
+from boop_symmetry import SymmetricPPO
+import boop_cnn  # registers "BoopCnnPolicy"
+from boop_jobs import JobQueue, spawn_workers, stop_workers
+from boop_league import League
+from checkpoint_store import CheckpointStore, load_checkpoint
+from boop_bots import GreedyOpponent, DefensiveOpponent, choose_action
 
 def play_match(model_a, model_b, games=5):
+    # Returns points for a and b: 1 per win, 0.5 each per drawn (truncated) game
     a_wins = 0
     b_wins = 0
     for _ in range(games):
         env = BoopEnv()
         done = False
+        truncated = False
         env.reset()
-        while not done:
+        while not (done or truncated):
             current = env.current_player_num
             model = model_a if current == 0 else model_b
-            action, _ = model.predict(env.observation, deterministic=False)
+            action = choose_action(model, env)
             try:
-                _, reward, done, _, _ = env.step(action)
+                _, reward, done, truncated, _ = env.step(action)
             except:
                 reward = 1 if current == 1 else -1
                 done = True
+        if truncated:
+            a_wins += 0.5
+            b_wins += 0.5
+            continue
         winner = env.current_player_num if reward == 1 else 1 - env.current_player_num
         if winner == 0:
             a_wins += 1
@@ -29,40 +43,241 @@ def play_match(model_a, model_b, games=5):
             b_wins += 1
     return a_wins, b_wins
 
-def train_generation(gen_id, n_agents=10, parents=None, timesteps=100_000):
-    os.makedirs(f"ppo_boop/gen_{gen_id:02}", exist_ok=True)
+def agent_path(gen_id, index):
+    return f"ppo_boop/gen_{gen_id:02}/v{index}"
+
+def build_league(parents, store=None):
+    # Parents stay loaded across agents and generations (boop_league keeps them resident)
+    league = League()
+    for path in parents or []:
+        league.add_checkpoint(path, store)
+    league.add("random", RandomOpponent())
+    league.add("greedy", GreedyOpponent())
+    league.add("defensive", DefensiveOpponent())
+    return league
+
+def make_training_env(parents, cnn=False, league=False, store=None):
+    # league: sample a parent, a scripted bot or the learner itself every episode instead of
+    # training against one random parent; the learner is added once the model exists
+    if league:
+        return SelfPlayBoopEnv(channel_first=cnn, league=build_league(parents, store))
+    opponent = load_checkpoint(random.choice(parents), store, policy_only=True) if parents else RandomOpponent()
+    return SelfPlayBoopEnv(opponent_model=opponent, channel_first=cnn)
+
+def train_agent(gen_id, index, parents=None, timesteps=100_000, pretrain_dir=None, augment=False, cnn=False,
+                league=False, checkpoint_every=None, store=None):
+    # checkpoint_every: save a resumable checkpoint every N steps; a rerun picks up from it
+    # store: a checkpoint_store directory; checkpoints and the final model are then saved there
+    # in the background instead of pausing training, and no zip is written: tournaments, leagues
+    # and parents load agents from the store by name (checkpoint_store.load_checkpoint)
+    path = agent_path(gen_id, index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    store = CheckpointStore(store) if store else None
+    env = make_training_env(parents, cnn=cnn, league=league, store=store)
+    algo = SymmetricPPO if augment else PPO  # augment: train on all 8 board symmetries of every rollout
+    checkpoint = f"{path}_ckpt"
+    if checkpoint_every and store and checkpoint in store:
+        model = store.load_model(checkpoint, env=env)
+    elif checkpoint_every and not store and os.path.exists(checkpoint + ".zip"):
+        model = algo.load(checkpoint, env=env)
+    else:
+        model = algo("BoopCnnPolicy" if cnn else "MlpPolicy", env, verbose=1)
+        if pretrain_dir:
+            pretrain(model, pretrain_dir)
+    if league:
+        env.league.add("self", model)
+    timesteps = int(timesteps)
+    chunk = int(checkpoint_every) if checkpoint_every else timesteps
+    while model.num_timesteps < timesteps:
+        model.learn(total_timesteps=min(chunk, timesteps - model.num_timesteps), reset_num_timesteps=False)
+        if checkpoint_every and store:
+            store.save(model, checkpoint, generation=gen_id)
+        elif checkpoint_every:
+            model.save(checkpoint)
+    if store:
+        store.save(model, path, generation=gen_id)
+        store.remove(checkpoint)
+        store.gc()  # the intermediate checkpoints' blobs, unless the final model still uses them
+        store.close()
+    else:
+        model.save(path)  # tournaments and leagues load the zip
+    if checkpoint_every and os.path.exists(checkpoint + ".zip"):
+        os.remove(checkpoint + ".zip")
+    if league:
+        print(f"{path} league win rates: {env.league.summary()}")
+    return path
+
+def train_generation(gen_id, n_agents=10, parents=None, timesteps=100_000, **agent_kwargs):
+    for i in range(n_agents):
+        train_agent(gen_id, i, parents=parents, timesteps=timesteps, **agent_kwargs)
+
+# === Population-based training ===
+# Children start from the ranked parents' weights with perturbed hyperparameters, and every
+# pbt_interval steps the weakest members copy a strong member's weights (exploit) and
+# re-perturb its hyperparameters (explore).
+
+DEFAULT_HYPERPARAMS = {"learning_rate": 3e-4, "ent_coef": 0.0, "clip_range": 0.2}
+HYPERPARAM_BOUNDS = {"learning_rate": (1e-5, 1e-2), "ent_coef": (0.0, 0.1), "clip_range": (0.05, 0.4)}
+
+def get_hyperparams(model):
+    lr = model.learning_rate
+    clip = model.clip_range
+    return {"learning_rate": float(lr(1.0) if callable(lr) else lr),
+            "ent_coef": float(model.ent_coef),
+            "clip_range": float(clip(1.0) if callable(clip) else clip)}
+
+def set_hyperparams(model, hyperparams):
+    model.learning_rate = hyperparams["learning_rate"]
+    model.lr_schedule = get_schedule_fn(hyperparams["learning_rate"])
+    model.ent_coef = hyperparams["ent_coef"]
+    model.clip_range = get_schedule_fn(hyperparams["clip_range"])
+
+def perturb_hyperparams(hyperparams, factors=(0.8, 1.25)):
+    perturbed = {}
+    for name, value in hyperparams.items():
+        low, high = HYPERPARAM_BOUNDS[name]
+        # ent_coef defaults to 0, which no factor can move
+        value = max(value, 1e-3) if name == "ent_coef" else value
+        perturbed[name] = float(np.clip(value * random.choice(factors), low, high))
+    return perturbed
+
+def pbt_generation(gen_id, n_agents=10, parents=None, timesteps=100_000, pbt_interval=50_000,
+                   exploit_fraction=0.25, eval_games=10, pretrain_dir=None, augment=False, cnn=False, league=False,
+                   checkpoint_every=None, store=None):
+    # store: as in train_agent, parents are looked up there and the members are saved there.
+    # eval_games: games per pair between rounds, as many as the tournament plays; with fewer a
+    # member's rank is mostly luck and the exploit step copies noise
+    if checkpoint_every:
+        raise ValueError("PBT keeps its population in memory and cannot resume from checkpoints; "
+                         "use checkpoint_every without pbt")
+    algo = SymmetricPPO if augment else PPO
+    store = CheckpointStore(store) if store else None
+    members = []
     for i in range(n_agents):
+        env = make_training_env(parents, cnn=cnn, league=league, store=store)
         if parents:
-            opponent_path = random.choice(parents)
-            opponent = PPO.load(opponent_path)
+            # parents are ranked best first, so the strongest parents get the most children
+            model = load_checkpoint(parents[i % len(parents)], store, env=env, algo=algo)
+            hyperparams = perturb_hyperparams(get_hyperparams(model))
         else:
-            opponent = RandomOpponent()
-        env = SelfPlayBoopEnv(opponent_model=opponent)
-        model = PPO("MlpPolicy", env, verbose=1)
-        model.learn(total_timesteps=timesteps)
-        model.save(f"ppo_boop/gen_{gen_id:02}/v{i}")
-
-def tournament(gen_id, n_agents=10, games_per_match=5, number_best_agents=3):
-    models = [PPO.load(f"ppo_boop/gen_{gen_id:02}/v{i}") for i in range(n_agents)]
+            model = algo("BoopCnnPolicy" if cnn else "MlpPolicy", env, verbose=1)
+            if pretrain_dir:
+                pretrain(model, pretrain_dir)
+            hyperparams = perturb_hyperparams(DEFAULT_HYPERPARAMS)
+        set_hyperparams(model, hyperparams)
+        if league:
+            env.league.add("self", model)
+        members.append(model)
+
+    trained = 0
+    timesteps = int(timesteps)
+    while trained < timesteps:
+        steps = min(pbt_interval, timesteps - trained)
+        for model in members:
+            model.learn(total_timesteps=steps, reset_num_timesteps=False)
+        trained += steps
+        if trained >= timesteps:
+            break
+
+        scores = np.zeros(n_agents)
+        for i in range(n_agents):
+            for j in range(i + 1, n_agents):
+                win_i, win_j = play_match(members[i], members[j], games=eval_games)
+                scores[i] += win_i
+                scores[j] += win_j
+        order = list(np.argsort(-scores))
+        n_swap = max(1, int(n_agents * exploit_fraction))
+        for loser in order[-n_swap:]:
+            winner = random.choice(order[:n_swap])
+            if scores[winner] <= scores[loser]:
+                continue  # no better than the member it would replace
+            members[loser].policy.load_state_dict(members[winner].policy.state_dict())
+            members[loser].policy.optimizer.load_state_dict(members[winner].policy.optimizer.state_dict())
+            set_hyperparams(members[loser], perturb_hyperparams(get_hyperparams(members[winner])))
+            print(f"PBT: v{loser} <- v{winner} {get_hyperparams(members[loser])}")
+
+    for i, model in enumerate(members):
+        path = agent_path(gen_id, i)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if store:
+            store.save(model, path, generation=gen_id)
+        else:
+            model.save(path)
+    if store:
+        store.close()
+
+def rank_agents(gen_id, scores, number_best_agents=3):
+    ranked = sorted(enumerate(scores), key=lambda x: -x[1])
+    print(ranked)
+    return [agent_path(gen_id, idx) for idx, _ in ranked[:number_best_agents]]
+
+def tournament(gen_id, n_agents=10, games_per_match=5, number_best_agents=3, store=None):
+    store = CheckpointStore(store) if store else None
+    models = [load_checkpoint(agent_path(gen_id, i), store, policy_only=True) for i in range(n_agents)]
     scores = np.zeros(n_agents)
     for i in range(n_agents):
         for j in range(i + 1, n_agents):
             win_i, win_j = play_match(models[i], models[j], games=games_per_match)
             scores[i] += win_i
             scores[j] += win_j
-    ranked = sorted(enumerate(scores), key=lambda x: -x[1])
-    print(ranked)
-    top_paths = [f"ppo_boop/gen_{gen_id:02}/v{idx}" for idx, _ in ranked[:number_best_agents]]
-    return top_paths
+    return rank_agents(gen_id, scores, number_best_agents)
 
-def evolve(generations=5, agents_per_gen=10, agents_to_keep=3, timesteps=100000):
+def distributed_generation(queue, gen_id, n_agents=10, parents=None, timesteps=100_000, games_per_match=5,
+                           number_best_agents=3, pairs_per_shard=4, checkpoint_every=50_000, **agent_kwargs):
+    # Same as train_generation + tournament, but every agent and every tournament shard is a
+    # job in the shared queue (see boop_jobs.py), picked up by however many workers are running.
+    train_keys = [queue.submit(f"gen_{gen_id:02}/train/v{i}", "train", dict(
+        gen_id=gen_id, index=i, parents=parents, timesteps=timesteps, checkpoint_every=checkpoint_every,
+        **agent_kwargs)) for i in range(n_agents)]
+    queue.wait(train_keys)
+
+    pairs = [(i, j) for i in range(n_agents) for j in range(i + 1, n_agents)]
+    paths = [agent_path(gen_id, i) for i in range(n_agents)]
+    match_keys = [queue.submit(f"gen_{gen_id:02}/match/{start // pairs_per_shard}", "match", dict(
+        paths=paths, pairs=pairs[start:start + pairs_per_shard], games=games_per_match,
+        store=agent_kwargs.get("store")))
+        for start in range(0, len(pairs), pairs_per_shard)]
+    scores = np.zeros(n_agents)
+    for result in queue.wait(match_keys):
+        for (i, j), (win_i, win_j) in zip(result["pairs"], result["wins"]):
+            scores[i] += win_i
+            scores[j] += win_j
+    return rank_agents(gen_id, scores, number_best_agents)
+
+def evolve(generations=5, agents_per_gen=10, agents_to_keep=3, timesteps=100000, queue_path=None, local_workers=0,
+           pbt=False, pbt_interval=50_000, **agent_kwargs):
+    # queue_path: run each generation through a job queue shared with `python boop_jobs.py worker`
+    # processes (local_workers of them are started here); rerunning evolve() after a crash skips
+    # every job that already finished
+    # pbt: warm-start each generation from the previous one's top agents (see pbt_generation)
+    if pbt and queue_path:
+        raise ValueError("PBT trains its population in one process and cannot use queue_path")
+    queue = JobQueue(queue_path) if queue_path else None
+    # Workers stay up for the whole run: between rounds some of them sit idle while others finish
+    # long train jobs, and the later match shards and generations still need all of them
+    workers = spawn_workers(queue_path, local_workers) if queue and local_workers else []
     top_parents = None
-    for gen in range(generations):
-        print(f"\n🧬 Training Generation {gen}")
-        train_generation(gen, n_agents=agents_per_gen, parents=top_parents, timesteps=timesteps if gen==0 else timesteps/4)
-        print(f"🏆 Running Tournament for Generation {gen}")
-        top_parents = tournament(gen, n_agents=agents_per_gen, games_per_match=10, number_best_agents=agents_to_keep)
+    try:
+        for gen in range(generations):
+            gen_timesteps = timesteps if gen == 0 else timesteps / 4
+            if queue:
+                print(f"\n🧬 Generation {gen}: training and tournament on the job queue")
+                top_parents = distributed_generation(queue, gen, n_agents=agents_per_gen, parents=top_parents,
+                                                     timesteps=gen_timesteps, games_per_match=10,
+                                                     number_best_agents=agents_to_keep, **agent_kwargs)
+                continue
+            print(f"\n🧬 Training Generation {gen}")
+            if pbt:
+                pbt_generation(gen, n_agents=agents_per_gen, parents=top_parents, timesteps=gen_timesteps,
+                               pbt_interval=pbt_interval, **agent_kwargs)
+            else:
+                train_generation(gen, n_agents=agents_per_gen, parents=top_parents, timesteps=gen_timesteps,
+                                 **agent_kwargs)
+            print(f"🏆 Running Tournament for Generation {gen}")
+            top_parents = tournament(gen, n_agents=agents_per_gen, games_per_match=10, number_best_agents=agents_to_keep,
+                                     store=agent_kwargs.get("store"))
+    finally:
+        stop_workers(workers)
 
 if __name__ == "__main__":
     evolve(generations=5, agents_per_gen=8, agents_to_keep=3, timesteps=800000)
-
@@ -0,0 +1,185 @@
+# Decide whether a new checkpoint should replace the served model, and promote it if so.
+#
+# The candidate plays the incumbent (the model the current-model pointer names) in worker
+# processes, alternating who moves first. After every finished game a sequential probability
+# ratio test weighs "the candidate is no stronger" (elo0) against "it is elo1 Elo stronger"; the
+# match stops as soon as either is accepted at the chosen error rates, which usually takes far
+# fewer games than a fixed-length match for clear results and more for close ones. Accepting
+# elo1 rewrites the pointer file atomically (write, then rename), and api_server, which polls
+# the pointer, reloads its "current" model version without a restart.
+#
+#   python boop_gate.py ppo_boop/gen_02/v8 --workers 8
+#
+# The pointer (ppo_boop/current.json) holds {"path": ..., "store": ..., "previous": ..., "promoted": ...,
+# "sprt": ...}; without one the incumbent is ppo_boop_v0. Checkpoints are looked up by name in the
+# --store checkpoint store (see checkpoint_store.py) first and loaded from their zip otherwise.
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+CURRENT_POINTER = "ppo_boop/current.json"
+DEFAULT_MODEL = "ppo_boop_v0"
+
+def read_pointer(pointer=CURRENT_POINTER):
+    """The pointer's record; {"path": DEFAULT_MODEL} while nothing has been promoted."""
+    if not os.path.exists(pointer):
+        return {"path": DEFAULT_MODEL}
+    with open(pointer) as f:
+        return json.load(f)
+
+def read_current(pointer=CURRENT_POINTER):
+    """Path of the model to serve (without .zip)."""
+    return read_pointer(pointer)["path"]
+
+def load_current(pointer=CURRENT_POINTER):
+    """The policy of the model to serve, from the checkpoint store it was promoted from if any."""
+    from checkpoint_store import load_checkpoint
+    record = read_pointer(pointer)
+    return load_checkpoint(record["path"], record.get("store"), policy_only=True)
+
+def promote(path, pointer=CURRENT_POINTER, sprt=None, store=None):
+    previous = read_current(pointer)
+    record = {"path": path, "store": store, "previous": previous, "promoted": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "sprt": sprt}
+    os.makedirs(os.path.dirname(os.path.abspath(pointer)), exist_ok=True)
+    with open(f"{pointer}.tmp", "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(f"{pointer}.tmp", pointer)  # readers see the old pointer or the new one, never half of it
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+class SPRT:
+    """Sequential test on per-game scores (1 win, 0.5 draw, 0 loss) of H0: elo0 vs H1: elo1.
+
+    Uses the normal approximation of the generalised SPRT: LLR = n (s1 - s0) (2 mean - s0 - s1) / (2 var).
+    """
+
+    def __init__(self, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05):
+        self.elo0, self.elo1 = elo0, elo1
+        self.s0, self.s1 = expected_score(elo0), expected_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.scores = []
+
+    def add(self, score):
+        self.scores.append(score)
+
+    def llr(self):
+        n = len(self.scores)
+        if n == 0:
+            return 0.0
+        mean = sum(self.scores) / n
+        # One pseudo win and loss keep the variance positive while every game so far ended alike
+        padded = self.scores + [0.0, 1.0]
+        var = sum((x - mean) ** 2 for x in padded) / len(padded)
+        return n * (self.s1 - self.s0) * (2 * mean - self.s0 - self.s1) / (2 * var)
+
+    def decision(self):
+        """"H1" (candidate is stronger), "H0" (it is not) or None (keep playing)."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def summary(self):
+        n = len(self.scores)
+        return {"games": n, "score": sum(self.scores) / n if n else None, "llr": round(self.llr(), 3),
+                "bounds": [round(self.lower, 3), round(self.upper, 3)], "elo0": self.elo0, "elo1": self.elo1,
+                "decision": self.decision()}
+
+# === Worker processes ===
+_players = None
+
+def _load_players(candidate, incumbent, store):
+    global _players
+    import torch
+    from checkpoint_store import load_checkpoint
+    torch.set_num_threads(1)  # one game per process; parallelism comes from the processes
+    _players = (load_checkpoint(candidate, store, policy_only=True), load_checkpoint(incumbent, store, policy_only=True))
+
+def _play_game(index):
+    # The candidate's score in one game; it moves first in even-numbered games. Illegal moves
+    # are replaced by a random legal one, as in boop_search.yardstick
+    import random
+    from boop_bots import choose_action
+    from boop_env import BoopEnv
+    sides = _players if index % 2 == 0 else _players[::-1]
+    env = BoopEnv()
+    while True:
+        mover = env.current_player_num
+        action = choose_action(sides[mover], env)
+        if not env.is_legal(action):
+            legal = env.legal_actions()
+            if not legal:
+                return 0.5
+            action = random.choice(legal)
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated:
+            return 1.0 if sides[mover] is _players[0] else 0.0
+        if truncated:
+            return 0.5
+
+def gate(candidate, incumbent=None, pointer=CURRENT_POINTER, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05,
+         max_games=1000, workers=None, verbose=1, store=None):
+    """Play candidate against incumbent until the SPRT decides; promote the candidate on H1.
+
+    Returns the SPRT summary; its decision is None if max_games ran out first (nothing is promoted).
+    """
+    if incumbent is None:
+        record = read_pointer(pointer)
+        incumbent, store = record["path"], store or record.get("store")
+    workers = workers or os.cpu_count()
+    sprt = SPRT(elo0, elo1, alpha, beta)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_load_players,
+                             initargs=(candidate, incumbent, store)) as pool:
+        # Keep two games per worker queued; stop submitting as soon as the test decides
+        submitted = min(2 * workers, max_games)
+        pending = {pool.submit(_play_game, i) for i in range(submitted)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sprt.add(future.result())
+            if sprt.decision() is not None:
+                for future in pending:
+                    future.cancel()
+                break
+            while submitted < max_games and len(pending) < 2 * workers:
+                pending.add(pool.submit(_play_game, submitted))
+                submitted += 1
+            if verbose and len(sprt.scores) % 20 == 0:
+                print(f"{len(sprt.scores)} games, LLR {sprt.llr():.2f} in ({sprt.lower:.2f}, {sprt.upper:.2f})")
+
+    result = sprt.summary()
+    result.update(candidate=candidate, incumbent=incumbent)
+    if result["decision"] == "H1":
+        promote(candidate, pointer, sprt=result, store=store)
+    if verbose:
+        verdict = {"H1": "promoted", "H0": "rejected", None: "undecided, not promoted"}[result["decision"]]
+        print(f"{candidate} vs {incumbent}: {verdict} after {result['games']} games "
+              f"(score {result['score']:.3f}, LLR {result['llr']})")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("candidate", help="checkpoint path without .zip, e.g. ppo_boop/gen_02/v8")
+    parser.add_argument("--incumbent", help="defaults to the model the pointer names")
+    parser.add_argument("--pointer", default=CURRENT_POINTER)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=20.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--store", help="checkpoint store to look the models up in, e.g. ppo_boop/store")
+    args = parser.parse_args()
+    gate(args.candidate, args.incumbent, args.pointer, args.elo0, args.elo1, args.alpha, args.beta,
+         args.max_games, args.workers, store=args.store)
@@ -0,0 +1,218 @@
+# SQLite-backed job queue for running boop_evolve across many worker processes.
+#
+# The coordinator (boop_evolve.evolve(queue_path=...)) submits one job per agent to train
+# and one per tournament shard, then waits for their results. Workers, on this host or any
+# host that sees the same directory, pull jobs until the queue is drained:
+#
+#   python boop_jobs.py worker ppo_boop/jobs.db            # run as many of these as you like
+#   python boop_evolve.py                                   # with evolve(queue_path="ppo_boop/jobs.db")
+#
+# Jobs are keyed, so submitting a job that already exists is a no-op and a restarted
+# coordinator just collects finished results. Resubmitting a key with a different payload
+# (a new run against an old queue file) raises instead of reusing the old results. A running job holds a lease that its worker
+# keeps renewing; if the worker dies the lease runs out and another worker takes the job
+# over, resuming training from the agent's last checkpoint.
+
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+class JobFailed(RuntimeError):
+    pass
+
+class JobQueue:
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending, running, done, failed
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                submitted REAL NOT NULL
+            )""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per call keeps the queue usable from threads and forked workers
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, key, kind, payload):
+        """Add a job; a no-op if key exists with the same payload, ValueError if with another one."""
+        encoded = json.dumps(payload)
+        with self._connect() as db:
+            inserted = db.execute("INSERT OR IGNORE INTO jobs (key, kind, payload, submitted) VALUES (?, ?, ?, ?)",
+                                  (key, kind, encoded, time.time())).rowcount
+            if not inserted:
+                existing = db.execute("SELECT kind, payload FROM jobs WHERE key = ?", (key,)).fetchone()
+                if existing["kind"] != kind or json.loads(existing["payload"]) != json.loads(encoded):
+                    raise ValueError(f"job {key} is already in {self.path} with different settings; "
+                                     "use a new queue file for a new run")
+        return key
+
+    def claim(self, worker):
+        """Take the oldest pending job, or one whose lease expired. Returns a dict or None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("""SELECT * FROM jobs
+                                    WHERE status = 'pending' OR (status = 'running' AND lease_until < ?)
+                                    ORDER BY submitted LIMIT 1""", (now,)).fetchone()
+                if row is not None:
+                    db.execute("""UPDATE jobs SET status = 'running', worker = ?, lease_until = ?,
+                                  attempts = attempts + 1 WHERE key = ?""",
+                               (worker, now + self.lease_seconds, row["key"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"key": row["key"], "kind": row["kind"], "payload": json.loads(row["payload"]),
+                "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, key, worker):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET lease_until = ? WHERE key = ? AND worker = ? AND status = 'running'",
+                       (time.time() + self.lease_seconds, key, worker))
+
+    def complete(self, key, worker, result):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'done', result = ?, lease_until = NULL WHERE key = ? AND worker = ?",
+                       (json.dumps(result), key, worker))
+
+    def fail(self, key, worker, error):
+        with self._connect() as db:
+            db.execute("""UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                          error = ?, lease_until = NULL WHERE key = ? AND worker = ?""",
+                       (self.max_attempts, error, key, worker))
+
+    def wait(self, keys, poll_seconds=5):
+        """Block until every job in keys is done and return their results in order."""
+        keys = list(keys)
+        while True:
+            with self._connect() as db:
+                rows = {r["key"]: r for r in db.execute(
+                    f"SELECT key, status, result, error FROM jobs WHERE key IN ({','.join('?' * len(keys))})", keys)}
+            failed = [k for k in keys if rows[k]["status"] == "failed"]
+            if failed:
+                raise JobFailed(f"{failed[0]}: {rows[failed[0]]['error']}")
+            if all(rows[k]["status"] == "done" for k in keys):
+                return [json.loads(rows[k]["result"]) for k in keys]
+            time.sleep(poll_seconds)
+
+    def counts(self):
+        with self._connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+# === Job handlers ===
+
+def run_train(payload):
+    from boop_evolve import train_agent
+    return {"path": train_agent(**payload)}
+
+def run_match(payload):
+    from boop_evolve import play_match
+    from checkpoint_store import load_checkpoint
+    models = {}
+    wins = []
+    for i, j in payload["pairs"]:
+        for k in (i, j):
+            if k not in models:
+                models[k] = load_checkpoint(payload["paths"][k], payload.get("store"), policy_only=True)
+        wins.append(play_match(models[i], models[j], games=payload["games"]))
+    return {"pairs": payload["pairs"], "wins": wins}
+
+HANDLERS = {"train": run_train, "match": run_match}
+
+def worker(queue_path, idle_exit=None, poll_seconds=5):
+    """Run jobs from the queue until it stays empty for idle_exit seconds (forever if None)."""
+    queue = JobQueue(queue_path)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    idle_since = time.time()
+    while True:
+        job = queue.claim(name)
+        if job is None:
+            if idle_exit is not None and time.time() - idle_since > idle_exit:
+                return
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{name}] {job['key']} (attempt {job['attempts']})")
+        stop = threading.Event()
+
+        def keep_alive(key=job["key"]):
+            while not stop.wait(queue.lease_seconds / 3):
+                queue.heartbeat(key, name)
+
+        beat = threading.Thread(target=keep_alive, daemon=True)
+        beat.start()
+        try:
+            result = HANDLERS[job["kind"]](job["payload"])
+        except Exception as e:
+            queue.fail(job["key"], name, f"{type(e).__name__}: {e}")
+            print(f"[{name}] {job['key']} failed: {e}")
+        else:
+            queue.complete(job["key"], name, result)
+        finally:
+            stop.set()
+            beat.join()
+        idle_since = time.time()
+
+def spawn_workers(queue_path, n, idle_exit=None):
+    """Start n local worker processes; returns their Popen handles.
+
+    With idle_exit=None the workers run until the caller terminates them (stop_workers).
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), "worker", queue_path]
+    if idle_exit is not None:
+        cmd += ["--idle-exit", str(idle_exit)]
+    return [subprocess.Popen(cmd) for _ in range(n)]
+
+def stop_workers(procs, timeout=10):
+    """Terminate worker processes started by spawn_workers; an interrupted job is simply re-leased."""
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Boop evolution job queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    w = sub.add_parser("worker", help="pull and run jobs")
+    w.add_argument("queue")
+    w.add_argument("--idle-exit", type=float, default=None, help="exit after this many idle seconds")
+    s = sub.add_parser("status", help="count jobs by status")
+    s.add_argument("queue")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        worker(args.queue, idle_exit=args.idle_exit)
+    else:
+        print(JobQueue(args.queue).counts())
@@ -0,0 +1,67 @@
+# League of opponents for SelfPlayBoopEnv, sampled per episode with prioritized
+# fictitious self-play (PFSP): opponents the learner still loses to are picked more often.
+#
+#   league = League()
+#   league.add_checkpoint("ppo_boop/gen_01/v3")
+#   league.add("random", RandomOpponent())
+#   env = SelfPlayBoopEnv(league=league)
+#   model = PPO("MlpPolicy", env)
+#   league.add("self", model)             # the learner itself, always up to date
+#
+# Checkpoints are loaded once per process and shared by every league, so building a
+# league per agent or per generation costs no extra disk reads.
+
+import random
+
+from checkpoint_store import load_checkpoint
+
+_RESIDENT = {}
+
+def load_resident(path, store=None):
+    # store: a checkpoint_store directory to look path up in before falling back to the zip
+    if path not in _RESIDENT:
+        _RESIDENT[path] = load_checkpoint(path, store, policy_only=True)
+    return _RESIDENT[path]
+
+class League:
+    def __init__(self, weighting="hard", power=2.0):
+        # weighting: "hard" favours opponents we lose to, "variance" favours even matchups,
+        # "uniform" ignores results
+        self.weighting = weighting
+        self.power = power
+        self.members = {}
+        self.wins = {}
+        self.games = {}
+
+    def add(self, name, opponent):
+        self.members[name] = opponent
+        self.wins.setdefault(name, 0.0)
+        self.games.setdefault(name, 0)
+
+    def add_checkpoint(self, path, store=None):
+        self.add(path, load_resident(path, store))
+
+    def win_rate(self, name):
+        # Beta(1, 1) prior so new members start at 0.5
+        return (self.wins[name] + 1) / (self.games[name] + 2)
+
+    def weight(self, name):
+        p = self.win_rate(name)
+        if self.weighting == "hard":
+            return (1 - p) ** self.power
+        if self.weighting == "variance":
+            return p * (1 - p)
+        return 1.0
+
+    def sample(self):
+        names = list(self.members)
+        name = random.choices(names, weights=[self.weight(n) for n in names])[0]
+        return name, self.members[name]
+
+    def report(self, name, score):
+        # score from the learner's point of view: 1 win, 0.5 draw, 0 loss
+        self.wins[name] += score
+        self.games[name] += 1
+
+    def summary(self):
+        return {name: (round(self.win_rate(name), 3), self.games[name]) for name in self.members}
@@ -0,0 +1,195 @@
+# Offline supervised pretraining for the PPO policy/value network.
+#
+# 1. record_games() plays games and writes memory-mapped shards of
+#    (obs, mask, action, outcome) under a directory:
+#       shard_000.obs.npy      float32 (N, 6, 6, 5)
+#       shard_000.mask.npy     bool    (N, 144)  legal actions, see boop_env.N_ACTIONS
+#       shard_000.action.npy   int8    (N, 4)    target action
+#       shard_000.outcome.npy  float32 (N,)      +1 player 0 won, -1 player 0 lost, 0 unfinished
+#    Only player 0's positions are kept: the observation has no side-to-move plane and
+#    SelfPlayBoopEnv trains the network as player 0, so player 1's moves would teach it
+#    contradictory targets for the same board.
+# 2. ShardDataset streams minibatches out of the shards without loading them into RAM.
+# 3. pretrain() fits the policy to the target actions (cross entropy over the legal moves)
+#    and the value head to the outcomes (MSE) before RL fine-tuning with model.learn().
+
+import glob
+import os
+import random
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset
+
+from boop_env import BoopEnv
+from boop_bots import choose_action
+from policy_analysis import joint_log_probs, action_dims
+
+def _choose(player, env):
+    # Retry a sampling player a few times, then fall back to a random legal move
+    for _ in range(20):
+        action = choose_action(player, env)
+        if env.is_legal(action):
+            return action
+    return random.choice(env.legal_actions())
+
+def _write_shard(out_dir, index, obs, mask, action, outcome):
+    # Every file goes to a temporary name first and the .obs file, which is how ShardDataset
+    # finds shards, is renamed into place last: a crash never leaves a partial shard
+    prefix = os.path.join(out_dir, f"shard_{index:03}")
+    parts = (("mask", mask, bool), ("action", action, np.int8), ("outcome", outcome, np.float32),
+             ("obs", obs, np.float32))
+    for name, data, dtype in parts:
+        arr = np.lib.format.open_memmap(f"{prefix}.{name}.tmp.npy", mode="w+", dtype=dtype, shape=data.shape)
+        arr[:] = data
+        arr.flush()
+        del arr
+    for name, _, _ in parts:
+        os.replace(f"{prefix}.{name}.tmp.npy", f"{prefix}.{name}.npy")
+
+def record_games(out_dir, player, n_games=100, teacher=None, shard_size=50_000, max_plies=300):
+    """Play n_games of player against itself and write training shards to out_dir.
+
+    Only positions where player 0 is to move are recorded, labelled with the result from
+    player 0's side. If a teacher is given (e.g. a search player), its move in each such
+    position is stored as the target instead of the move that was played.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    shard_index = len(glob.glob(os.path.join(out_dir, "shard_*.obs.npy")))
+    buf = {"obs": [], "mask": [], "action": [], "outcome": []}
+
+    def flush():
+        nonlocal shard_index
+        if not buf["obs"]:
+            return
+        _write_shard(out_dir, shard_index, np.stack(buf["obs"]), np.stack(buf["mask"]),
+                     np.array(buf["action"], dtype=np.int8), np.array(buf["outcome"], dtype=np.float32))
+        shard_index += 1
+        for v in buf.values():
+            v.clear()
+
+    env = BoopEnv()
+    for _ in range(n_games):
+        env.reset()
+        recorded = 0
+        winner = None
+        for _ in range(max_plies):
+            mover = env.current_player_num
+            action = _choose(player, env)
+            if mover == 0:
+                target = _choose(teacher, env) if teacher is not None else action
+                buf["obs"].append(env.observation.astype(np.float32))
+                buf["mask"].append(env.legal_action_mask())
+                buf["action"].append(target)
+                recorded += 1
+            _, reward, done, truncated, _ = env.step(action)
+            if done:
+                winner = mover if reward == 1 else 1 - mover
+                break
+            if truncated:
+                break  # draw
+        outcome = 0.0 if winner is None else (1.0 if winner == 0 else -1.0)
+        buf["outcome"].extend([outcome] * recorded)
+        if len(buf["obs"]) >= shard_size:
+            flush()
+    flush()
+
+class ShardDataset(IterableDataset):
+    """Streams shuffled minibatches from memory-mapped shards, one shard at a time."""
+
+    def __init__(self, shard_dir, batch_size=256, shuffle=True):
+        super().__init__()
+        self.prefixes = sorted(p[:-len(".obs.npy")] for p in glob.glob(os.path.join(shard_dir, "shard_*.obs.npy")))
+        if not self.prefixes:
+            raise FileNotFoundError(f"No shards found in {shard_dir}")
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def __len__(self):
+        return sum(int(np.ceil(len(np.load(f"{p}.outcome.npy", mmap_mode="r")) / self.batch_size))
+                   for p in self.prefixes)
+
+    def __iter__(self):
+        prefixes = list(self.prefixes)
+        info = torch.utils.data.get_worker_info()
+        if info is not None:
+            prefixes = prefixes[info.id::info.num_workers]
+        if self.shuffle:
+            random.shuffle(prefixes)
+        for prefix in prefixes:
+            obs = np.load(f"{prefix}.obs.npy", mmap_mode="r")
+            mask = np.load(f"{prefix}.mask.npy", mmap_mode="r")
+            action = np.load(f"{prefix}.action.npy", mmap_mode="r")
+            outcome = np.load(f"{prefix}.outcome.npy", mmap_mode="r")
+            order = np.random.permutation(len(obs)) if self.shuffle else np.arange(len(obs))
+            for start in range(0, len(order), self.batch_size):
+                idx = np.sort(order[start:start + self.batch_size])  # sorted reads are kinder to the page cache
+                yield (torch.from_numpy(np.ascontiguousarray(obs[idx])),
+                       torch.from_numpy(np.ascontiguousarray(mask[idx])),
+                       torch.from_numpy(action[idx].astype(np.int64)),
+                       torch.from_numpy(np.ascontiguousarray(outcome[idx])))
+
+def masked_log_prob(policy, obs, mask, action):
+    """Log probability of each target action among the legal moves only.
+
+    Bots and the RL env never play an illegal move, so the cross entropy is taken over the
+    policy renormalised on the recorded legal-move mask rather than over all 144 actions.
+    """
+    joint = joint_log_probs(policy.get_distribution(obs).distribution).masked_fill(~mask, -torch.inf)
+    index = np.ravel_multi_index(tuple(action.cpu().numpy().T), action_dims(policy.action_space))
+    index = torch.as_tensor(index, device=action.device)
+    return torch.log_softmax(joint, dim=1).gather(1, index[:, None]).squeeze(1)
+
+def pretrain(model, shard_dir, epochs=1, batch_size=256, learning_rate=3e-4, vf_coef=0.5, num_workers=0, verbose=1):
+    """Supervised warm start of model.policy from shards in shard_dir. Returns mean loss per epoch."""
+    policy = model.policy
+    policy.set_training_mode(True)
+    optimizer = torch.optim.Adam(policy.parameters(), lr=learning_rate)
+    loader = DataLoader(ShardDataset(shard_dir, batch_size=batch_size), batch_size=None,
+                        num_workers=num_workers, pin_memory=policy.device.type == "cuda")
+    history = []
+    for epoch in range(epochs):
+        total, batches = 0.0, 0
+        for obs, mask, action, outcome in loader:
+            if tuple(obs.shape[1:]) != policy.observation_space.shape:
+                obs = obs.permute(0, 3, 1, 2)  # shards are (6, 6, 5); channel-first for BoopCnnPolicy
+            obs, mask = obs.to(policy.device), mask.to(policy.device)
+            action, outcome = action.to(policy.device), outcome.to(policy.device)
+            log_prob = masked_log_prob(policy, obs, mask, action)
+            values = policy.predict_values(obs)
+            loss = -log_prob.mean() + vf_coef * torch.nn.functional.mse_loss(values.flatten(), outcome)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(policy.parameters(), model.max_grad_norm)
+            optimizer.step()
+            total += loss.item()
+            batches += 1
+        history.append(total / max(batches, 1))
+        if verbose:
+            print(f"pretrain epoch {epoch}: loss {history[-1]:.4f} over {batches} batches")
+    policy.set_training_mode(False)
+    return history
+
+if __name__ == "__main__":
+    import argparse
+    from stable_baselines3 import PPO
+
+    parser = argparse.ArgumentParser(description="Record Boop games into shards or pretrain a PPO model on them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("model")
+    rec.add_argument("out_dir")
+    rec.add_argument("--games", type=int, default=100)
+    pre = sub.add_parser("pretrain")
+    pre.add_argument("shard_dir")
+    pre.add_argument("out")
+    pre.add_argument("--epochs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_games(args.out_dir, PPO.load(args.model), n_games=args.games)
+    else:
+        from boop_selfplay import SelfPlayBoopEnv, RandomOpponent
+        model = PPO("MlpPolicy", SelfPlayBoopEnv(opponent_model=RandomOpponent()), verbose=1)
+        pretrain(model, args.shard_dir, epochs=args.epochs)
+        model.save(args.out)
@@ -0,0 +1,177 @@
+# The rules of Boop in plain Python, shared by the server and the Brython client.
+#
+# BoopEnv is built on numpy, which Brython cannot import, so the browser used to send every
+# click to the server just to learn whether it was legal, then diffed boards to find out what
+# was booped or promoted. This module has no imports: api_server serves it to the client as
+# /python/boop_rules.py, where it validates clicks and predicts the outcome of a move before
+# the server answers. The server stays authoritative; it reports the same effects for every
+# move, computed with this module, and the client redraws from the server's state.
+#
+#   position = Position.from_state(response["state"])  # or Position.from_env(env)
+#   if position.is_legal(action):
+#       after, effects = position.play(action)
+#
+# Cells are 0 when empty, else 1 + 2 * player + is_cat (the encoding of BoopEnv.position_key).
+# Run this file to check it against BoopEnv on random games.
+
+EMPTY = 0
+PLACE, REMOVE = 0, 1
+KITTEN, CAT = 0, 1
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+def cell_code(player, is_cat):
+    return 1 + 2 * player + (1 if is_cat else 0)
+
+def cell_owner(cell):
+    return (cell - 1) // 2
+
+def cell_is_cat(cell):
+    return cell != EMPTY and (cell - 1) % 2 == 1
+
+class Position:
+    def __init__(self, grid, stock, player, pieces=8):
+        # grid: rows of cell codes; stock: per player {"kitten": n, "cat": n}
+        self.grid = grid
+        self.stock = stock
+        self.player = player
+        self.pieces = pieces
+        self.rows, self.cols = len(grid), len(grid[0])
+
+    @classmethod
+    def from_state(cls, state, pieces=8):
+        """From BoopEnv.get_state() (as sent to the client): board cells are [p0, p1, cat, ...] planes."""
+        grid = [[EMPTY if not (cell[0] or cell[1]) else cell_code(0 if cell[0] else 1, cell[2])
+                 for cell in row] for row in state["board"]]
+        stock = [dict(state["stock"][str(p)]) for p in (0, 1)]
+        return cls(grid, stock, state["current_player"], pieces)
+
+    @classmethod
+    def from_env(cls, env):
+        grid = [[EMPTY if k is None else cell_code(k.player, k.is_cat) for k in row] for row in env.board]
+        return cls(grid, [dict(p.stock) for p in env.players], env.current_player_num, env.pieces)
+
+    def copy(self):
+        return Position([list(row) for row in self.grid], [dict(s) for s in self.stock], self.player, self.pieces)
+
+    def to_board(self):
+        """Board cells as [p0, p1, cat], the leading planes of get_state()["board"]."""
+        return [[[int(c != EMPTY and cell_owner(c) == 0), int(c != EMPTY and cell_owner(c) == 1),
+                  int(cell_is_cat(c))] for c in row] for row in self.grid]
+
+    def on_board(self, player):
+        return sum(1 for row in self.grid for c in row if c != EMPTY and cell_owner(c) == player)
+
+    def inside(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def is_legal(self, action):
+        action_type, row, col, piece_type = action
+        if not self.inside(row, col):
+            return False
+        stock = self.stock[self.player]
+        cell = self.grid[row][col]
+        if action_type == PLACE:
+            return cell == EMPTY and stock["cat" if piece_type == CAT else "kitten"] > 0
+        # Graduating a kitten or taking back a cat: only with every piece out and no cat in stock
+        if action_type != REMOVE or cell == EMPTY or cell_owner(cell) != self.player:
+            return False
+        if self.on_board(self.player) < self.pieces or stock["cat"] != 0:
+            return False
+        return piece_type == (CAT if cell_is_cat(cell) else KITTEN)
+
+    def legal_actions(self):
+        return [(a, r, c, t) for r in range(self.rows) for c in range(self.cols)
+                for t in (KITTEN, CAT) for a in (PLACE, REMOVE) if self.is_legal((a, r, c, t))]
+
+    def lines(self, player, only_cats):
+        """Cells of every three in a row of player's pieces (cats only if only_cats), without duplicates."""
+        found = []
+        def counts(r, c):
+            cell = self.grid[r][c] if self.inside(r, c) else EMPTY
+            return cell != EMPTY and cell_owner(cell) == player and (cell_is_cat(cell) or not only_cats)
+        for r in range(self.rows):
+            for c in range(self.cols):
+                for dr, dc in DIRECTIONS:
+                    line = [(r + i * dr, c + i * dc) for i in range(3)]
+                    if all(counts(pr, pc) for pr, pc in line):
+                        found += [cell for cell in line if cell not in found]
+        return found
+
+    def play(self, action):
+        """(position after action, effects); effects lists boops, promotions and the winning line.
+
+        boops: {"from": [r, c], "to": [r, c] or None if pushed off, "player", "cat"}
+        promotions: kittens that left the board to become cats
+        winning: the three-cat lines, or None
+        """
+        after = self.copy()
+        grid, stock = after.grid, after.stock[self.player]
+        action_type, row, col, piece_type = action
+        effects = {"boops": [], "promotions": [], "winning": None}
+
+        if action_type == REMOVE:
+            # Graduation keeps the turn, as in BoopEnv
+            grid[row][col] = EMPTY
+            stock["cat"] += 1
+            return after, effects
+
+        stock["cat" if piece_type == CAT else "kitten"] -= 1
+        grid[row][col] = booper = cell_code(self.player, piece_type == CAT)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                r, c = row + dr, col + dc
+                if (dr == 0 and dc == 0) or not after.inside(r, c) or grid[r][c] == EMPTY:
+                    continue
+                boopee = grid[r][c]
+                if cell_is_cat(boopee) and not cell_is_cat(booper):
+                    continue  # kittens cannot push cats
+                nr, nc = r + dr, c + dc
+                if after.inside(nr, nc):
+                    if grid[nr][nc] != EMPTY:
+                        continue  # blocked
+                    grid[nr][nc], to = boopee, [nr, nc]
+                else:
+                    after.stock[cell_owner(boopee)]["cat" if cell_is_cat(boopee) else "kitten"] += 1
+                    to = None
+                grid[r][c] = EMPTY
+                effects["boops"].append({"from": [r, c], "to": to, "player": cell_owner(boopee),
+                                         "cat": cell_is_cat(boopee)})
+
+        for r, c in after.lines(self.player, only_cats=False):
+            if not cell_is_cat(grid[r][c]):
+                grid[r][c] = EMPTY
+                stock["cat"] += 1
+                effects["promotions"].append([r, c])
+
+        winning = after.lines(self.player, only_cats=True)
+        if winning:
+            effects["winning"] = [[r, c] for r, c in winning]
+        else:
+            after.player = 1 - self.player
+        return after, effects
+
+if __name__ == "__main__":
+    # Cross-check against BoopEnv: same legal moves and same positions over random games
+    import random
+    from boop_env import BoopEnv
+
+    env = BoopEnv(max_plies=None, max_repetitions=None)
+    moves = 0
+    for game in range(200):
+        env.reset()
+        for ply in range(300):
+            position = Position.from_env(env)
+            legal = env.legal_actions()
+            assert sorted(position.legal_actions()) == sorted(legal), (game, ply)
+            if not legal:
+                break
+            action = random.choice(legal)
+            after, effects = position.play(action)
+            _, _, terminated, _, info = env.step(action)
+            expected = Position.from_env(env)
+            assert (after.grid, after.stock, after.player) == (expected.grid, expected.stock, expected.player), (game, ply)
+            assert bool(effects["winning"]) == terminated
+            moves += 1
+            if terminated:
+                break
+    print(f"boop_rules agrees with BoopEnv on {moves} moves")
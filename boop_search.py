@@ -0,0 +1,207 @@
+# Alpha-beta search player for Boop.
+#
+# Negamax with alpha-beta pruning and iterative deepening under a hard per-move time
+# budget: the clock is checked on every node and before every root move, and the search
+# stops safety_margin seconds before the budget runs out. Moves are searched tactical-first
+# (wins, promotions, boop-offs, as scored by boop_bots.GreedyOpponent), then killer moves
+# and the history heuristic. The search plays moves directly on the live BoopEnv through
+# push()/pop() and always leaves it as it found it.
+#
+#   player = AlphaBetaPlayer(time_limit=0.5)
+#   action = player.choose_move(env)          # or boop_bots.choose_action(player, env)
+
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from boop_env import N_ACTIONS, index_to_action
+from boop_bots import GreedyOpponent, board_tables
+
+WIN = 100_000.0
+
+class _Timeout(Exception):
+    pass
+
+def encode_board(env, player):
+    """Flat int8 board from player's point of view: +1/+2 own kitten/cat, -1/-2 opponent's."""
+    board = np.zeros(env.rows * env.cols, dtype=np.int8)
+    for i, piece in enumerate(env.board.flat):
+        if piece is not None:
+            board[i] = (2 if piece.is_cat else 1) * (1 if piece.player == player else -1)
+    return board
+
+@lru_cache(maxsize=None)
+def centre_bonus(rows, cols):
+    # Centre cells are safer: pieces on the rim are the ones that get booped off
+    r, c = np.indices((rows, cols))
+    ring = np.minimum.reduce([r, c, rows - 1 - r, cols - 1 - c]).ravel()
+    return np.minimum(ring, 2) * 0.5
+
+CENTRE_BONUS = centre_bonus(6, 6)
+
+def evaluate(env, player):
+    """Static score of the position for player (positive is good)."""
+    board = encode_board(env, player)
+    own, opp = env.players[player], env.players[1 - player]
+    score = 0.0
+    # Material: cats win games, so count them wherever they are
+    score += 6.0 * (np.count_nonzero(board == 2) + own.stock['cat'])
+    score -= 6.0 * (np.count_nonzero(board == -2) + opp.stock['cat'])
+    score += 1.0 * np.count_nonzero(board == 1) - 1.0 * np.count_nonzero(board == -1)
+    bonus = centre_bonus(env.rows, env.cols)
+    score += bonus @ (board > 0) - bonus @ (board < 0)
+    # Lines: two in a row with the third cell free threaten a promotion, two cats a win
+    lines = board[board_tables(env.rows, env.cols)[0]]
+    open_line = (lines == 0).sum(1) == 1
+    score += 4.0 * np.count_nonzero(open_line & ((lines > 0).sum(1) == 2))
+    score -= 4.0 * np.count_nonzero(open_line & ((lines < 0).sum(1) == 2))
+    score += 15.0 * np.count_nonzero(open_line & ((lines == 2).sum(1) == 2))
+    score -= 15.0 * np.count_nonzero(open_line & ((lines == -2).sum(1) == 2))
+    return score
+
+class AlphaBetaPlayer:
+    uses_env = True
+
+    def __init__(self, time_limit=0.5, max_depth=12, ordering_depth=2, safety_margin=0.02):
+        self.time_limit = time_limit
+        # The search stops safety_margin seconds early, leaving time to unwind and return the move
+        self.safety_margin = safety_margin
+        self.max_depth = max_depth
+        # Tactical (greedy) ordering costs a vectorized one-ply sweep, so it is only used on
+        # nodes with at least ordering_depth plies left; cheaper killer/history below that
+        self.ordering_depth = ordering_depth
+        self.greedy = GreedyOpponent()
+        self.history = np.zeros(N_ACTIONS)
+        self.killers = {}
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def choose_move(self, env):
+        self.deadline = time.perf_counter() + max(self.time_limit - self.safety_margin, 0.0)
+        self.history *= 0.5  # keep some history between moves, but let it fade
+        self.killers = {}
+        self.nodes = 0
+        self.dims = env.action_dims
+        if len(self.history) != int(np.prod(self.dims)):
+            self.history = np.zeros(int(np.prod(self.dims)))  # a different board size
+        root_moves = self._ordered_moves(env, 0, self.max_depth, timed=False)  # needed for the fallback move
+        if not root_moves:
+            return index_to_action(0, self.dims)  # no legal move; callers fall back as for any illegal action
+        best = root_moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._root(env, depth, root_moves)
+            except _Timeout:
+                break
+            best, self.depth_reached = move, depth
+            # Search the previous best move first next iteration
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) >= WIN - self.max_depth:
+                break  # forced result found, deeper search cannot change it
+        return index_to_action(best, self.dims)
+
+    def _root(self, env, depth, moves):
+        alpha, best_move = -np.inf, moves[0]
+        mover = env.current_player_num
+        for move in moves:
+            self._check_time()
+            score = self._child(env, move, mover, depth, alpha, np.inf, 0)
+            if score > alpha:
+                alpha, best_move = score, move
+        return alpha, best_move
+
+    def _child(self, env, move, mover, depth, alpha, beta, ply):
+        _, done, _ = env.push(index_to_action(move, self.dims))
+        try:
+            if done:
+                return WIN - ply  # the mover made three cats in a row
+            if env.current_player_num == mover:
+                # Graduations keep the turn, so the same side moves again
+                return self._search(env, depth - 1, alpha, beta, ply + 1)
+            return -self._search(env, depth - 1, -beta, -alpha, ply + 1)
+        finally:
+            env.pop()
+
+    def _search(self, env, depth, alpha, beta, ply):
+        self.nodes += 1
+        self._check_time()
+        mover = env.current_player_num
+        if depth == 0:
+            return evaluate(env, mover)
+        moves = self._ordered_moves(env, ply, depth)
+        if not moves:
+            return 0.0
+        best = -np.inf
+        for move in moves:
+            score = self._child(env, move, mover, depth, alpha, beta, ply)
+            if score > best:
+                best = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                killers = self.killers.setdefault(ply, [])
+                if move not in killers:
+                    killers.insert(0, move)
+                    del killers[2:]
+                self.history[move] += depth * depth
+                break
+        return best
+
+    def _check_time(self):
+        # On every node: each one costs an evaluation or a tactical sweep, far more than the clock
+        if time.perf_counter() > self.deadline:
+            raise _Timeout
+
+    def _ordered_moves(self, env, ply, depth, timed=True):
+        mask = env.legal_action_mask()
+        moves = np.flatnonzero(mask)
+        if len(moves) == 0:
+            return []
+        key = self.history[moves].copy()
+        for rank, killer in enumerate(self.killers.get(ply, [])):
+            key[moves == killer] += 1e6 * (2 - rank)
+        if depth >= self.ordering_depth:
+            if timed:
+                self._check_time()
+            tactical = self.greedy.evaluate(env.planes, env.current_player_num)[moves]
+            key += 1e7 * tactical
+        return [int(m) for m in moves[np.argsort(-key, kind="stable")]]
+
+def yardstick(model_paths, games=10, time_limit=0.2):
+    """Score of each PPO checkpoint against a fixed-budget AlphaBetaPlayer (wins + draws / 2, per game)."""
+    from stable_baselines3 import PPO
+    from boop_env import BoopEnv
+    from boop_bots import choose_action
+
+    searcher = AlphaBetaPlayer(time_limit=time_limit)
+    results = {}
+    for path in model_paths:
+        model = PPO.load(path)
+        wins = 0
+        for game in range(games):
+            env = BoopEnv()
+            sides = (model, searcher) if game % 2 == 0 else (searcher, model)
+            for _ in range(300):
+                mover = env.current_player_num
+                action = choose_action(sides[mover], env)
+                if not env.is_legal(action):
+                    legal = env.legal_actions()
+                    if not legal:
+                        break
+                    action = legal[np.random.randint(len(legal))]
+                _, reward, done, truncated, _ = env.step(action)
+                if done:
+                    wins += sides[mover] is model
+                    break
+                if truncated:
+                    wins += 0.5
+                    break
+        results[path] = wins / games
+        print(f"{path}: {results[path]:.2f} vs alpha-beta ({time_limit}s/move)")
+    return results
+
+if __name__ == "__main__":
+    import glob
+    yardstick(sorted(p[:-4] for p in glob.glob("ppo_boop/gen_*/v*.zip")))
@@ -2,18 +2,25 @@ from stable_baselines3 import PPO
 import gymnasium as gym
 import numpy as np
 from boop_env import BoopEnv
+from boop_bots import UniformLegalOpponent, choose_action
 import random
 
 class SelfPlayBoopEnv(gym.Env):
-    def __init__(self, opponent_model=None):
+    def __init__(self, opponent_model=None, channel_first=False, league=None, **board):
         super().__init__()
-        self.env = BoopEnv()
+        # board: rows / cols / pieces for a smaller variant, passed through to BoopEnv
+        self.env = BoopEnv(channel_first=channel_first, **board)
         self.opponent_model = opponent_model
-        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(6, 6, 5), dtype=np.float32)
-        self.action_space = gym.spaces.MultiDiscrete([2, 6, 6, 2])
+        # league: a boop_league.League to draw a new opponent from every episode
+        self.league = league
+        self.opponent_name = None
+        self.observation_space = self.env.observation_space
+        self.action_space = self.env.action_space
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
+        if self.league is not None:
+            self.opponent_name, self.opponent_model = self.league.sample()
         return self.env.reset()
 
     def step(self, action):
@@ -28,7 +35,8 @@ class SelfPlayBoopEnv(gym.Env):
                 if legal_actions:
                     action = random.choice(legal_actions)
                 else:
-                    return self.env.get_observation(), reward, True, False, {"reason": "no_legal_moves"}
+                    self._report(winner=1)
+                    return self.env.observation.astype(np.float32), reward, True, False, {"reason": "no_legal_moves"}
 
             # Always advance the game state
             obs, env_reward, terminated, truncated, env_info = self.env.step(action)
@@ -38,11 +46,11 @@ class SelfPlayBoopEnv(gym.Env):
             info.update(env_info)
 
         else: # opponent
-            obs = self.env.observation
             retries = 0
             max_retries = 100
             while retries < max_retries:
-                opponent_action, _ = self.opponent_model.predict(obs, deterministic=False)
+                # scripted bots (boop_bots) get the legal-move mask and never need a retry
+                opponent_action = choose_action(self.opponent_model, self.env)
                 if self.env.is_legal(opponent_action):
                     obs, reward, terminated, truncated, info = self.env.step(opponent_action)
                     reward = -reward if reward != 0 else 0
@@ -63,13 +71,24 @@ class SelfPlayBoopEnv(gym.Env):
                     terminated = True
                     truncated = False
                     info = {"reason": "opponent_no_legal_moves"}
-
+                    self._report(winner=0)
+                    return self.env.observation.astype(np.float32), reward, terminated, truncated, info
+
+        if terminated:
+            # BoopEnv only terminates on a win, and the winner is the player who just moved
+            self._report(winner=self.env.current_player_num)
+        elif truncated:
+            self._report(winner=None)
         return obs, reward, terminated, truncated, info
 
-# Opponent is just a random agent
-class RandomOpponent:
-    def predict(self, obs, deterministic=True):
-        return SelfPlayBoopEnv().action_space.sample(), None
+    def _report(self, winner):
+        # Score the finished game for the league from its outcome (the learner is player 0),
+        # not from the shaped reward, which is -0.1 when a replaced illegal move wins
+        if self.league is not None:
+            self.league.report(self.opponent_name, 0.5 if winner is None else float(winner == 0))
+
+# Opponent is just a random agent (uniform over legal moves)
+RandomOpponent = UniformLegalOpponent
 
 from stable_baselines3.common.callbacks import BaseCallback
 
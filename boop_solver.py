@@ -0,0 +1,348 @@
+# Exact solver for small Boop variants (e.g. 4x4 with 3 pieces each).
+#
+# Every position reachable from the empty board is enumerated breadth-first, then solved
+# by retrograde passes: a position is a win if some move wins at once or leads to a lost
+# position for the opponent, and a loss if every move leads to a won one. Whatever is
+# still undecided when a pass changes nothing is a draw (both sides can keep the game
+# going forever). Pass p only trusts values settled before it, so the stored ply count
+# is the exact distance to the end under best play (quickest win, slowest loss). Only
+# the first pass looks at every position; after that a position can only change if one
+# of its children was settled in the previous pass, so pass p re-examines just the
+# parents of those (the edges table, filled during enumeration).
+#
+# Positions are stored in a SQLite table keyed by a 64-bit code of the canonical board
+# image (the 8 symmetries, as in boop_book) plus stock and side to move. Work runs in
+# chunks of `chunk` positions, each committed with its cursor, so memory stays bounded
+# and an interrupted run resumes where it stopped:
+#
+#   python boop_solver.py solve ppo_boop/solved_4x4_3.db 4 3      # rows=cols=4, 3 pieces
+#   python boop_solver.py score ppo_boop/solved_4x4_3.db ppo_boop/curriculum/4x4
+#
+# The solver follows the rules only; repetition and ply-limit draws (BoopEnv.max_plies,
+# max_repetitions) are not part of the game value.
+
+import contextlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from boop_engine import BoopEngine, load_env, make_batch_engine
+from boop_symmetry import N_SYMMETRIES, transform_obs
+
+WIN, LOSS, UNKNOWN = 1, -1, 0
+# Board code (-2..2, see boop_engine) + 2 -> base-5 digit; empty cells are 0
+_DIGIT = np.array([4, 3, 0, 1, 2], dtype=np.int64)
+
+class Solver:
+    def __init__(self, path, rows=4, cols=4, pieces=3, chunk=20_000, cache_mb=64):
+        if rows != cols:
+            raise ValueError("the solver keys positions by the square board's symmetries; use rows == cols")
+        if 5.0 ** (rows * cols) * (pieces + 1) ** 4 * 2 >= 2 ** 63:
+            raise ValueError(f"{rows}x{cols} with {pieces} pieces does not fit a 64-bit position key")
+        self.path = path
+        self.rows, self.cols, self.pieces = rows, cols, pieces
+        self.chunk = chunk
+        self.cache_mb = cache_mb
+        self._powers = 5 ** np.arange(rows * cols, dtype=np.int64)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS states (
+                key INTEGER PRIMARY KEY,
+                depth INTEGER NOT NULL,             -- plies from the empty board (first seen)
+                value INTEGER NOT NULL DEFAULT 0,   -- for the side to move: 1 win, -1 loss, 0 draw/unknown
+                plies INTEGER,                      -- plies to the end under best play
+                solved_pass INTEGER
+            )""")
+            db.execute("CREATE INDEX IF NOT EXISTS states_depth ON states (depth, key)")
+            db.execute("CREATE INDEX IF NOT EXISTS states_solved ON states (solved_pass)")
+            db.execute("""CREATE TABLE IF NOT EXISTS edges (
+                child INTEGER NOT NULL,
+                parent INTEGER NOT NULL,
+                PRIMARY KEY (child, parent)
+            ) WITHOUT ROWID""")
+            # Positions the current retrograde pass still has to look at
+            db.execute("CREATE TABLE IF NOT EXISTS frontier (key INTEGER PRIMARY KEY)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            variant = {"rows": rows, "cols": cols, "pieces": pieces}
+            for name, value in variant.items():
+                db.execute("INSERT OR IGNORE INTO meta VALUES (?, ?)", (name, value))
+            stored = {name: self._meta(db, name) for name in variant}
+            if stored != variant:
+                raise ValueError(f"{path} holds a different variant: {stored}")
+            if db.execute("SELECT 1 FROM states LIMIT 1").fetchone() and not self._meta(db, "edges", 0):
+                raise ValueError(f"{path} was enumerated without parent edges; solve the variant into a new file")
+            if not db.execute("SELECT 1 FROM states LIMIT 1").fetchone():
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('edges', 1)")
+                engine = BoopEngine(rows, cols, pieces)
+                start = self.encode(engine.board[None], engine.stock[None], np.array([0]))[0]
+                db.execute("INSERT INTO states (key, depth) VALUES (?, 0)", (int(start),))
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.execute(f"PRAGMA cache_size = -{self.cache_mb * 1024}")
+        db.execute("PRAGMA journal_mode = WAL")
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _meta(db, name, default=None):
+        row = db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    @staticmethod
+    def _set_meta(db, **values):
+        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", values.items())
+
+    # === Position keys ===
+
+    def encode(self, boards, stocks, players):
+        """Canonical keys (N,) int64 for N positions given as engine arrays."""
+        n = len(boards)
+        images = np.stack([transform_obs(boards, k, spatial_axes=(1, 2)) for k in range(N_SYMMETRIES)])
+        board_keys = _DIGIT[images.reshape(N_SYMMETRIES, n, -1).astype(np.int64) + 2] @ self._powers
+        base = self.pieces + 1
+        stock_keys = ((stocks[:, 0, 0].astype(np.int64) * base + stocks[:, 0, 1]) * base
+                      + stocks[:, 1, 0]) * base + stocks[:, 1, 1]
+        return (board_keys.min(0) * base ** 4 + stock_keys) * 2 + np.asarray(players, dtype=np.int64)
+
+    def decode(self, keys):
+        """Engine arrays (boards, stocks, placed, players) for an array of keys."""
+        keys = np.asarray(keys, dtype=np.int64)
+        base = self.pieces + 1
+        players = keys % 2
+        rest = keys // 2
+        stocks = np.empty((len(keys), 2, 2), dtype=np.int8)
+        for i in (3, 2, 1, 0):
+            stocks.reshape(len(keys), 4)[:, i] = rest % base
+            rest //= base
+        digits = (rest[:, None] // self._powers) % 5
+        boards = np.array([0, 1, 2, -1, -2], dtype=np.int8)[digits].reshape(len(keys), self.rows, self.cols)
+        placed = np.stack([np.stack([(boards == sign).sum((1, 2)), (boards == 2 * sign).sum((1, 2))], axis=1)
+                           for sign in (1, -1)], axis=1).astype(np.int8)
+        return boards, stocks, placed, players
+
+    def _children(self, keys):
+        """(parent index, action index, won, child key, same mover) for every legal move of keys."""
+        # make_batch_engine: numba kernels where available, BoopEnv's rules otherwise
+        boards, stocks, placed, players = self.decode(keys)
+        positions = make_batch_engine(len(keys), self.rows, self.cols, self.pieces)
+        positions.load(boards, stocks, placed, players)
+        parent, action = np.nonzero(positions.legal_masks())
+        children = make_batch_engine(len(parent), self.rows, self.cols, self.pieces)
+        children.load(boards[parent], stocks[parent], placed[parent], players[parent])
+        _, won = children.step(np.stack(np.unravel_index(action, (2, self.rows, self.cols, 2)), axis=1))
+        child_keys = self.encode(children.boards, children.stocks, children.players)
+        return parent, action, won, child_keys, children.players == players[parent]
+
+    # === Enumeration ===
+
+    def expand(self, verbose=True):
+        """Breadth-first enumeration of every reachable position; resumes from the last committed chunk."""
+        with self._connect() as db:
+            while not self._meta(db, "expanded", 0):
+                depth = self._meta(db, "expand_depth", 0)
+                cursor = self._meta(db, "expand_cursor", -1)
+                keys = [k for (k,) in db.execute("SELECT key FROM states WHERE depth = ? AND key > ? ORDER BY key LIMIT ?",
+                                                 (depth, cursor, self.chunk))]
+                if not keys:
+                    more = db.execute("SELECT 1 FROM states WHERE depth = ? LIMIT 1", (depth + 1,)).fetchone()
+                    db.execute("BEGIN")
+                    self._set_meta(db, expand_depth=depth + 1, expand_cursor=-1, expanded=int(more is None))
+                    db.execute("COMMIT")
+                    if verbose:
+                        total = db.execute("SELECT COUNT(*) FROM states").fetchone()[0]
+                        print(f"depth {depth} expanded, {total:,} positions so far")
+                    continue
+                keys = np.array(keys)
+                parent, _, won, child_keys, _ = self._children(keys)
+                edges = np.unique(np.stack([child_keys[~won], keys[parent[~won]]], axis=1), axis=0)
+                db.execute("BEGIN")
+                db.executemany("INSERT OR IGNORE INTO states (key, depth) VALUES (?, ?)",
+                               ((int(k), depth + 1) for k in np.unique(edges[:, 0])))
+                db.executemany("INSERT OR IGNORE INTO edges VALUES (?, ?)", edges.tolist())
+                self._set_meta(db, expand_cursor=keys[-1])
+                db.execute("COMMIT")
+
+    # === Retrograde passes ===
+
+    def solve(self, verbose=True):
+        """Expand if needed, then run retrograde passes until nothing changes."""
+        self.expand(verbose)
+        with self._connect() as db:
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS probe (key INTEGER PRIMARY KEY)")
+            while not self._meta(db, "solved", 0):
+                current = self._meta(db, "pass", 1)
+                if self._meta(db, "frontier_pass", 0) != current:
+                    self._fill_frontier(db, current)
+                cursor = self._meta(db, "pass_cursor", -1)
+                keys = [k for (k,) in db.execute("SELECT key FROM frontier WHERE key > ? ORDER BY key LIMIT ?",
+                                                 (cursor, self.chunk))]
+                if not keys:
+                    changes = self._meta(db, "pass_changes", 0)
+                    db.execute("BEGIN")
+                    self._set_meta(db, **{"pass": current + 1, "pass_cursor": -1, "pass_changes": 0,
+                                          "solved": int(changes == 0)})
+                    db.execute("COMMIT")
+                    if verbose:
+                        counts = dict(db.execute("SELECT value, COUNT(*) FROM states GROUP BY value").fetchall())
+                        print(f"pass {current}: {changes:,} positions settled "
+                              f"(win {counts.get(WIN, 0):,}, loss {counts.get(LOSS, 0):,}, open {counts.get(UNKNOWN, 0):,})")
+                    continue
+                settled = self._settle(db, np.array(keys), current)
+                db.execute("BEGIN")
+                db.executemany("UPDATE states SET value = ?, plies = ?, solved_pass = ? WHERE key = ?",
+                               ((value, plies, current, key) for key, value, plies in settled))
+                self._set_meta(db, pass_cursor=keys[-1], pass_changes=self._meta(db, "pass_changes", 0) + len(settled))
+                db.execute("COMMIT")
+
+    def _fill_frontier(self, db, current):
+        # Pass 1 looks at every position (for the immediate wins), later passes at the open
+        # parents of the positions the previous pass settled
+        db.execute("BEGIN")
+        db.execute("DELETE FROM frontier")
+        if current == 1:
+            db.execute("INSERT INTO frontier SELECT key FROM states WHERE value = 0")
+        else:
+            db.execute("""INSERT OR IGNORE INTO frontier
+                          SELECT e.parent FROM states c JOIN edges e ON e.child = c.key JOIN states p ON p.key = e.parent
+                          WHERE c.solved_pass = ? AND p.value = 0""", (current - 1,))
+        self._set_meta(db, frontier_pass=current)
+        db.execute("COMMIT")
+
+    def _lookup(self, db, keys, before_pass=None):
+        """Values and plies of keys (undecided, or decided in before_pass or later, read as UNKNOWN)."""
+        unique = np.unique(keys)
+        db.execute("DELETE FROM probe")
+        db.executemany("INSERT INTO probe VALUES (?)", ((int(k),) for k in unique))
+        rows = db.execute("""SELECT s.key, s.value, s.plies, s.solved_pass FROM probe JOIN states s USING (key)
+                             WHERE s.value != 0""").fetchall()
+        values, plies = np.zeros(len(unique), dtype=np.int64), np.zeros(len(unique), dtype=np.int64)
+        if rows:
+            found = np.array(rows, dtype=np.int64)
+            if before_pass is not None:
+                found = found[found[:, 3] < before_pass]
+            at = np.searchsorted(unique, found[:, 0])
+            values[at], plies[at] = found[:, 1], found[:, 2]
+        at = np.searchsorted(unique, keys)
+        return values[at], plies[at]
+
+    def _move_results(self, db, keys, before_pass=None):
+        # Result of every legal move for the side to move in its parent position
+        parent, action, won, child_keys, same = self._children(keys)
+        values, plies = self._lookup(db, child_keys, before_pass)
+        result = np.where(won, WIN, np.where(same, values, -values))
+        return parent, action, result, np.where(won, 0, plies) + 1
+
+    def _settle(self, db, keys, current):
+        parent, _, result, plies = self._move_results(db, keys, before_pass=current)
+        n = len(keys)
+        win_plies = np.full(n, np.iinfo(np.int64).max)
+        np.minimum.at(win_plies, parent[result == WIN], plies[result == WIN])
+        loss_plies = np.zeros(n, dtype=np.int64)
+        np.maximum.at(loss_plies, parent[result == LOSS], plies[result == LOSS])
+        moves = np.bincount(parent, minlength=n)
+        losses = np.bincount(parent[result == LOSS], minlength=n)
+        settled = []
+        for i in range(n):
+            if win_plies[i] != np.iinfo(np.int64).max:
+                settled.append((WIN, int(win_plies[i]), int(keys[i])))
+            elif moves[i] and losses[i] == moves[i]:
+                settled.append((LOSS, int(loss_plies[i]), int(keys[i])))
+        return [(key, value, plies) for value, plies, key in settled]
+
+    # === Using the table ===
+
+    def _engine_key(self, env):
+        engine = BoopEngine.from_env(env)
+        return self.encode(engine.board[None], engine.stock[None], np.array([engine.current_player_num]))
+
+    def value(self, env):
+        """(value, plies) of env's position for the side to move; value 0 is a draw. None if not in the table."""
+        with self._connect() as db:
+            row = db.execute("SELECT value, plies FROM states WHERE key = ?", (int(self._engine_key(env)[0]),)).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def best_moves(self, env):
+        """Boolean mask over env's actions: the moves that keep the game-theoretic value of the position."""
+        with self._connect() as db:
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS probe (key INTEGER PRIMARY KEY)")
+            _, action, result, _ = self._move_results(db, self._engine_key(env))
+        mask = np.zeros(2 * self.rows * self.cols * 2, dtype=bool)
+        if len(action):
+            mask[action[result == result.max()]] = True
+        return mask
+
+    def sample_positions(self, n):
+        """Up to n random positions from the table as BoopEnv games (for scoring agents)."""
+        with self._connect() as db:
+            keys = [k for (k,) in db.execute("SELECT key FROM states ORDER BY random() LIMIT ?", (n,))]
+        boards, stocks, placed, players = self.decode(keys)
+        return [self.to_env(boards[i], stocks[i], placed[i], players[i]) for i in range(len(keys))]
+
+    def to_env(self, board, stock, placed, player):
+        from boop_env import BoopEnv
+        env = BoopEnv(rows=self.rows, cols=self.cols, pieces=self.pieces)
+        load_env(env, board, stock, placed, player)
+        env.position_counts.clear()
+        return env
+
+    def move_accuracy(self, predictor, positions=1000):
+        """Fraction of sampled positions where predictor (model, bot or search player) picks a value-keeping move.
+
+        Positions where every legal move is equally good are skipped, since any move scores there.
+        """
+        from boop_bots import choose_action
+        from boop_env import action_to_index
+        good = total = 0
+        for env in self.sample_positions(positions):
+            mask = self.best_moves(env)
+            if np.array_equal(mask, env.legal_action_mask()):
+                continue
+            action = choose_action(predictor, env, deterministic=True)
+            total += 1
+            good += bool(env.is_legal(action) and mask[action_to_index(action, env.action_dims)])
+        return good / max(total, 1)
+
+    def verify(self, positions=500):
+        """Re-derive sampled values with BoopEnv's own rules and check the table agrees; returns positions checked."""
+        from boop_env import index_to_action
+        checked = 0
+        for env in self.sample_positions(positions):
+            entry = self.value(env)
+            results = []
+            for action in np.flatnonzero(env.legal_action_mask()):
+                mover = env.current_player_num
+                _, done, _ = env.push(index_to_action(int(action), env.action_dims))
+                if done:
+                    results.append(WIN)
+                else:
+                    child = self.value(env)
+                    assert child is not None, "child position missing from the table"
+                    results.append(child[0] if env.current_player_num == mover else -child[0])
+                env.pop()
+            expected = WIN if WIN in results else LOSS if results and all(r == LOSS for r in results) else UNKNOWN
+            assert entry[0] == expected, f"table says {entry[0]}, rules say {expected}"
+            checked += 1
+        return checked
+
+if __name__ == "__main__":
+    import sys
+    command, path = sys.argv[1], sys.argv[2]
+    if command == "solve":
+        size = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+        pieces = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+        start = time.perf_counter()
+        Solver(path, size, size, pieces).solve()
+        print(f"solved in {time.perf_counter() - start:.0f}s")
+    elif command == "score":
+        from stable_baselines3 import PPO
+        with sqlite3.connect(path) as db:
+            variant = dict(db.execute("SELECT name, value FROM meta WHERE name IN ('rows', 'cols', 'pieces')"))
+        solver = Solver(path, **variant)
+        for model_path in sys.argv[3:]:
+            print(f"{model_path}: {solver.move_accuracy(PPO.load(model_path)):.3f} optimal moves")
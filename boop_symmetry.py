@@ -0,0 +1,107 @@
+# Dihedral symmetry augmentation for Boop.
+#
+# The rules are invariant under the 8 symmetries of the square board (4 rotations,
+# each optionally mirrored), so every recorded (obs, action) pair stands for 8 equally
+# valid samples. Observations are (..., H, W, C) as produced by BoopEnv.observation
+# (pass spatial_axes=(-2, -1) for channel-first ones) and
+# actions are (..., 4) = (action_type, row, col, piece_type); only row/col move.
+
+import numpy as np
+import torch
+from stable_baselines3 import PPO
+from stable_baselines3.common.buffers import RolloutBuffer
+
+from boop_cnn import BoopCNN
+
+N_SYMMETRIES = 8
+
+def transform_obs(obs, k, spatial_axes=(-3, -2)):
+    """Apply symmetry k (0-7) to a single observation or a whole batch."""
+    out = np.rot90(obs, k % 4, axes=spatial_axes)
+    if k >= 4:
+        out = np.flip(out, axis=spatial_axes[1])
+    return out
+
+def transform_actions(actions, k, size=6):
+    """Apply symmetry k to the (row, col) part of one action or a batch of actions."""
+    actions = np.array(actions, copy=True)
+    row, col = actions[..., 1].copy(), actions[..., 2].copy()
+    # np.rot90 turns the cell (r, c) into (size - 1 - c, r), once per quarter turn
+    for _ in range(k % 4):
+        row, col = size - 1 - col, row
+    if k >= 4:
+        col = size - 1 - col
+    actions[..., 1], actions[..., 2] = row, col
+    return actions
+
+def augment_batch(obs, actions, spatial_axes=(-3, -2)):
+    """Return all 8 images of a batch, stacked symmetry-major: (8 * N, ...)."""
+    size = obs.shape[spatial_axes[0]]
+    all_obs = np.concatenate([transform_obs(obs, k, spatial_axes) for k in range(N_SYMMETRIES)])
+    all_actions = np.concatenate([transform_actions(actions, k, size) for k in range(N_SYMMETRIES)])
+    return all_obs, all_actions
+
+class SymmetricRolloutBuffer(RolloutBuffer):
+    """RolloutBuffer that hands PPO 8x the collected samples, one copy per board symmetry.
+
+    Advantages and returns carry over unchanged (the position is worth the same under
+    any symmetry). Old log-probs and values of the transformed copies are recomputed once
+    with the rollout policy, so the PPO ratio stays exact. Set `policy` before get().
+    """
+
+    policy = None
+    channel_first = None  # None: infer from obs_shape, which cannot tell (5, 5, 5) layouts apart
+
+    @property
+    def spatial_axes(self):
+        # (5, 6, 6) channel-first observations end in the two board axes, (6, 6, 5) do not
+        channel_first = self.obs_shape[-1] == self.obs_shape[-2] if self.channel_first is None else self.channel_first
+        return (-2, -1) if channel_first else (-3, -2)
+
+    def get(self, batch_size=None):
+        assert self.full, ""
+        if not self.generator_ready:
+            for tensor in ["observations", "actions", "values", "log_probs", "advantages", "returns"]:
+                self.__dict__[tensor] = self.swap_and_flatten(self.__dict__[tensor])
+            self._augment()
+            self.generator_ready = True
+
+        n_samples = len(self.observations)
+        indices = np.random.permutation(n_samples)
+        if batch_size is None:
+            batch_size = n_samples
+        start_idx = 0
+        while start_idx < n_samples:
+            yield self._get_samples(indices[start_idx : start_idx + batch_size])
+            start_idx += batch_size
+
+    def _augment(self):
+        n = len(self.observations)
+        self.observations, self.actions = augment_batch(self.observations, self.actions, self.spatial_axes)
+        self.observations = np.ascontiguousarray(self.observations)
+        self.advantages = np.tile(self.advantages, (N_SYMMETRIES, 1))
+        self.returns = np.tile(self.returns, (N_SYMMETRIES, 1))
+
+        values = [self.values]
+        log_probs = [self.log_probs]
+        with torch.no_grad():
+            for start in range(n, len(self.observations), n):
+                obs = self.to_torch(self.observations[start:start + n])
+                actions = self.to_torch(self.actions[start:start + n].astype(np.float32))
+                v, log_prob, _ = self.policy.evaluate_actions(obs, actions)
+                values.append(v.cpu().numpy().reshape(-1, 1))
+                log_probs.append(log_prob.cpu().numpy().reshape(-1, 1))
+        self.values = np.concatenate(values)
+        self.log_probs = np.concatenate(log_probs)
+
+class SymmetricPPO(PPO):
+    """PPO trained on symmetry-augmented rollouts. Drop-in for PPO(...) with SelfPlayBoopEnv."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("rollout_buffer_class", SymmetricRolloutBuffer)
+        super().__init__(*args, **kwargs)
+
+    def _setup_model(self):
+        super()._setup_model()
+        self.rollout_buffer.policy = self.policy
+        self.rollout_buffer.channel_first = isinstance(self.policy.features_extractor, BoopCNN)
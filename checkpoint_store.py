@@ -0,0 +1,311 @@
+# Content-addressed checkpoint store: every distinct tensor is written once, however many
+# checkpoints share it, and saving happens in a background thread.
+#
+# model.save() writes a full zip of every weight each time, blocking training while it does.
+# CheckpointStore.save() instead snapshots the model in memory (a copy of each tensor, so
+# training can carry on changing them) and returns a future; one writer thread then stores
+# each tensor as an .npy blob named by the SHA-256 of its contents and records the checkpoint
+# with its metadata in a SQLite index. Identical checkpoints, and tensors that did not change
+# between checkpoints, cost no extra disk space.
+#
+#   ppo_boop/store/index.db              name -> manifest, generation, parent, rating, timesteps
+#   ppo_boop/store/blobs/ab/abcd....npy  tensors; .pt optimizer states; .pkl model settings;
+#                                        .json manifests listing a checkpoint's blobs
+#
+#   store = CheckpointStore("ppo_boop/store")
+#   store.save(model, "gen_03/v2", generation=3, parent="gen_02/v0")   # returns at once
+#   policy = store.load_policy("gen_03/v2")     # lazy: tensors memory-mapped from the blobs
+#   model = store.load_model("gen_03/v2", env)  # complete model with optimizer, to resume training
+#   player = load_checkpoint("gen_03/v2", "ppo_boop/store", policy_only=True)  # store, else the zip
+#
+#   python checkpoint_store.py import ppo_boop_v*.zip ppo_boop/gen_*/v*.zip
+#   python checkpoint_store.py stats
+
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudpickle
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+from shared_weights import _no_schedule, build_policy
+
+class CheckpointStore:
+    def __init__(self, root="ppo_boop/store"):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-store")
+        self.pending = []
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY, manifest TEXT NOT NULL, generation INTEGER, parent TEXT,
+                rating REAL, timesteps INTEGER, created REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS checkpoints_by_generation ON checkpoints (generation, rating)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # === Blobs ===
+
+    def _blob_path(self, digest, ext):
+        return os.path.join(self.root, "blobs", digest[:2], digest + ext)
+
+    def _put(self, data, ext):
+        """Store bytes under their hash (once); returns the blob id "<hash><ext>"."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest, ext)
+        try:
+            os.utime(path)  # already stored: mark it as in use so a concurrent gc() keeps it
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        return digest + ext
+
+    def _put_array(self, array):
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array))  # the .npy header makes dtype and shape part of the hash
+        return self._put(buffer.getvalue(), ".npy")
+
+    def _get(self, blob):
+        digest, ext = os.path.splitext(blob)
+        with open(self._blob_path(digest, ext), "rb") as f:
+            return f.read()
+
+    def _map_array(self, blob):
+        digest, ext = os.path.splitext(blob)
+        return np.load(self._blob_path(digest, ext), mmap_mode="c")
+
+    # === Saving ===
+
+    def save(self, model, name, generation=None, parent=None, rating=None):
+        """Snapshot model now and store it as name in the background; returns a Future."""
+        policy = model.policy
+        snapshot = {
+            "tensors": {key: t.detach().cpu().numpy().copy() for key, t in policy.state_dict().items()},
+            "optimizer": copy.deepcopy(policy.optimizer.state_dict()),
+            "settings": cloudpickle.dumps({
+                "algo": type(model),
+                "data": _model_data(model),
+                "policy_class": type(policy),
+                "policy_params": {**policy._get_constructor_parameters(), "lr_schedule": _no_schedule},
+            }),
+        }
+        meta = (generation, parent, rating, int(model.num_timesteps))
+        future = self.writer.submit(self._write, name, snapshot, meta)
+        self.pending = [f for f in self.pending if not f.done()] + [future]
+        return future
+
+    def _write(self, name, snapshot, meta):
+        buffer = io.BytesIO()
+        torch.save(snapshot["optimizer"], buffer)
+        manifest = {
+            "tensors": {key: self._put_array(array) for key, array in snapshot["tensors"].items()},
+            "optimizer": self._put(buffer.getvalue(), ".pt"),
+            "settings": self._put(snapshot["settings"], ".pkl"),
+        }
+        manifest_blob = self._put(json.dumps(manifest, sort_keys=True).encode(), ".json")
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (name, manifest_blob, *meta, time.time()))
+        return name
+
+    def flush(self):
+        """Wait until every save so far is on disk (re-raising a failed save's error)."""
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.writer.shutdown()
+
+    # === Index ===
+
+    def info(self, name):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"no checkpoint named '{name}' in {self.root}")
+        return dict(row)
+
+    def __contains__(self, name):
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM checkpoints WHERE name = ?", (name,)).fetchone() is not None
+
+    def names(self, generation=None):
+        """Checkpoint names, best rated first within each generation."""
+        sql = "SELECT name FROM checkpoints"
+        params = ()
+        if generation is not None:
+            sql, params = sql + " WHERE generation = ?", (generation,)
+        with self._connect() as db:
+            return [row[0] for row in db.execute(sql + " ORDER BY generation, rating DESC, name", params)]
+
+    def set_rating(self, name, rating):
+        with self._connect() as db:
+            db.execute("UPDATE checkpoints SET rating = ? WHERE name = ?", (rating, name))
+
+    def remove(self, name):
+        """Forget a checkpoint; gc() then deletes the blobs nothing else uses."""
+        with self._connect() as db:
+            db.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+
+    def gc(self, min_age=60):
+        """Delete unreferenced blobs; returns how many were deleted.
+
+        Blobs written or reused in the last min_age seconds are kept: another process sharing
+        the store may have stored them for a checkpoint it has not indexed yet.
+        """
+        self.flush()
+        with self._connect() as db:
+            manifests = {row[0] for row in db.execute("SELECT manifest FROM checkpoints")}
+        live = set(manifests)
+        for blob in manifests:
+            manifest = json.loads(self._get(blob))
+            live.update(manifest["tensors"].values())
+            live.update((manifest["optimizer"], manifest["settings"]))
+        cutoff = time.time() - min_age
+        removed = 0
+        for directory, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for file in files:
+                path = os.path.join(directory, file)
+                if file not in live and not file.endswith(".tmp") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self):
+        """Checkpoints, blobs, bytes on disk and bytes the checkpoints would take stored separately."""
+        with self._connect() as db:
+            manifests = [row[0] for row in db.execute("SELECT manifest FROM checkpoints")]
+        stored = {}
+        for directory, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for file in files:
+                stored[file] = os.path.getsize(os.path.join(directory, file))
+        logical = 0
+        for blob in manifests:
+            manifest = json.loads(self._get(blob))
+            blobs = [*manifest["tensors"].values(), manifest["optimizer"], manifest["settings"], blob]
+            logical += sum(stored.get(b, 0) for b in blobs)
+        return {"checkpoints": len(manifests), "blobs": len(stored), "stored_bytes": sum(stored.values()),
+                "logical_bytes": logical}
+
+    # === Loading ===
+
+    def _manifest(self, name):
+        manifest = json.loads(self._get(self.info(name)["manifest"]))
+        return manifest, pickle.loads(self._get(manifest["settings"]))
+
+    def load_policy(self, name):
+        """The checkpoint's policy for inference; its tensors are copy-on-write maps of the blobs,
+        so nothing is read from disk until a forward pass touches it."""
+        manifest, settings = self._manifest(name)
+        state = {key: self._map_array(blob) for key, blob in manifest["tensors"].items()}
+        return build_policy(settings["policy_class"], settings["policy_params"], state)
+
+    def load_model(self, name, env=None, device="auto"):
+        """The complete model with its optimizer state, as algo.load(path, env) would give it."""
+        manifest, settings = self._manifest(name)
+        algo, data = settings["algo"], dict(settings["data"])
+        if env is not None:
+            env = algo._wrap_env(env, data["verbose"])
+            data["_last_obs"] = None  # forces a reset on the new env
+            data["n_envs"] = env.num_envs
+        model = algo(policy=data["policy_class"], env=env, device=device, _init_setup_model=False)
+        model.__dict__.update(data)
+        model._setup_model()
+        state = {key: torch.from_numpy(np.array(self._map_array(blob))) for key, blob in manifest["tensors"].items()}
+        model.policy.load_state_dict(state)
+        buffer = io.BytesIO(self._get(manifest["optimizer"]))
+        model.policy.optimizer.load_state_dict(torch.load(buffer, map_location=model.device))
+        return model
+
+def load_checkpoint(name, store=None, env=None, policy_only=False, algo=None):
+    """name from store (a CheckpointStore or its directory) when it holds it, else from name.zip.
+
+    policy_only: just the policy, for playing (from the store its tensors stay memory-mapped);
+    otherwise the complete model, attached to env, to train on.
+    """
+    if store is not None:
+        store = store if isinstance(store, CheckpointStore) else CheckpointStore(store)
+        if name in store:
+            return store.load_policy(name) if policy_only else store.load_model(name, env=env)
+    if algo is None:
+        from stable_baselines3 import PPO as algo
+    return algo.load(name, env=env)
+
+def _model_data(model):
+    # What model.save() keeps besides the state dicts (the same exclusions as SB3's save)
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts, torch_variables = model._get_torch_save_params()
+    exclude.update(name.split(".")[0] for name in state_dicts + torch_variables)
+    for name in exclude:
+        data.pop(name, None)
+    return data
+
+class StoreCheckpointCallback(BaseCallback):
+    """Save to a CheckpointStore every save_freq calls to env.step() without pausing training.
+
+    Names are name_format.format(timesteps=...); metadata (generation, parent...) goes to every save.
+    """
+
+    def __init__(self, store, save_freq, name_format, verbose=0, **meta):
+        super().__init__(verbose)
+        self.store = store
+        self.save_freq = save_freq
+        self.name_format = name_format
+        self.meta = meta
+
+    def _on_step(self):
+        if self.n_calls % self.save_freq == 0:
+            name = self.name_format.format(timesteps=self.num_timesteps)
+            self.store.save(self.model, name, **self.meta)
+            if self.verbose:
+                print(f"Saving checkpoint {name} in the background")
+        return True
+
+def import_zips(store, paths):
+    """Add SB3 zips to the store (named by path without .zip; gen_XX directories set the generation)."""
+    from stable_baselines3 import PPO
+    import re
+    for path in paths:
+        name = path[:-len(".zip")] if path.endswith(".zip") else path
+        match = re.search(r"gen_(\d+)", name)
+        store.save(PPO.load(name), name, generation=int(match.group(1)) if match else None)
+    store.flush()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import", "stats", "gc"])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--root", default="ppo_boop/store")
+    args = parser.parse_args()
+    store = CheckpointStore(args.root)
+    if args.command == "import":
+        import_zips(store, args.paths)
+    elif args.command == "gc":
+        print(f"Removed {store.gc()} unreferenced blobs")
+    stats = store.stats()
+    print(f"{stats['checkpoints']} checkpoints in {stats['blobs']} blobs: {stats['stored_bytes'] / 2**20:.1f} MiB "
+          f"on disk for {stats['logical_bytes'] / 2**20:.1f} MiB of checkpoints")
+    store.close()
@@ -0,0 +1,115 @@
+# Every game played through api_server, kept in SQLite for evaluation and training data.
+#
+# record() only puts the finished game on a queue; a background thread writes whatever has
+# queued up in one transaction every flush_interval seconds (or once batch_size games are
+# waiting), so a move request never waits on the disk. close() writes what is left.
+#
+#   archive = GameArchive("ppo_boop/games.db")
+#   archive.start()
+#   archive.record({"game_id": ..., "game": "boop", "moves": [...], "outcome": "win", ...})
+#   archive.games(version="v2", outcome="win")      # indexed by game/version and outcome
+#   archive.summary("boop")                         # {version: {outcome: count}}
+#
+# The moves replay with policy_analysis.game_positions() to rebuild every position.
+
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+OUTCOMES = ("win", "draw", "abandoned")
+COLUMNS = ("game_id", "game", "version", "difficulty", "players", "moves", "move_times",
+           "outcome", "winner", "plies", "started", "finished")
+JSON_COLUMNS = ("players", "moves", "move_times")
+
+class GameArchive:
+    def __init__(self, path, batch_size=64, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS games (
+                game_id TEXT PRIMARY KEY, game TEXT NOT NULL, version TEXT, difficulty TEXT,
+                players TEXT NOT NULL, moves TEXT NOT NULL, move_times TEXT NOT NULL,
+                outcome TEXT NOT NULL, winner INTEGER, plies INTEGER NOT NULL,
+                started REAL NOT NULL, finished REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS games_by_version ON games (game, version, finished)")
+            db.execute("CREATE INDEX IF NOT EXISTS games_by_outcome ON games (game, outcome, winner)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name="game-archive", daemon=True)
+            self.thread.start()
+
+    def close(self):
+        """Write every queued game and stop the writer."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def record(self, game):
+        """Queue a finished game (a dict with the COLUMNS keys); never blocks."""
+        if game["outcome"] not in OUTCOMES:
+            raise ValueError(f"outcome must be one of {OUTCOMES}, not {game['outcome']!r}")
+        self.queue.put(tuple(json.dumps(game[c]) if c in JSON_COLUMNS else game[c] for c in COLUMNS))
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            if rows:
+                self._write(rows)
+
+    def _write(self, rows):
+        with self._connect() as db:
+            db.execute("BEGIN")
+            # Several workers may archive the same abandoned game; the first copy wins
+            db.executemany(f"INSERT OR IGNORE INTO games VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            db.execute("COMMIT")
+
+    def games(self, game=None, version=None, outcome=None, winner=None, limit=None):
+        """Archived games matching every given filter, oldest first, as dicts."""
+        filters = {"game": game, "version": version, "outcome": outcome, "winner": winner}
+        where = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        sql = "SELECT * FROM games" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY finished"
+        params = [value for value in filters.values() if value is not None]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as db:
+            rows = db.execute(sql, params).fetchall()
+        return [{c: json.loads(v) if c in JSON_COLUMNS else v for c, v in zip(COLUMNS, row)} for row in rows]
+
+    def summary(self, game):
+        """{version: {outcome: number of games}} for one game."""
+        with self._connect() as db:
+            rows = db.execute("SELECT version, outcome, COUNT(*) FROM games WHERE game = ? GROUP BY version, outcome",
+                              (game,)).fetchall()
+        result = {}
+        for version, outcome, count in rows:
+            result.setdefault(version, {})[outcome] = count
+        return result
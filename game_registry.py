@@ -0,0 +1,188 @@
+# Games served by api_server.
+#
+# Each GameSpec says how to start a game (env_factory), which model versions can play it
+# (backends: version -> zero-argument loader) and how its moves are reported to the client
+# (move_fields). load() loads every backend and runs a throwaway move through each one,
+# so torch's lazy initialisation happens at server startup instead of on the first AI
+# move of the first game. Sessions then pick a version and a difficulty:
+#
+#   spec = build_registry()["boop"]
+#   spec.load()
+#   action = spec.choose(env, version="v0", difficulty="hard")
+
+import glob
+import os
+import random
+
+from stable_baselines3 import PPO, DQN
+
+from boop_env import BoopEnv
+from boop_book import OpeningBook
+from boop_gate import load_current, read_current
+from boop_bots import choose_action
+from boop_rules import Position
+from boop_search import AlphaBetaPlayer
+from policy_analysis import has_policy
+from quantized_policy import quantize_if_supported
+from shared_weights import attach_or_export, attach_policy, shared_path
+from tictactoe_env import TicTacToeGame
+from tictactoe_table import TablePlayer
+
+# Shared by every game: the share of uniformly random moves, whether the model samples its
+# policy or plays its top move, and whether an opening book (if the game has one) is used
+DIFFICULTIES = {
+    "easy": {"random_moves": 0.3, "deterministic": False, "book": False},
+    "medium": {"random_moves": 0.0, "deterministic": False, "book": False},
+    "hard": {"random_moves": 0.0, "deterministic": True, "book": True},
+}
+
+class GameSpec:
+    def __init__(self, name, env_factory, backends, default_version, move_fields, book=None,
+                 default_difficulty="hard", rules=None):
+        self.name = name
+        self.env_factory = env_factory
+        self.backends = backends
+        self.default_version = default_version
+        self.move_fields = move_fields
+        self.book = book
+        self.default_difficulty = default_difficulty
+        self.rules = rules  # a position class with from_env() and play(), shared with the client
+        self.models = {}
+        # version -> zero-argument function naming its shared_weights export, for versions whose
+        # model changes while the server runs; the others are exported under their own name
+        self.shared_names = {}
+        # version -> loader of the full torch policy, for versions served by something that
+        # cannot report move probabilities (a quantized actor); loaded on first analysis
+        self.analysis_backends = {}
+        self._analysis_models = {}
+
+    def load(self):
+        for version, loader in self.backends.items():
+            model = loader()
+            self._warm_up(model)
+            self.models[version] = model
+
+    def reload(self, version):
+        """Load version again (e.g. after its checkpoint changed); games in progress switch over on their next move."""
+        model = self.backends[version]()
+        self._warm_up(model)
+        self.models[version] = model
+        self._analysis_models.pop(version, None)
+
+    def _warm_up(self, model):
+        env = self.env_factory()
+        env.reset()
+        for deterministic in (True, False):
+            choose_action(model, env, deterministic=deterministic)
+
+    def resolve(self, version=None, difficulty=None):
+        """(version, difficulty) with defaults filled in; KeyError names the unknown one."""
+        version = version or self.default_version
+        difficulty = difficulty or self.default_difficulty
+        if version not in self.backends:
+            raise KeyError(f"unknown {self.name} model version '{version}'")
+        if difficulty not in DIFFICULTIES:
+            raise KeyError(f"unknown difficulty '{difficulty}'")
+        return version, difficulty
+
+    def choose(self, env, version, difficulty):
+        """The AI's move for env's current position (always legal while any legal move exists)."""
+        level = DIFFICULTIES[difficulty]
+        legal = env.legal_actions()
+        if random.random() < level["random_moves"]:
+            return random.choice(legal)
+        if level["book"] and self.book is not None:
+            action = self.book.lookup(env)
+            if action is not None:
+                return action
+        action = choose_action(self.models[version], env, deterministic=level["deterministic"])
+        return action if action in legal else random.choice(legal)
+
+    def shared_name(self, version):
+        namer = self.shared_names.get(version)
+        return namer() if namer else version
+
+    def analysis_model(self, version):
+        """A model of version that policy_analysis.analyze() accepts, or None (search players, tables, DQN)."""
+        model = self.models[version]
+        if has_policy(model):
+            return model
+        if version not in self.analysis_backends:
+            return None
+        if version not in self._analysis_models:
+            model = self.analysis_backends[version]()
+            self._analysis_models[version] = model if has_policy(model) else None
+        return self._analysis_models[version]
+
+    def effects(self, env, action):
+        """What action does in env's position (boops, promotions, win), or None without rules."""
+        if self.rules is None:
+            return None
+        return self.rules.from_env(env).play(tuple(int(x) for x in action))[1]
+
+    def describe(self):
+        return {
+            "versions": list(self.backends),
+            "default_version": self.default_version,
+            "difficulties": list(DIFFICULTIES),
+            "default_difficulty": self.default_difficulty,
+        }
+
+def boop_versions(pattern="ppo_boop_v*.zip"):
+    # ppo_boop_v0.zip -> "v0"; the default lambda argument pins each path
+    return {os.path.basename(path)[len("ppo_boop_"):-len(".zip")]: (lambda path=path[:-len(".zip")]: PPO.load(path))
+            for path in sorted(glob.glob(pattern))}
+
+def current_shared_name():
+    # A new name for every promotion, so a worker reloading "current" never attaches the
+    # previous model's export
+    return "current-" + read_current().replace(os.sep, "_").replace("/", "_")
+
+def _attach_renamed(shared_dir, spec, version, loader):
+    # Exported by the first worker that loads this model, attached by the rest
+    return attach_or_export(shared_path(shared_dir, spec.name, spec.shared_name(version)), loader)
+
+def build_registry(shared_dir=None, quantize=None):
+    # shared_dir: where shared_weights.export_registry() put the weights; backends found there
+    # attach to the memory-mapped copy instead of loading their checkpoint. quantize: a
+    # quantized_policy mode; MLP policies are then served by their NumPy actor alone, except
+    # attached ones: quantizing copies the weights out of the shared mapping
+    boop_backends = boop_versions()
+    # Whatever boop_gate.py last promoted (from its checkpoint store if it came from one);
+    # api_server reloads it when the pointer changes
+    boop_backends["current"] = load_current
+    boop_backends["alphabeta"] = lambda: AlphaBetaPlayer(time_limit=0.5)
+    tictactoe_backends = {"table": TablePlayer}
+    if os.path.exists("tictactoe_dqn.zip"):
+        tictactoe_backends["dqn"] = lambda: DQN.load("tictactoe_dqn")
+    registry = {
+        "boop": GameSpec("boop", BoopEnv, boop_backends, default_version="current",
+                         move_fields=("action_type", "row", "col", "piece_type"),
+                         book=OpeningBook.load_if_exists("opening_book.npy"),  # built by boop_book.py
+                         rules=Position),
+        "tictactoe": GameSpec("tictactoe", TicTacToeGame, tictactoe_backends,
+                              default_version="dqn" if "dqn" in tictactoe_backends else "table",
+                              move_fields=("cell",)),
+    }
+    registry["boop"].shared_names["current"] = current_shared_name
+    attached = set()
+    if shared_dir:
+        for name, spec in registry.items():
+            for version, loader in spec.backends.items():
+                if version in spec.shared_names:
+                    spec.backends[version] = lambda spec=spec, version=version, loader=loader: \
+                        _attach_renamed(shared_dir, spec, version, loader)
+                    attached.add((name, version))
+                    continue
+                path = shared_path(shared_dir, name, version)
+                if os.path.exists(path + ".pkl"):
+                    spec.backends[version] = lambda path=path: attach_policy(path)
+                    attached.add((name, version))
+    if quantize:
+        for name, spec in registry.items():
+            for version, loader in spec.backends.items():
+                if (name, version) in attached:
+                    continue
+                spec.analysis_backends[version] = loader
+                spec.backends[version] = lambda loader=loader: quantize_if_supported(loader(), quantize)
+    return registry
@@ -0,0 +1,317 @@
+# Load generator for api_server: how many concurrent games can one server sustain?
+#
+# Starts api_server under uvicorn on a free port (or targets --url), then runs simulated
+# players as asyncio tasks, each playing game after game through /api/games/{game}/new and
+# /move until the run ends. Every player follows one profile, drawn from --mix:
+#
+#   human     human vs AI: picks a random legal move (boop_rules for boop) after an
+#             exponentially distributed think time, then asks for the AI's reply
+#   selfplay  AI vs AI: requests AI moves with a short pause between them, as the web client
+#             does while it animates the previous move
+#   invalid   human vs AI, but most turns start with one or more illegal moves (occupied
+#             cells, pieces out of stock) before the legal one
+#
+# Players start evenly over --ramp seconds. Every request's latency is recorded by kind (new,
+# human, ai, invalid); every --interval seconds the harness samples the request rate, the games
+# in progress and the server's memory (proportional set size of the uvicorn process plus its
+# workers, from /proc), so leaks and saturation show up over time. The report gives throughput and latency
+# percentiles per kind, and --json saves everything for comparing runs:
+#
+#   python load_test.py --clients 200 --duration 120 --mix human=0.6,selfplay=0.3,invalid=0.1
+#   python load_test.py --clients 500 --workers 4 --json load_w4.json
+#   python load_test.py --url http://localhost:8001 --server-pid 12345   # an already running server
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from boop_rules import Position
+
+PROFILES = {"human": ["human", "ai"], "selfplay": ["ai", "ai"], "invalid": ["human", "ai"]}
+KINDS = ("new", "human", "ai", "invalid")
+PERCENTILES = (50, 90, 99)
+
+# === Moves a simulated player can make, per game ===
+
+def boop_moves(state):
+    """(legal moves, action dimensions) of a boop position as the server sends it."""
+    rows, cols = len(state["board"]), len(state["board"][0])
+    return Position.from_state(state).legal_actions(), (2, rows, cols, 2)
+
+def tictactoe_moves(state):
+    cells = [cell for row in state["board"] for cell in row]
+    return [(i,) for i, cell in enumerate(cells) if cell == 0], (9,)
+
+MOVES = {"boop": boop_moves, "tictactoe": tictactoe_moves}
+
+def illegal_move(legal, dims):
+    legal = set(legal)
+    while True:
+        action = tuple(random.randrange(n) for n in dims)
+        if action not in legal:
+            return list(action)
+
+# === Measurements ===
+
+class Recorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = {kind: [] for kind in KINDS}
+        self.errors = {kind: 0 for kind in KINDS}
+        self.requests = 0
+        self.games_started = 0
+        self.games_finished = 0
+        self.active_games = 0
+        self.timeline = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add(self, kind, seconds, ok):
+        self.requests += 1
+        self.latencies[kind].append(seconds)
+        if not ok:
+            self.errors[kind] += 1
+
+    def summary(self):
+        duration = self.elapsed()
+        kinds = {}
+        for kind, samples in self.latencies.items():
+            if not samples:
+                continue
+            ms = np.array(samples) * 1000
+            kinds[kind] = {"requests": len(samples), "errors": self.errors[kind],
+                           "per_second": round(len(samples) / duration, 2),
+                           **{f"p{p}_ms": round(float(np.percentile(ms, p)), 2) for p in PERCENTILES},
+                           "max_ms": round(float(ms.max()), 2)}
+        memory = [sample["rss_mib"] for sample in self.timeline if sample["rss_mib"] is not None]
+        return {"duration": round(duration, 1), "requests": self.requests,
+                "requests_per_second": round(self.requests / duration, 2),
+                "games_started": self.games_started, "games_finished": self.games_finished,
+                "kinds": kinds,
+                "rss_mib": {"first": memory[0], "peak": max(memory), "last": memory[-1]} if memory else None}
+
+def _resident_kib(pid):
+    # Proportional set size where the kernel has it: pages shared between workers (the mapped
+    # weights, see shared_weights.py) are split between them instead of counted once per worker
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path) as f:
+                return next(int(line.split()[1]) for line in f if line.startswith(field))
+        except (OSError, StopIteration):
+            continue
+    raise OSError(f"no memory figures for process {pid}")
+
+def process_rss(pid):
+    """Resident memory in bytes of pid and all its descendants, or None where /proc is unavailable."""
+    try:
+        rss = _resident_kib(pid) * 1024
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        return None
+    return rss + sum(process_rss(child) or 0 for child in children)
+
+async def sample(recorder, pid, interval):
+    last_requests, last_time = 0, recorder.elapsed()
+    while True:
+        await asyncio.sleep(interval)
+        now = recorder.elapsed()
+        rss = process_rss(pid) if pid else None
+        recorder.timeline.append({
+            "t": round(now, 1),
+            "requests_per_second": round((recorder.requests - last_requests) / (now - last_time), 2),
+            "active_games": recorder.active_games,
+            "rss_mib": round(rss / 2**20, 1) if rss is not None else None,
+        })
+        last_requests, last_time = recorder.requests, now
+
+# === Simulated players ===
+
+async def request(client, recorder, kind, url, payload):
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload)
+        ok = response.status_code < 400
+        body = response.json() if ok else None
+    except httpx.HTTPError:
+        ok, body = False, None
+    recorder.add(kind, time.perf_counter() - start, ok)
+    return body
+
+async def play(client, recorder, game, profile, think, ai_delay, invalid_rate, deadline):
+    """Play one game with the profile's players; returns when it ends, fails or the run is over."""
+    game_url = f"/api/games/{game}"
+    body = await request(client, recorder, "new", f"{game_url}/new", {"players": PROFILES[profile]})
+    if body is None:
+        await asyncio.sleep(1)  # the server is refusing games; do not retry in a tight loop
+        return
+    game_id, state = body["game_id"], body["state"]
+    recorder.games_started += 1
+    recorder.active_games += 1
+    try:
+        while time.monotonic() < deadline:
+            if PROFILES[profile][state["current_player"]] == "ai":
+                await asyncio.sleep(random.expovariate(1 / ai_delay) if ai_delay else 0)
+                body = await request(client, recorder, "ai", f"{game_url}/move", {"game_id": game_id, "action": None})
+            else:
+                await asyncio.sleep(random.expovariate(1 / think) if think else 0)
+                legal, dims = MOVES[game](state)
+                if not legal:
+                    return
+                while profile == "invalid" and random.random() < invalid_rate:
+                    await request(client, recorder, "invalid", f"{game_url}/move",
+                                  {"game_id": game_id, "action": illegal_move(legal, dims)})
+                body = await request(client, recorder, "human", f"{game_url}/move",
+                                     {"game_id": game_id, "action": list(random.choice(legal))})
+            if body is None:
+                return
+            if body["game_over"]:
+                recorder.games_finished += 1
+                return
+            state = body["state"]
+    finally:
+        recorder.active_games -= 1
+
+async def player(client, recorder, game, profile, delay, deadline, **settings):
+    await asyncio.sleep(delay)
+    while time.monotonic() < deadline:
+        await play(client, recorder, game, profile, deadline=deadline, **settings)
+
+async def run(url, clients, duration, mix, game="boop", think=2.0, ai_delay=0.5, invalid_rate=0.7,
+              ramp=10.0, interval=5.0, server_pid=None, verbose=1):
+    """Run the simulated players against url for duration seconds; returns the recorder."""
+    recorder = Recorder()
+    profiles = random.choices(list(mix), weights=list(mix.values()), k=clients)
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        sampler = asyncio.create_task(sample(recorder, server_pid, interval))
+        progress = asyncio.create_task(report_progress(recorder, interval)) if verbose else None
+        await asyncio.gather(*(player(client, recorder, game, profile, ramp * i / clients, deadline,
+                                      think=think, ai_delay=ai_delay, invalid_rate=invalid_rate)
+                               for i, profile in enumerate(profiles)))
+        for task in (sampler, progress):
+            if task is not None:
+                task.cancel()
+    return recorder
+
+async def report_progress(recorder, interval):
+    seen = 0
+    while True:
+        await asyncio.sleep(interval / 2)
+        for sample in recorder.timeline[seen:]:
+            rss = f"{sample['rss_mib']:.0f} MiB" if sample["rss_mib"] is not None else "n/a"
+            print(f"{sample['t']:7.1f}s  {sample['requests_per_second']:8.1f} req/s  "
+                  f"{sample['active_games']:5d} games  server RSS {rss}")
+        seen = len(recorder.timeline)
+
+# === Server ===
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, workers=1, directory=None):
+    """Start api_server in a subprocess with a throwaway game archive (and session database)."""
+    directory = directory or tempfile.mkdtemp(prefix="load_test_")
+    env = dict(os.environ, GAME_ARCHIVE=os.path.join(directory, "games.db"))
+    cmd = [sys.executable, "api_server.py", "--port", str(port), "--workers", str(workers),
+           "--log-level", "warning", "--session-db", os.path.join(directory, "sessions.db"),
+           "--shared-dir", os.path.join(directory, "shared")]
+    log = open(os.path.join(directory, "server.log"), "w")
+    return subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def wait_until_ready(url, server, timeout=300):
+    # The lifespan loads and warms up every model before the server accepts requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"api_server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/api/games", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"api_server did not answer at {url} within {timeout}s")
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in PROFILES:
+            raise argparse.ArgumentTypeError(f"unknown profile '{name}', expected one of {', '.join(PROFILES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['duration']}s: {summary['requests_per_second']} req/s, "
+          f"{summary['games_started']} games started, {summary['games_finished']} finished")
+    print(f"{'kind':8} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          + " ".join(f"{f'p{p} ms':>8}" for p in PERCENTILES) + f" {'max ms':>8}")
+    for kind, row in summary["kinds"].items():
+        print(f"{kind:8} {row['requests']:9d} {row['errors']:7d} {row['per_second']:8.1f} "
+              + " ".join(f"{row[f'p{p}_ms']:8.1f}" for p in PERCENTILES) + f" {row['max_ms']:8.1f}")
+    if summary["rss_mib"]:
+        memory = summary["rss_mib"]
+        print(f"server RSS: {memory['first']} MiB at start, {memory['peak']} MiB peak, {memory['last']} MiB at end")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent players against api_server.")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default="human=0.6,selfplay=0.3,invalid=0.1",
+                        help="profile weights, e.g. human=0.6,selfplay=0.3,invalid=0.1")
+    parser.add_argument("--game", default="boop", choices=sorted(MOVES))
+    parser.add_argument("--think", type=float, default=2.0, help="mean human think time in seconds")
+    parser.add_argument("--ai-delay", type=float, default=0.5, help="mean pause before requesting an AI move")
+    parser.add_argument("--invalid-rate", type=float, default=0.7,
+                        help="chance of (another) illegal move before each legal one, for invalid players")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which players start")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between timeline samples")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, to sample its memory")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="write the summary and timeline to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server, url, pid = None, args.url, args.server_pid
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers)
+        pid = server.pid
+        print(f"Starting api_server with {args.workers} worker(s) on port {port}...")
+    try:
+        wait_until_ready(url, server)
+        print(f"{args.clients} players for {args.duration:.0f}s, mix {args.mix}")
+        recorder = asyncio.run(run(url, args.clients, args.duration, args.mix, args.game, args.think,
+                                   args.ai_delay, args.invalid_rate, args.ramp, args.interval, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = recorder.summary()
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json"},
+                       "summary": summary, "timeline": recorder.timeline}, f, indent=2)
@@ -0,0 +1,75 @@
+# Move probabilities and value estimates of a trained policy, for heatmaps and game reviews.
+#
+# model.predict() only returns one action. analyze() returns the whole distribution instead:
+# for BoopEnv's MultiDiscrete [2, 6, 6, 2] actions the policy outputs one categorical per
+# dimension, and the probability of a full action is the product of its four parts. Illegal
+# actions are masked out and the rest renormalised, giving one probability per action index
+# (boop_env.action_to_index) that sums to 1 over the legal moves. Every position goes through
+# the network in a single batch, so reviewing a whole game costs one forward pass:
+#
+#   obs, masks, movers = game_positions(BoopEnv(), moves, model.observation_space.shape)
+#   probs, values = analyze(model, obs, masks)   # (positions, 144), (positions,)
+
+import numpy as np
+import torch
+
+def action_dims(action_space):
+    """(2, 6, 6, 2) for MultiDiscrete spaces, (n,) for Discrete ones."""
+    if hasattr(action_space, "nvec"):
+        return tuple(int(n) for n in action_space.nvec)
+    return (int(action_space.n),)
+
+def game_positions(env, moves, obs_shape):
+    """Observations, legal-action masks and side to move for every position of a game.
+
+    env is a fresh game. moves are played from the start; a position is recorded before each
+    one and after the last, unless the game is over by then. ValueError names an illegal move.
+    """
+    observations, masks, movers = [], [], []
+
+    def record():
+        observations.append(env.observation_as(obs_shape))
+        masks.append(env.legal_action_mask())
+        movers.append(env.current_player_num)
+
+    record()
+    for i, move in enumerate(moves):
+        move = tuple(int(x) for x in move)
+        if not env.is_legal(move):
+            raise ValueError(f"move {i} {list(move)} is illegal")
+        _, _, terminated, truncated, _ = env.step(move)
+        if terminated or truncated:
+            if i + 1 < len(moves):
+                raise ValueError(f"the game ended at move {i}, before the last move")
+            break
+        record()
+    return np.stack(observations).astype(np.float32), np.stack(masks), movers
+
+def joint_log_probs(distribution):
+    # Categorical.logits are normalised log probabilities; MultiCategorical holds one per dimension
+    parts = distribution if isinstance(distribution, list) else [distribution]
+    joint = parts[0].logits
+    for part in parts[1:]:
+        joint = (joint[:, :, None] + part.logits[:, None, :]).flatten(1)
+    return joint
+
+def has_policy(model):
+    return hasattr(getattr(model, "policy", model), "get_distribution")
+
+def analyze(model, observations, masks):
+    """(probs, values) for a batch of positions: masked action probabilities and value estimates.
+
+    model is an SB3 actor-critic model or policy (e.g. from shared_weights.attach_policy);
+    value-based models such as DQN have no policy distribution and raise TypeError.
+    """
+    if not has_policy(model):
+        raise TypeError(f"{type(model).__name__} has no policy distribution to analyze")
+    policy = getattr(model, "policy", model)
+    with torch.no_grad():
+        obs, _ = policy.obs_to_tensor(observations)
+        log_probs = joint_log_probs(policy.get_distribution(obs).distribution)
+        values = policy.predict_values(obs).flatten()
+    mask = torch.as_tensor(masks, dtype=torch.bool, device=log_probs.device)
+    probs = torch.softmax(log_probs.masked_fill(~mask, -torch.inf), dim=1)
+    probs = torch.nan_to_num(probs)  # positions without a legal move
+    return probs.cpu().numpy(), values.cpu().numpy()
@@ -0,0 +1,207 @@
+# Fast CPU inference for served PPO policies: the actor network alone, in NumPy, with
+# optionally quantized weights.
+#
+# Serving an AI move needs one argmax (or one sample) of the actor's logits, yet
+# model.predict() goes through SB3's observation preprocessing, torch tensors, the value
+# network and a distribution object, which for the 180-64-64-16 boop MLP costs ~40 times
+# the arithmetic itself. QuantizedPolicy keeps only the actor layers as NumPy arrays and
+# runs them as plain matmuls (bias and activation applied in place), in one of three modes:
+#
+#   float32   the weights as trained
+#   float16   weights rounded to float16 and widened once at load: same speed as float32,
+#             measures what half-precision weights would cost in agreement
+#   int8      weights stored as int8 with one float32 scale per output unit (symmetric,
+#             per-channel) and rescaled after each matmul; a quarter of the weight memory,
+#             but each call widens the weights to float32 again, so it is slower than
+#             float32 and agrees less often (~98.7%): only worth it when memory is the limit
+#
+# Matmuls in int8 or float16 proper (torch's dynamic quantization, NumPy float16 arrays)
+# measured slower than float32 at this network size, because NumPy has no half-precision
+# BLAS and torch's quantized kernels only pay off on much wider layers; so the arithmetic
+# stays float32. quantize() accepts SB3 actor-critic models or policies with an MLP over
+# flattened observations and raises TypeError for anything else (CNN policies, DQN, bots).
+# A quantized policy has predict() and observation_space, so boop_bots.choose_action and
+# game_registry use it like a model; policy_analysis cannot, as it has no torch distribution.
+#
+#   python quantized_policy.py ppo_boop_v3              # agreement and latency of every mode
+#   POLICY_QUANTIZE=float32 python api_server.py        # serve NumPy actors (the fastest mode)
+#
+# Agreement is measured on positions replayed from the game archive (game_archive.py), or on
+# positions from random games while the archive has too few.
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import torch
+from torch import nn
+
+from boop_env import BoopEnv
+from game_archive import GameArchive
+from policy_analysis import action_dims, game_positions
+
+MODES = ("float32", "float16", "int8")
+ACTIVATIONS = {nn.Tanh: np.tanh, nn.ReLU: lambda x, out: np.maximum(x, 0, out=out)}
+
+class QuantizedPolicy:
+    """The actor of an SB3 MLP policy as NumPy matmuls, with predict() like an SB3 model."""
+
+    def __init__(self, layers, activations, observation_space, action_space, mode, seed=None):
+        # layers: (weight (in, out), bias) per Linear, weights already converted for mode
+        self.layers = layers
+        self.activations = activations
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.mode = mode
+        self.dims = action_dims(action_space)
+        ends = np.cumsum(self.dims)
+        self.slices = [slice(int(end - n), int(end)) for n, end in zip(self.dims, ends)]
+        self.rng = np.random.default_rng(seed)
+
+    def logits(self, observations):
+        """(batch, sum of action dims) actor logits for a batch of observations."""
+        x = np.asarray(observations, dtype=np.float32).reshape(len(observations), -1)
+        for i, (weight, bias, scale) in enumerate(self.layers):
+            x = x @ (weight if scale is None else weight.astype(np.float32))
+            if scale is not None:
+                x *= scale
+            x += bias
+            if i < len(self.activations):
+                self.activations[i](x, out=x)
+        return x
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=False):
+        observation = np.asarray(observation)
+        batched = observation.shape != self.observation_space.shape
+        logits = self.logits(observation if batched else observation[None])
+        action = np.empty((len(logits), len(self.slices)), dtype=np.int64)
+        for i, part in enumerate(self.slices):  # one categorical per action dimension
+            action[:, i] = logits[:, part].argmax(axis=1) if deterministic else self._sample(logits[:, part])
+        if len(self.dims) == 1:
+            action = action[:, 0]  # Discrete spaces take bare indices
+        return (action if batched else action[0]), None
+
+    def _sample(self, logits):
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        cumulative = np.cumsum(probs, axis=1)
+        draws = self.rng.random((len(logits), 1)) * cumulative[:, -1:]
+        return np.minimum((cumulative < draws).sum(axis=1), logits.shape[1] - 1)
+
+    def nbytes(self):
+        return sum(weight.nbytes + bias.nbytes + (0 if scale is None else scale.nbytes)
+                   for weight, bias, scale in self.layers)
+
+def _quantize_weight(weight, mode):
+    # weight is (in, out); returns (stored weight, per-output scale or None)
+    if mode == "float32":
+        return weight, None
+    if mode == "float16":
+        return weight.astype(np.float16).astype(np.float32), None
+    scale = np.abs(weight).max(axis=0) / 127
+    scale[scale == 0] = 1.0
+    return np.round(weight / scale).astype(np.int8), scale.astype(np.float32)
+
+def quantize(model, mode="int8", seed=None):
+    """QuantizedPolicy for an SB3 actor-critic model or policy; TypeError if it is not an MLP over flat observations."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    policy = getattr(model, "policy", model)
+    extractor = getattr(policy, "pi_features_extractor", None)
+    if type(extractor).__name__ != "FlattenExtractor" or not hasattr(policy, "action_net"):
+        raise TypeError(f"{type(model).__name__} is not an actor-critic MLP policy over flat observations")
+
+    modules = list(policy.mlp_extractor.policy_net) + [policy.action_net]
+    layers, activations = [], []
+    for module in modules:
+        if isinstance(module, nn.Linear):
+            weight = module.weight.detach().cpu().numpy().T.astype(np.float32)
+            stored, scale = _quantize_weight(np.ascontiguousarray(weight), mode)
+            layers.append((stored, module.bias.detach().cpu().numpy().astype(np.float32), scale))
+        elif type(module) in ACTIVATIONS:
+            activations.append(ACTIVATIONS[type(module)])
+        else:
+            raise TypeError(f"cannot quantize a policy with a {type(module).__name__} layer")
+    if len(activations) != len(layers) - 1:
+        raise TypeError("expected an activation after every hidden layer")
+    return QuantizedPolicy(layers, activations, policy.observation_space, policy.action_space, mode, seed)
+
+def quantize_if_supported(model, mode):
+    """quantize(model, mode), or model itself when it cannot be (search players, DQN, CNN policies)."""
+    if not mode:
+        return model
+    try:
+        return quantize(model, mode)
+    except TypeError:
+        return model
+
+# === Accuracy and speed ===
+
+def recorded_positions(archive_path, count=5000, game="boop"):
+    """Up to count observations replayed from the archive's games, topped up from random games."""
+    observations = []
+    records = GameArchive(archive_path).games(game=game) if os.path.exists(archive_path) else []
+    for record in records:
+        env = BoopEnv()
+        try:
+            obs, _, _ = game_positions(env, record["moves"], env.observation_space.shape)
+        except ValueError:
+            continue  # a game recorded on another board size or by older rules
+        observations.extend(obs)
+        if len(observations) >= count:
+            break
+    while len(observations) < count:
+        env = BoopEnv()
+        env.reset()
+        while len(observations) < count:
+            observations.append(env.observation_as(env.observation_space.shape))
+            _, _, terminated, truncated, _ = env.step(random.choice(env.legal_actions()))
+            if terminated or truncated:
+                break
+    return np.stack(observations[:count]).astype(np.float32)
+
+def agreement(model, quantized, observations):
+    """How often quantized plays model's deterministic move, and the largest logit difference."""
+    expected, _ = model.predict(observations, deterministic=True)
+    actual, _ = quantized.predict(observations, deterministic=True)
+    policy = getattr(model, "policy", model)
+    with torch.no_grad():
+        obs, _ = policy.obs_to_tensor(observations)
+        latent = policy.mlp_extractor.forward_actor(policy.extract_features(obs, policy.pi_features_extractor))
+        reference = policy.action_net(latent).cpu().numpy()
+    same = np.all(np.asarray(expected).reshape(len(observations), -1) == np.asarray(actual).reshape(len(observations), -1),
+                  axis=1)
+    return {"agreement": float(same.mean()), "max_logit_error": float(np.abs(reference - quantized.logits(observations)).max())}
+
+def latency(predictor, observations, repeats=2000):
+    """Mean seconds per single-position deterministic predict(), as the server calls it."""
+    predictor.predict(observations[0], deterministic=True)
+    start = time.perf_counter()
+    for i in range(repeats):
+        predictor.predict(observations[i % len(observations)], deterministic=True)
+    return (time.perf_counter() - start) / repeats
+
+if __name__ == "__main__":
+    from stable_baselines3 import PPO
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", help="checkpoint path without .zip, e.g. ppo_boop_v3")
+    parser.add_argument("--archive", default="ppo_boop/games.db")
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+    torch.set_num_threads(1)  # moves per core
+
+    model = PPO.load(args.model)
+    observations = recorded_positions(args.archive, args.positions)
+    baseline = latency(model, observations, args.repeats)
+    print(f"{len(observations)} positions; SB3 float32 predict: {baseline * 1e6:.0f} us/move "
+          f"({1 / baseline:.0f} moves/s per core)")
+    for mode in MODES:
+        quantized = quantize(model, mode)
+        check = agreement(model, quantized, observations)
+        seconds = latency(quantized, observations, args.repeats)
+        print(f"{mode:8} agreement {check['agreement']:.2%}, max logit error {check['max_logit_error']:.4f}, "
+              f"{seconds * 1e6:.0f} us/move ({1 / seconds:.0f} moves/s, {baseline / seconds:.1f}x), "
+              f"{quantized.nbytes() / 1024:.0f} KiB of weights")
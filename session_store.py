@@ -0,0 +1,107 @@
+# Game sessions that every server worker can see.
+#
+# api_server keeps sessions in a dict, which only works with a single worker: with
+# `--workers N` the next request of a game can land on any process. SessionStore has the
+# same mapping interface but pickles each session into SQLite, so whichever worker
+# handles a request loads the game, plays the move and writes it back.
+#
+# Moves run in the server's threadpool while the idle sweep archives old games, so both
+# stores also offer the two conditional updates that keep them apart: replace() writes a
+# session back only if it still exists, and discard() removes one only if it has not
+# been played since the caller looked at it.
+
+import contextlib
+import os
+import pickle
+import sqlite3
+import threading
+
+class LocalSessions(dict):
+    """The single-worker store: a dict plus SessionStore's conditional updates."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def replace(self, game_id, session):
+        """Write session back if game_id is still live; False if it was removed meanwhile."""
+        with self._lock:
+            if game_id not in self:
+                return False
+            self[game_id] = session
+            return True
+
+    def discard(self, game_id, last_move=None):
+        """Remove game_id (only if its last_move is still last_move, when given); True if removed."""
+        with self._lock:
+            session = self.get(game_id)
+            if session is None or (last_move is not None and session["last_move"] != last_move):
+                return False
+            del self[game_id]
+            return True
+
+class SessionStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (game_id TEXT PRIMARY KEY, session BLOB NOT NULL)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def __contains__(self, game_id):
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM sessions WHERE game_id = ?", (game_id,)).fetchone() is not None
+
+    def __getitem__(self, game_id):
+        session = self.get(game_id)
+        if session is None:
+            raise KeyError(game_id)
+        return session
+
+    def get(self, game_id, default=None):
+        with self._connect() as db:
+            row = db.execute("SELECT session FROM sessions WHERE game_id = ?", (game_id,)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def __setitem__(self, game_id, session):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?)", (game_id, pickle.dumps(session)))
+
+    def items(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT game_id, session FROM sessions").fetchall()
+        return [(game_id, pickle.loads(session)) for game_id, session in rows]
+
+    def __delitem__(self, game_id):
+        if not self.discard(game_id):
+            raise KeyError(game_id)
+
+    def replace(self, game_id, session):
+        """Write session back if game_id is still live; False if it was removed meanwhile."""
+        with self._connect() as db:
+            cursor = db.execute("UPDATE sessions SET session = ? WHERE game_id = ?", (pickle.dumps(session), game_id))
+            return cursor.rowcount > 0
+
+    def discard(self, game_id, last_move=None):
+        """Remove game_id (only if its last_move is still last_move, when given); True if removed."""
+        with self._connect() as db:
+            if last_move is None:
+                return db.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,)).rowcount > 0
+            # Hold the write lock from the read to the delete, so no move can land in between
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT session FROM sessions WHERE game_id = ?", (game_id,)).fetchone()
+                removed = row is not None and pickle.loads(row[0])["last_move"] == last_move
+                if removed:
+                    db.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+            finally:
+                db.execute("COMMIT")
+            return removed
@@ -0,0 +1,98 @@
+# Model weights shared read-only between server worker processes.
+#
+# PPO.load() in every uvicorn worker unzips the checkpoint, builds the whole model with its
+# optimizer and keeps a private copy of every weight. Instead, the parent process loads
+# each model once and export_policy() writes its policy as two files:
+#
+#   <path>.npy   every parameter and buffer, concatenated into one flat float32 array
+#   <path>.pkl   the policy class, its constructor arguments and where each tensor sits
+#
+# attach_policy() rebuilds the (small) policy object and points its tensors straight into a
+# copy-on-write memory map of the .npy file. Inference never writes, so all workers read
+# the same page-cache pages: memory stays flat as workers are added, and starting a worker
+# costs a policy constructor plus an mmap. The policy's own predict() follows the SB3 model
+# interface, so it plugs into boop_bots.choose_action like a loaded model.
+#
+#   python api_server.py --workers 4          # exports to ppo_boop/shared, then forks workers
+#
+# A version whose model changes while the server runs (boop's "current") is exported under
+# a name that changes with it (GameSpec.shared_name); the first worker to need a name that
+# has no export yet writes it with attach_or_export(), and the others attach to that.
+
+import os
+import pickle
+
+import numpy as np
+import torch
+
+def _no_schedule(progress_remaining):
+    # Stands in for the training lr schedule, which inference never uses
+    return 0.0
+
+class _NoOptimizer:
+    # Stands in for Adam: a real optimizer would keep the randomly initialised parameters
+    # alive after load_state_dict(assign=True) swaps in the mapped ones
+    def __init__(self, params, **kwargs):
+        pass
+
+def export_policy(model, path):
+    """Write model.policy (or model, if it is a policy) to path.npy / path.pkl for attach_policy()."""
+    policy = getattr(model, "policy", model)
+    state = {name: tensor.detach().cpu().numpy() for name, tensor in policy.state_dict().items()}
+    layout, offset = {}, 0
+    for name, array in state.items():
+        layout[name] = (offset, array.shape, array.dtype.str)
+        offset += array.size
+    flat = np.concatenate([array.astype(np.float32).ravel() for array in state.values()])
+    data = {**policy._get_constructor_parameters(), "lr_schedule": _no_schedule}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write both files under temporary names first so a worker never sees half an export;
+    # the pid keeps workers exporting the same path at once from writing into each other's files
+    tmp = f"{path}.{os.getpid()}.tmp"
+    np.save(f"{tmp}.npy", flat)
+    with open(f"{tmp}.pkl", "wb") as f:
+        pickle.dump({"class": type(policy), "data": data, "layout": layout}, f)
+    os.replace(f"{tmp}.npy", f"{path}.npy")
+    os.replace(f"{tmp}.pkl", f"{path}.pkl")  # last: the .pkl existing means the export is complete
+
+def attach_policy(path):
+    """The policy exported to path, with its tensors mapped from path.npy instead of copied."""
+    with open(f"{path}.pkl", "rb") as f:
+        saved = pickle.load(f)
+    flat = np.load(f"{path}.npy", mmap_mode="c")
+    state = {}
+    for name, (offset, shape, dtype) in saved["layout"].items():
+        view = flat[offset:offset + int(np.prod(shape, dtype=np.int64))].reshape(shape)
+        state[name] = view if dtype == flat.dtype.str else view.astype(dtype)
+    return build_policy(saved["class"], saved["data"], state)
+
+def attach_or_export(path, loader):
+    """attach_policy(path), exporting the policy of loader() there first if no process has yet."""
+    if not os.path.exists(f"{path}.pkl"):
+        export_policy(loader(), path)
+    return attach_policy(path)
+
+def build_policy(policy_class, data, state):
+    """policy_class(**data) for inference, using the arrays in state as its tensors (not copies)."""
+    data = {**data, "optimizer_class": _NoOptimizer, "optimizer_kwargs": {}}
+    if "ortho_init" in data:
+        data["ortho_init"] = False  # the initial weights are thrown away, skip the costly init
+    policy = policy_class(**data)
+    policy.load_state_dict({name: torch.from_numpy(array) for name, array in state.items()}, assign=True)
+    policy.optimizer = None  # nothing may hold on to the replaced tensors
+    policy.set_training_mode(False)
+    return policy
+
+def export_registry(games, directory):
+    """Load every SB3 backend of a game_registry once and export it; returns the exported (game, version) pairs."""
+    exported = []
+    for name, spec in games.items():
+        for version, loader in spec.backends.items():
+            model = loader()
+            if isinstance(getattr(model, "policy", model), torch.nn.Module):  # search players and tables have no weights
+                export_policy(model, shared_path(directory, name, spec.shared_name(version)))
+                exported.append((name, version))
+    return exported
+
+def shared_path(directory, game, version):
+    return os.path.join(directory, f"{game}_{version}")
@@ -0,0 +1,178 @@
+# Build and serve the web client as hashed, precompressed static files.
+#
+# In development api_server serves test/ as it is: Brython fetches game.py, shared.py, menu.py,
+# render.py and boop_rules.py one by one on every page load and compiles them from source, and
+# nothing can be cached for long because file names never change. `python static_assets.py`
+# builds dist/ for production instead:
+#
+#   dist/python/client.<hash>.js  every client module in one Brython package (the format
+#                                 `brython-cli --make_package` writes). Brython loads it into its
+#                                 virtual file system, so imports need no requests, and caches
+#                                 the compiled modules in the browser's indexedDB between visits
+#   dist/css, dist/images         the same files renamed to <name>.<hash>.<ext>
+#   dist/html                     the pages, rewritten to reference the hashed names
+#   <file>.gz, <file>.br          precompressed copies (.br needs the optional brotli package)
+#   dist/manifest.json            original path -> hashed path
+#
+# api_server mounts dist/ with CompressedStaticFiles when dist/manifest.json exists. Hashed
+# files get a one-year immutable Cache-Control, since any change gives them a new name; pages
+# keep their names and are revalidated on every load.
+
+import ast
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_DIR = "test"
+DIST_DIR = "dist"
+CLIENT_MODULES = ["shared.py", "menu.py", "render.py", "game.py"]  # from test/python
+SHARED_MODULES = ["boop_rules.py"]  # from the repo root, also imported by the server
+COMPRESSIBLE = (".js", ".css", ".html", ".json", ".svg")
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+def write_hashed(data, directory, name):
+    """Write data as directory/<stem>.<hash><ext>; returns the new file name."""
+    stem, ext = os.path.splitext(name)
+    hashed = f"{stem}.{content_hash(data)}{ext}"
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, hashed), "wb") as f:
+        f.write(data)
+    return hashed
+
+def rewrite(text, urls):
+    # Longest first so that "/images/cat_a.png" is not caught by a shorter path first
+    for original in sorted(urls, key=len, reverse=True):
+        text = text.replace(original, urls[original])
+    return text
+
+def module_imports(source):
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return sorted(names)
+
+def brython_package(sources):
+    """The text of a Brython VFS package holding sources (module name -> source)."""
+    # Brython keys its compiled-module cache on $timestamp; deriving it from the sources keeps
+    # the package's hash (and the browser cache) unchanged until a module actually changes
+    digest = content_hash(json.dumps(sources, sort_keys=True).encode())
+    scripts = {"$timestamp": int(digest, 16)}
+    for name, source in sources.items():
+        scripts[name] = [".py", source, module_imports(source)]
+    return ("__BRYTHON__.use_VFS = true;\n"
+            f"var scripts = {json.dumps(scripts)}\n"
+            "__BRYTHON__.update_VFS(scripts)\n")
+
+def compress(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data)))
+    for suffix, packed in variants:
+        if len(packed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(packed)
+
+def build(source_dir=SOURCE_DIR, dist_dir=DIST_DIR):
+    """Build dist_dir from source_dir; returns the manifest (original URL -> hashed URL)."""
+    if os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+    urls = {}
+
+    for name in sorted(os.listdir(os.path.join(source_dir, "images"))):
+        with open(os.path.join(source_dir, "images", name), "rb") as f:
+            hashed = write_hashed(f.read(), os.path.join(dist_dir, "images"), name)
+        urls[f"/images/{name}"] = f"/images/{hashed}"
+        urls[f"../images/{name}"] = f"/images/{hashed}"  # as shared.GameImages refers to them
+
+    for name in sorted(os.listdir(os.path.join(source_dir, "css"))):
+        with open(os.path.join(source_dir, "css", name)) as f:
+            css = rewrite(f.read(), urls)
+        urls[f"/css/{name}"] = f"/css/{write_hashed(css.encode(), os.path.join(dist_dir, 'css'), name)}"
+
+    sources = {}
+    paths = [os.path.join(source_dir, "python", name) for name in CLIENT_MODULES] + SHARED_MODULES
+    for path in paths:
+        with open(path) as f:
+            sources[os.path.splitext(os.path.basename(path))[0]] = rewrite(f.read(), urls)
+    package = write_hashed(brython_package(sources).encode(), os.path.join(dist_dir, "python"), "client.js")
+    urls["/python/client.js"] = f"/python/{package}"
+
+    os.makedirs(os.path.join(dist_dir, "html"))
+    for name in sorted(os.listdir(os.path.join(source_dir, "html"))):
+        with open(os.path.join(source_dir, "html", name)) as f:
+            page = rewrite(f.read(), urls)
+        # Load the package right after Brython's standard library, before brython() runs
+        page = re.sub(r'(<script[^>]*brython_stdlib\.js"\s*>\s*</script>)',
+                      lambda m: f'{m.group(1)}\n    <script type="text/javascript" src="/python/{package}"></script>',
+                      page, count=1)
+        with open(os.path.join(dist_dir, "html", name), "w") as f:
+            f.write(page)
+
+    for directory, _, files in os.walk(dist_dir):
+        for name in files:
+            if name.endswith(COMPRESSIBLE):
+                compress(os.path.join(directory, name))
+
+    manifest = {original: hashed for original, hashed in urls.items() if not original.startswith("..")}
+    with open(os.path.join(dist_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+class CompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves a file's .br/.gz copy when the client accepts it, with cache headers."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        full_path = str(full_path)
+        accepted = Headers(scope=scope).get("accept-encoding", "")
+        encoding = None
+        for name, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if name in accepted and os.path.isfile(full_path + suffix):
+                encoding = name
+                response = super().file_response(full_path + suffix, os.stat(full_path + suffix), scope, status_code)
+                break
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+            response.headers["content-type"] = guess_type(full_path)[0] or "text/plain"
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE if HASHED_NAME.search(full_path) else "no-cache"
+        return response
+
+def mount_static(app, dist_dir=DIST_DIR, source_dir=SOURCE_DIR):
+    """Serve dist_dir if it has been built, else the sources in source_dir as they are."""
+    if os.path.exists(os.path.join(dist_dir, "manifest.json")):
+        for name in ("python", "css", "images"):
+            app.mount(f"/{name}", CompressedStaticFiles(directory=os.path.join(dist_dir, name)), name=name)
+        app.mount("/", CompressedStaticFiles(directory=os.path.join(dist_dir, "html"), html=True), name="html")
+        return
+    for name in ("python", "css", "images"):
+        app.mount(f"/{name}", StaticFiles(directory=os.path.join(source_dir, name)), name=name)
+    app.mount("/", StaticFiles(directory=os.path.join(source_dir, "html"), html=True), name="html")
+
+if __name__ == "__main__":
+    manifest = build()
+    total = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(DIST_DIR) for f in fs)
+    print(f"Built {len(manifest)} assets into {DIST_DIR}/ ({total / 1024:.0f} KiB with compressed copies)"
+          + ("" if brotli else "; pip install brotli for .br copies"))
@@ -2,17 +2,16 @@ from browser import document, ajax, html, timer
 import json
 from typing import Union, List, Optional, Tuple, Dict, Any
 from shared import (
-    BOARD_SIZE, CELL_SIZE, PIECE_PADDING,
-    PLAYER_0, PLAYER_1,
-    KITTEN, CAT,
+    BOARD_SIZE, CAT,
     ACTION_PLACE, ACTION_REMOVE,
     GameImages, APIEndpoints,
     GameErrors, GameMessages,
     get_coordinate_notation, is_valid_position,
-    deep_copy_board, get_player_piece_type,
     get_grid_position, create_piece_image
 )
 from menu import RulesModal
+from render import BoardRenderer
+from boop_rules import Position  # served by api_server from the repo root
 
 class GameBoard:
     def __init__(self):
@@ -23,124 +22,15 @@ class GameBoard:
         self.images = GameImages()
         self.api = APIEndpoints(document['server-url'].value)
         self.hover_cell = None
+        self.renderer = BoardRenderer(self.images)
+        self.move_pending = False  # a predicted move is waiting for the server
         self.is_paused = False
         self.pause_btn = document["pause-btn"]
         self.pause_btn.bind("click", self.toggle_pause)
 
-    def check_three_in_a_row(self, board: List[List[Any]], player: int) -> Optional[List[Tuple[int, int]]]:
-        """Check for three kittens in a row that should be promoted"""
-        def is_player_kitten(piece: List[int]) -> bool:
-            """Helper function to check if a piece is a kitten belonging to the player"""
-            return (piece is not None and 
-                    ((player == PLAYER_0 and piece[0] == 1) or 
-                     (player == PLAYER_1 and piece[1] == 1)) and
-                    piece[2] == KITTEN)
-        
-        # Check horizontal lines
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE - 2):
-                if (is_player_kitten(board[row][col]) and
-                    is_player_kitten(board[row][col + 1]) and
-                    is_player_kitten(board[row][col + 2])):
-                    return [(row, col), (row, col + 1), (row, col + 2)]
-
-        # Check vertical lines
-        for row in range(BOARD_SIZE - 2):
-            for col in range(BOARD_SIZE):
-                if (is_player_kitten(board[row][col]) and
-                    is_player_kitten(board[row + 1][col]) and
-                    is_player_kitten(board[row + 2][col])):
-                    return [(row, col), (row + 1, col), (row + 2, col)]
-
-        # Check diagonal (top-left to bottom-right)
-        for row in range(BOARD_SIZE - 2):
-            for col in range(BOARD_SIZE - 2):
-                if (is_player_kitten(board[row][col]) and
-                    is_player_kitten(board[row + 1][col + 1]) and
-                    is_player_kitten(board[row + 2][col + 2])):
-                    return [(row, col), (row + 1, col + 1), (row + 2, col + 2)]
-
-        # Check diagonal (top-right to bottom-left)
-        for row in range(BOARD_SIZE - 2):
-            for col in range(2, BOARD_SIZE):
-                if (is_player_kitten(board[row][col]) and
-                    is_player_kitten(board[row + 1][col - 1]) and
-                    is_player_kitten(board[row + 2][col - 2])):
-                    return [(row, col), (row + 1, col - 1), (row + 2, col - 2)]
-
-        return None
-
-    def track_boops(self, row: int, col: int, board_before: List[List[Any]], board_after: List[List[Any]]) -> List[Dict[str, Any]]:
-        """Track pieces that were booped by comparing board states"""
-        booped_pieces = []
-        
-        # Check all adjacent positions (including diagonals)
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                    
-                r, c = row + dr, col + dc
-                if is_valid_position(r, c):
-                    # Check if there was actually a piece here before
-                    piece_before = board_before[r][c]
-                    if piece_before is None or (piece_before[0] == 0 and piece_before[1] == 0):
-                        continue  # No piece was here before
-                    
-                    piece_after = board_after[r][c]
-                    # Only track if the piece actually moved
-                    if piece_before != piece_after:
-                        new_r, new_c = r + dr, c + dc
-                        player, is_cat = get_player_piece_type(piece_before)
-                        
-                        # Check if piece was booped off the board
-                        if not is_valid_position(new_r, new_c):
-                            booped_pieces.append({
-                                'from_pos': (r, c),
-                                'to_pos': None,
-                                'piece_type': 'Cat' if is_cat else 'Kitten',
-                                'player': player
-                            })
-                        else:
-                            # Check if piece moved to the expected position
-                            piece_at_new_pos = board_after[new_r][new_c]
-                            if (piece_at_new_pos is not None and 
-                                ((piece_before[0] == 1 and piece_at_new_pos[0] == 1) or 
-                                 (piece_before[1] == 1 and piece_at_new_pos[1] == 1))):
-                                booped_pieces.append({
-                                    'from_pos': (r, c),
-                                    'to_pos': (new_r, new_c),
-                                    'piece_type': 'Cat' if is_cat else 'Kitten',
-                                    'player': player
-                                })
-        
-        return booped_pieces
-
-    def track_promotions(self, board_before: List[List[Any]], board_after: List[List[Any]], current_player: int) -> Optional[List[Tuple[int, int]]]:
-        """Track kitten promotions"""
-        promotions = self.check_three_in_a_row(board_after, current_player)
-        
-        if promotions:
-            # Verify these positions changed from kittens to cats or empty
-            all_promoted = True
-            for row, col in promotions:
-                piece_before = board_before[row][col]
-                piece_after = board_after[row][col]
-                
-                # Check if the piece was a kitten before and is now either gone or a cat
-                if not (piece_before is not None and piece_before[2] == KITTEN and  # was a kitten
-                       (piece_after is None or piece_after[2] == CAT)):  # is now gone or a cat
-                    all_promoted = False
-                    break
-            
-            if all_promoted:
-                return promotions
-        
-        return None
-
     def add_move_to_log(self, player: int, action_type: int, row: int, col: int, 
-                        piece_type: int, board_before: List[List[Any]], board_after: List[List[Any]]) -> None:
-        """Add a move to the move log with proper formatting"""
+                        piece_type: int, effects: Dict[str, Any]) -> None:
+        """Add a move to the move log, with the boops and promotions the server reported"""
         self.move_count += 1
         
         # Create move entry
@@ -163,28 +53,23 @@ class GameBoard:
         effects_container = html.DIV(Class="move-effects")
         effects_added = False
         
-        # Track and add boop effects
-        if action_type == ACTION_PLACE:
-            booped_pieces = self.track_boops(row, col, board_before, board_after)
-            if booped_pieces:
-                effects_added = True
-                for piece in booped_pieces:
-                    from_coord = get_coordinate_notation(*piece['from_pos'])
-                    effect_text = f"→ {piece['piece_type']} at {from_coord} "
-                    if piece['to_pos'] is None:
-                        effect_text += "was booped off the board"
-                    else:
-                        to_coord = get_coordinate_notation(*piece['to_pos'])
-                        effect_text += f"was booped to {to_coord}"
-                    
-                    effect = html.DIV(
-                        effect_text, 
-                        Class=f"special-move boop player-{piece['player']}-boop"
-                    )
-                    effects_container <= effect
+        # Add boop effects
+        for boop in effects["boops"]:
+            effects_added = True
+            from_coord = get_coordinate_notation(*boop['from'])
+            effect_text = f"→ {'Cat' if boop['cat'] else 'Kitten'} at {from_coord} "
+            if boop['to'] is None:
+                effect_text += "was booped off the board"
+            else:
+                effect_text += f"was booped to {get_coordinate_notation(*boop['to'])}"
+            effect = html.DIV(
+                effect_text, 
+                Class=f"special-move boop player-{boop['player']}-boop"
+            )
+            effects_container <= effect
         
-        # Track and add promotion effects
-        promotions = self.track_promotions(board_before, board_after, player)
+        # Add promotion effects
+        promotions = effects["promotions"]
         if promotions:
             effects_added = True
             promotion_coords = [get_coordinate_notation(r, c) for r, c in promotions]
@@ -228,61 +113,26 @@ class GameBoard:
                 cat_span = document[f"p{player}-cats"]
                 cat_span.text = str(stock['cat'])
 
-    def render_board(self) -> None:
-        """Render the game board"""
-        canvas = document["game-canvas"]
-        ctx = canvas.getContext("2d")
-        
-        # Clear canvas
-        ctx.clearRect(0, 0, canvas.width, canvas.height)
-        
-        # Draw grid
-        ctx.strokeStyle = "#000"
-        ctx.lineWidth = 1
-        for i in range(BOARD_SIZE + 1):
-            # Vertical lines
-            ctx.beginPath()
-            ctx.moveTo(i * CELL_SIZE, 0)
-            ctx.lineTo(i * CELL_SIZE, BOARD_SIZE * CELL_SIZE)
-            ctx.stroke()
-            
-            # Horizontal lines
-            ctx.beginPath()
-            ctx.moveTo(0, i * CELL_SIZE)
-            ctx.lineTo(BOARD_SIZE * CELL_SIZE, i * CELL_SIZE)
-            ctx.stroke()
-        
-        # Draw hover effect
-        if self.hover_cell is not None:
-            row, col = self.hover_cell
-            ctx.fillStyle = "rgba(200, 200, 200, 0.5)"
-            ctx.fillRect(col * CELL_SIZE, row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-        
-        # Draw pieces
+    def render_board(self, cells: Optional[List[Tuple[int, int]]] = None) -> None:
+        """Render the game board, checking only cells if given (all cells otherwise)"""
         if 'board' in self.state:
-            board = self.state['board']
-            for row in range(BOARD_SIZE):
-                for col in range(BOARD_SIZE):
-                    piece = board[row][col]
-                    if piece is not None and (piece[0] == 1 or piece[1] == 1):
-                        # Determine which player's piece it is
-                        player = PLAYER_0 if piece[0] == 1 else PLAYER_1
-                        # Determine if it's a cat or kitten
-                        is_cat = piece[2] == CAT
-                        
-                        # Get the correct image
-                        img_key = f"{'cat' if is_cat else 'kitten'}_{'a' if player == PLAYER_0 else 'b'}"
-                        img = self.images.images[img_key]
-                        
-                        # Draw the image
-                        x = col * CELL_SIZE + PIECE_PADDING
-                        y = row * CELL_SIZE + PIECE_PADDING
-                        size = CELL_SIZE - 2 * PIECE_PADDING
-                        ctx.drawImage(img, x, y, size, size)
+            self.renderer.update(self.state['board'], cells)
         
         # Update inventory display
         self.update_inventory_display()
 
+    def apply_response(self, response: Dict[str, Any], predicted: bool = False) -> None:
+        """Take the state from a move response and repaint the cells listed in its delta
+
+        After a predicted move the screen no longer shows the old state, so every cell is checked
+        """
+        self.state = response["state"]
+        delta = response.get("delta")
+        cells = None if delta is None or predicted else [(row, col) for row, col, _ in delta]
+        self.render_board(cells)
+        if cells:
+            self.renderer.flash(cells)
+
     def handle_start_response(self, req: ajax.Ajax) -> None:
         """Handle the response from starting a new game"""
         try:
@@ -308,8 +158,7 @@ class GameBoard:
         """Handle the response from making a move"""
         try:
             response = json.loads(req.text)
-            self.state = response["state"]
-            self.render_board()
+            self.apply_response(response)
             
             if response.get("game_over", False):
                 self.game_id = None
@@ -350,7 +199,8 @@ class GameBoard:
         req.bind('complete', self.handle_start_response)
         req.open('POST', self.api.new_game, True)
         req.set_header('content-type', 'application/json')
-        req.send(json.dumps({"players": [p0_type, p1_type]}))
+        req.send(json.dumps({"players": [p0_type, p1_type], "difficulty": document["ai-difficulty"].value,
+                             "version": document["model-version"].value or None}))
 
     def send_move(self, ev: Any) -> None:
         """Send a move to the server"""
@@ -375,42 +225,50 @@ class GameBoard:
             
         # Get the selected piece type
         piece_type = int(document["piece-type"].value)
+        action = (ACTION_PLACE, row, col, piece_type)
         
-        # Store board state before move
-        board_before = deep_copy_board(self.state['board'])
+        # Check the move locally and show its outcome before the server confirms it
+        if self.move_pending:
+            return
+        position = Position.from_state(self.state)
+        if not position.is_legal(action):
+            self.update_turn_status(GameErrors.INVALID_MOVE)
+            return
+        predicted, effects = position.play(action)
+        self.renderer.flash(self.renderer.update(predicted.to_board()))
+        self.move_pending = True
         
         # Send move to server
         req = ajax.Ajax()
-        req.bind('complete', lambda req: self.handle_move_complete(req, ACTION_PLACE, row, col, piece_type, board_before))
+        req.bind('complete', lambda req: self.handle_move_complete(req, ACTION_PLACE, row, col, piece_type))
         req.open('POST', self.api.make_move, True)
         req.set_header('content-type', 'application/json')
         req.send(json.dumps({
             "game_id": self.game_id,
-            "action": [ACTION_PLACE, row, col, piece_type]
+            "action": list(action)
         }))
         
 
     def handle_move_complete(self, req: ajax.Ajax, action_type: int, row: int, col: int, 
-                           piece_type: int, board_before: List[List[Any]]) -> None:
+                           piece_type: int) -> None:
         """Handle completion of a move, including updating the move log"""
+        self.move_pending = False
         try:
             response = json.loads(req.text)
             
-            if not response.get("game_over", False):
-                # Add move to log
+            # The server's effects are authoritative; none means it rejected the move
+            if response.get("effects") is not None:
                 self.add_move_to_log(
                     self.state['current_player'],
                     action_type,
                     row,
                     col,
                     piece_type,
-                    board_before,
-                    response['state']['board']
+                    response["effects"]
                 )
             
-            # Update game state
-            self.state = response["state"]
-            self.render_board()
+            # Update game state, correcting the prediction if the server disagrees
+            self.apply_response(response, predicted=True)
             
             # Update turn status based on current player type
             if response.get("game_over", False):
@@ -451,7 +309,7 @@ class GameBoard:
             response = json.loads(req.text)
             
             # Log the AI move if move details are provided
-            if "ai_move" in response:
+            if "ai_move" in response and response.get("effects") is not None:
                 move = response["ai_move"]
                 self.add_move_to_log(
                     self.state['current_player'],  # Current player before state update
@@ -459,13 +317,11 @@ class GameBoard:
                     move["row"],
                     move["col"],
                     move["piece_type"],
-                    move["board_before"],
-                    response["state"]["board"]
+                    response["effects"]
                 )
             
             # Update game state
-            self.state = response["state"]
-            self.render_board()
+            self.apply_response(response)
             
             if response.get("game_over", False):
                 self.game_id = None
@@ -500,18 +356,15 @@ class GameBoard:
         # Convert to grid position
         row, col = get_grid_position(x, y)
         
-        # Update hover state and redraw
+        # Update hover state; only the old and new cells are repainted
         if is_valid_position(row, col):
             coord = get_coordinate_notation(row, col)
             document["position-status"].text = f"Position: {coord}"
-            if self.hover_cell != (row, col):
-                self.hover_cell = (row, col)
-                self.render_board()
+            self.hover_cell = (row, col)
         else:
             document["position-status"].text = "Position: --"
-            if self.hover_cell is not None:
-                self.hover_cell = None
-                self.render_board()
+            self.hover_cell = None
+        self.renderer.set_hover(self.hover_cell)
 
     def update_turn_status(self, message: str) -> None:
         """Update the turn status display"""
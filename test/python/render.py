@@ -0,0 +1,113 @@
+from browser import document, timer
+from typing import Any, Iterable, List, Optional, Tuple
+from shared import BOARD_SIZE, CELL_SIZE, PIECE_PADDING, CAT
+
+HOVER_COLOR = "rgba(200, 200, 200, 0.5)"
+BOOP_COLOR = "rgba(255, 200, 0, 0.35)"
+FLASH_MS = 400
+
+def piece_key(piece: Any) -> Optional[str]:
+    """Image key for one cell of state["board"] ([p0, p1, is_cat, ...]), or None if it is empty"""
+    if piece is None or not (piece[0] == 1 or piece[1] == 1):
+        return None
+    kind = "cat" if piece[2] == CAT else "kitten"
+    return f"{kind}_{'a' if piece[0] == 1 else 'b'}"
+
+class BoardRenderer:
+    """Draws the board on three stacked canvases so that most updates touch only a few cells
+
+    board-layer: the grid, drawn once
+    piece-layer: piece images, repainted per cell when the piece on it changes
+    game-canvas: hover and boop highlights on top (also receives the mouse events)
+    """
+
+    def __init__(self, images: Any):
+        self.images = images
+        self.piece_ctx = document["piece-layer"].getContext("2d")
+        self.overlay_ctx = document["game-canvas"].getContext("2d")
+        self.board: List[List[Any]] = []
+        self.drawn: List[List[Optional[str]]] = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        self.hover_cell: Optional[Tuple[int, int]] = None
+        self.flashing: set = set()
+        self.draw_grid()
+        # Images that finish loading after a piece was drawn would leave a blank cell
+        for img in images.images.values():
+            img.addEventListener("load", lambda ev: self.redraw_all())
+
+    def draw_grid(self) -> None:
+        """Draw the static board layer"""
+        ctx = document["board-layer"].getContext("2d")
+        ctx.strokeStyle = "#000"
+        ctx.lineWidth = 1
+        for i in range(BOARD_SIZE + 1):
+            ctx.beginPath()
+            ctx.moveTo(i * CELL_SIZE, 0)
+            ctx.lineTo(i * CELL_SIZE, BOARD_SIZE * CELL_SIZE)
+            ctx.stroke()
+            ctx.beginPath()
+            ctx.moveTo(0, i * CELL_SIZE)
+            ctx.lineTo(BOARD_SIZE * CELL_SIZE, i * CELL_SIZE)
+            ctx.stroke()
+
+    def update(self, board: List[List[Any]], cells: Optional[Iterable[Tuple[int, int]]] = None,
+               force: bool = False) -> List[Tuple[int, int]]:
+        """Repaint the cells whose piece changed; cells limits the check (e.g. to a server delta)
+
+        Returns:
+            list: the cells that were repainted
+        """
+        self.board = board
+        if cells is None:
+            cells = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)]
+        repainted = []
+        for row, col in cells:
+            key = piece_key(board[row][col])
+            if key == self.drawn[row][col] and not force:
+                continue
+            self.paint_piece(row, col, key)
+            repainted.append((row, col))
+        return repainted
+
+    def redraw_all(self) -> None:
+        if self.board:
+            self.update(self.board, force=True)
+
+    def paint_piece(self, row: int, col: int, key: Optional[str]) -> None:
+        x, y = col * CELL_SIZE, row * CELL_SIZE
+        self.piece_ctx.clearRect(x, y, CELL_SIZE, CELL_SIZE)
+        if key is not None:
+            size = CELL_SIZE - 2 * PIECE_PADDING
+            self.piece_ctx.drawImage(self.images.images[key], x + PIECE_PADDING, y + PIECE_PADDING, size, size)
+        self.drawn[row][col] = key
+
+    def paint_overlay(self, cell: Tuple[int, int]) -> None:
+        """Repaint one overlay cell from the current hover and flash state"""
+        row, col = cell
+        x, y = col * CELL_SIZE, row * CELL_SIZE
+        self.overlay_ctx.clearRect(x, y, CELL_SIZE, CELL_SIZE)
+        for active, color in ((cell in self.flashing, BOOP_COLOR), (cell == self.hover_cell, HOVER_COLOR)):
+            if active:
+                self.overlay_ctx.fillStyle = color
+                self.overlay_ctx.fillRect(x, y, CELL_SIZE, CELL_SIZE)
+
+    def set_hover(self, cell: Optional[Tuple[int, int]]) -> None:
+        if cell == self.hover_cell:
+            return
+        previous, self.hover_cell = self.hover_cell, cell
+        if previous is not None:
+            self.paint_overlay(previous)
+        if cell is not None:
+            self.paint_overlay(cell)
+
+    def flash(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Briefly highlight cells (pieces that were booped, placed or promoted)"""
+        cells = [tuple(cell) for cell in cells]
+        for cell in cells:
+            self.flashing.add(cell)
+            self.paint_overlay(cell)
+
+        def clear() -> None:
+            for cell in cells:
+                self.flashing.discard(cell)
+                self.paint_overlay(cell)
+        timer.set_timeout(clear, FLASH_MS)
@@ -2,14 +2,20 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from tictactoe_table import WINNER, TablePlayer, index
 
 class TicTacToeEnv(gym.Env):
     metadata = {"render_modes": ["human"]}
 
-    def __init__(self):
+    def __init__(self, opponent_epsilon=None):
+        # opponent_epsilon: None keeps the uniformly random opponent; a number plays perfectly
+        # except for that fraction of random moves (0.0 cannot be beaten)
         super().__init__()
         self.observation_space = spaces.Box(low=0, high=2, shape=(9,), dtype=np.int8)
         self.action_space = spaces.Discrete(9)
+        self.opponent = None if opponent_epsilon is None else TablePlayer(opponent_epsilon)
         self.reset()
 
     def reset(self, seed=None, options=None):
@@ -30,10 +36,13 @@ class TicTacToeEnv(gym.Env):
         if 0 not in self.board:
             return self.board.copy(), 0.5, True, False, {}
 
-        # Opponent move (random)
+        # Opponent move
         available = np.where(self.board == 0)[0]
         if len(available) > 0:
-            opponent_action = np.random.choice(available)
+            if self.opponent is None:
+                opponent_action = np.random.choice(available)
+            else:
+                opponent_action = self.opponent.choose(self.board[None])[0]
             self.board[opponent_action] = 2
             if self.check_winner(2):
                 return self.board.copy(), -1.0, True, False, {}
@@ -44,13 +53,134 @@ class TicTacToeEnv(gym.Env):
         return self.board.copy(), 0.0, False, False, {}
 
     def check_winner(self, player):
-        b = self.board.reshape((3, 3))
-        return any(
-            np.all(b[i, :] == player) or
-            np.all(b[:, i] == player) for i in range(3)
-        ) or np.all(np.diag(b) == player) or np.all(np.diag(np.fliplr(b)) == player)
+        return WINNER[index(self.board)] == player
 
     def render(self):
         symbols = {0: '.', 1: 'X', 2: 'O'}
         print("\n".join(" ".join(symbols[c] for c in self.board[i*3:(i+1)*3]) for i in range(3)))
         print()
+
+class TicTacToeGame:
+    """Two-sided tic-tac-toe with the BoopEnv methods api_server uses (get_state, legal_actions, step...).
+
+    Actions are 1-tuples (cell,). Models see the board from the side to move: 1 own, 2 opponent's.
+    """
+
+    def __init__(self):
+        self.observation_space = spaces.Box(low=0, high=2, shape=(9,), dtype=np.int8)
+        self.action_space = spaces.Discrete(9)
+        self.reset()
+
+    def reset(self, *, seed=None, options=None):
+        self.board = np.zeros(9, dtype=np.int8)  # 0=empty, 1=player 0 (X), 2=player 1 (O)
+        self.current_player_num = 0
+        self.done = False
+        return self.observation, {}
+
+    @property
+    def observation(self):
+        if self.current_player_num == 0:
+            return self.board.copy()
+        return np.where(self.board > 0, 3 - self.board, 0).astype(np.int8)
+
+    def observation_as(self, shape):
+        return self.observation
+
+    def get_state(self):
+        return {
+            "board": self.board.reshape(3, 3).tolist(),
+            "current_player": self.current_player_num,
+            "players": []  # filled in by the server
+        }
+
+    def is_legal(self, action):
+        cell = action[0]
+        return not self.done and 0 <= cell < 9 and self.board[cell] == 0
+
+    def legal_actions(self):
+        return [] if self.done else [(int(cell),) for cell in np.flatnonzero(self.board == 0)]
+
+    def legal_action_mask(self):
+        return np.zeros(9, dtype=bool) if self.done else self.board == 0
+
+    def step(self, action):
+        self.board[action[0]] = self.current_player_num + 1
+        if WINNER[index(self.board)]:
+            self.done = True  # the winner stays current_player_num, as in BoopEnv
+            return self.observation, 1.0, True, False, {}
+        if not (self.board == 0).any():
+            self.done = True
+            return self.observation, 0.0, False, True, {"draw": "board_full"}
+        self.current_player_num = 1 - self.current_player_num
+        return self.observation, 0.0, False, False, {}
+
+class BatchTicTacToeEnv(VecEnv):
+    """num_envs TicTacToeEnv games stepped together with array operations; a drop-in SB3 VecEnv.
+
+    Rewards and the opponent match TicTacToeEnv. Finished games restart automatically and
+    report their last board in info["terminal_observation"], as SB3 expects.
+    """
+
+    render_mode = None
+
+    def __init__(self, num_envs=64, opponent_epsilon=None, seed=None):
+        super().__init__(num_envs, spaces.Box(low=0, high=2, shape=(9,), dtype=np.int8), spaces.Discrete(9))
+        # None: uniformly random opponent, i.e. a table player that always explores
+        self.opponent = TablePlayer(1.0 if opponent_epsilon is None else opponent_epsilon, seed=seed)
+        self.boards = np.zeros((num_envs, 9), dtype=np.int8)
+        self.rows = np.arange(num_envs)
+        self.actions = None
+
+    def reset(self):
+        self.boards[:] = 0
+        return self.boards.copy()
+
+    def step_async(self, actions):
+        self.actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        boards, rows = self.boards, self.rows
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        illegal = boards[rows, self.actions] != 0
+        rewards[illegal], dones[illegal] = -1.0, True
+        live = rows[~illegal]
+        boards[live, self.actions[live]] = 1
+        won = WINNER[index(boards[live])] == 1
+        full = ~won & (boards[live] != 0).all(1)
+        rewards[live[won]], rewards[live[full]] = 1.0, 0.5
+        dones[live[won | full]] = True
+
+        live = live[~(won | full)]
+        boards[live, self.opponent.choose(boards[live])] = 2
+        lost = WINNER[index(boards[live])] == 2
+        full = ~lost & (boards[live] != 0).all(1)
+        rewards[live[lost]], rewards[live[full]] = -1.0, 0.5
+        dones[live[lost | full]] = True
+
+        obs = boards.copy()
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = obs[i].copy()
+        boards[dones] = 0
+        obs[dones] = 0
+        return obs, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        # No per-game env objects: like get_attr, the call goes to the one shared object and
+        # its result is reported for every game asked about
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
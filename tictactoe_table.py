@@ -0,0 +1,103 @@
+# Perfect-play tables for tic-tac-toe.
+#
+# A board (9 cells, 0 empty, 1 agent/X, 2 opponent/O as in TicTacToeEnv) is indexed by
+# its base-3 number, so every table is a plain array of 3**9 = 19683 entries and a batch of
+# boards is looked up with one matrix product:
+#
+#   WINNER[i]      0 nobody, 1 or 2 has three in a row
+#   VALUE[i]       minimax value for the side to move: 1 win, 0 draw, -1 loss
+#   BEST[i]        (9,) bool, the moves that keep VALUE
+#   REACHABLE[i]   the position comes up in real games (X moves first)
+#
+# All tables are built at import time, vectorized one layer (piece count) at a time.
+
+import gymnasium as gym
+import numpy as np
+
+POW3 = 3 ** np.arange(9)
+N_STATES = 3 ** 9
+LINES = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8], [0, 3, 6], [1, 4, 7], [2, 5, 8], [0, 4, 8], [2, 4, 6]])
+
+def index(boards):
+    """Table index of one board (9,) or a batch (N, 9)."""
+    return np.asarray(boards, dtype=np.int64) @ POW3
+
+def _build():
+    boards = (np.arange(N_STATES)[:, None] // POW3) % 3
+    lines = boards[:, LINES]
+    x_wins = (lines == 1).all(-1).any(-1)
+    o_wins = (lines == 2).all(-1).any(-1)
+    winner = np.where(x_wins, 1, np.where(o_wins, 2, 0)).astype(np.int8)
+    xs, os_ = (boards == 1).sum(1), (boards == 2).sum(1)
+    mover = np.where(xs == os_, 1, 2)
+    legal_counts = (xs == os_) | (xs == os_ + 1)
+
+    value = np.zeros(N_STATES, dtype=np.int8)
+    best = np.zeros((N_STATES, 9), dtype=bool)
+    pieces = xs + os_
+    for k in range(9, -1, -1):
+        layer = np.flatnonzero(legal_counts & (pieces == k) & ~(x_wins & o_wins))
+        over = (winner[layer] != 0) | (k == 9)
+        # Somebody has three in a row: it was the previous mover, so the side to move lost
+        value[layer[over]] = np.where(winner[layer[over]] != 0, -1, 0)
+        live = layer[~over]
+        if len(live) == 0:
+            continue
+        empty = boards[live] == 0
+        children = live[:, None] + mover[live, None] * POW3
+        child_value = np.where(empty, -value[np.where(empty, children, 0)].astype(np.int64), -2)
+        value[live] = child_value.max(1)
+        best[live] = child_value == value[live, None]
+
+    reachable = np.zeros(N_STATES, dtype=bool)
+    reachable[0] = True
+    for k in range(9):
+        layer = np.flatnonzero(reachable & (pieces == k) & (winner == 0))
+        empty = boards[layer] == 0
+        children = layer[:, None] + mover[layer, None] * POW3
+        reachable[children[empty]] = True
+    return winner, value, best, reachable
+
+WINNER, VALUE, BEST, REACHABLE = _build()
+
+def agent_positions():
+    """Every reachable, unfinished board (N, 9) with the agent (1) to move."""
+    boards = (np.arange(N_STATES)[:, None] // POW3) % 3
+    to_move = (boards == 1).sum(1) == (boards == 2).sum(1)
+    keep = REACHABLE & to_move & (WINNER == 0) & (boards == 0).any(1)
+    return boards[keep].astype(np.int8)
+
+def optimal_move_rate(predictor):
+    """Fraction of agent_positions() where predictor (e.g. a DQN model) plays a perfect move."""
+    boards = agent_positions()
+    actions, _ = predictor.predict(boards, deterministic=True)
+    return float(BEST[index(boards), np.asarray(actions)].mean())
+
+class TablePlayer:
+    """Optimal tic-tac-toe player; with probability epsilon it plays a uniformly random legal move instead."""
+
+    observation_space = gym.spaces.Box(low=0, high=2, shape=(9,), dtype=np.int8)
+
+    def __init__(self, epsilon=0.0, seed=None):
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+
+    def choose(self, boards):
+        """Moves (N,) for a batch of boards (N, 9), each for whichever side is to move.
+
+        Boards may also be seen from the side to move (its pieces as 1, as TicTacToeGame
+        shows them to models); those are recognised by having fewer 1s than 2s.
+        """
+        boards = np.asarray(boards)
+        flipped = ((boards == 1).sum(1) < (boards == 2).sum(1))[:, None]
+        boards = np.where(flipped & (boards > 0), 3 - boards, boards)
+        empty = boards == 0
+        explore = self.rng.random(len(boards)) < self.epsilon
+        allowed = np.where(explore[:, None], empty, BEST[index(boards)])
+        noise = self.rng.random(boards.shape)
+        return np.where(allowed, noise, -1.0).argmax(1)
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=False):
+        obs = np.asarray(obs)
+        actions = self.choose(obs.reshape(-1, 9))
+        return (actions if obs.ndim == 2 else actions[0]), None
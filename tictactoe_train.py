@@ -1,7 +1,7 @@
 import gymnasium as gym
 from stable_baselines3 import DQN
-from stable_baselines3.common.env_util import make_vec_env
-from tictactoe_env import TicTacToeEnv
+from tictactoe_env import TicTacToeEnv, BatchTicTacToeEnv
+from tictactoe_table import optimal_move_rate
 
 # Register custom env (only needed if you want to use gym.make)
 gym.envs.registration.register(
@@ -9,9 +9,14 @@ gym.envs.registration.register(
     entry_point='tictactoe_env:TicTacToeEnv',
 )
 
-env = make_vec_env('TicTacToe-v0', n_envs=1)
+# 8 games per step in plain NumPy against the same uniformly random opponent as TicTacToeEnv;
+# pass opponent_epsilon (e.g. 0.3: perfect play 70% of the time) for a stronger one
+env = BatchTicTacToeEnv(num_envs=8)
 
-model = DQN("MlpPolicy", env, verbose=1, learning_rate=1e-3, buffer_size=10000, exploration_fraction=0.2)
+# Same number of gradient steps per transition as train_freq=4 on a single env
+model = DQN("MlpPolicy", env, verbose=1, learning_rate=1e-3, buffer_size=10000, exploration_fraction=0.2,
+            train_freq=1, gradient_steps=2)
 model.learn(total_timesteps=50000)
 
 model.save("tictactoe_dqn")
+print(f"perfect moves in {optimal_move_rate(model):.1%} of positions")
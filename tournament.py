@@ -6,7 +6,8 @@ from boop_env import BoopEnv
 def play_match(model0, model1, env, verbose=False):
     env.reset()
     done = False
-    while not done:
+    truncated = False
+    while not (done or truncated):
         obs = env.observation
         current = env.current_player_num
 
@@ -27,8 +28,10 @@ def play_match(model0, model1, env, verbose=False):
         if verbose:
             print(f"Player {current} moved. Reward: {reward}, Done: {done}")
 
-    winner = None
-    if reward == 1:
+    winner = None  # stays None for a draw (game truncated by BoopEnv)
+    if truncated:
+        pass
+    elif reward == 1:
         winner = env.current_player_num
     elif reward == -1:
         winner = 1 - env.current_player_num
@@ -48,6 +51,9 @@ for i in range(len(models)):
             print(f"Match: model_{i} vs model_{j} → Winner: {winner}")
             if winner == 0:
                 wins[f'model_{i}'] += 1
-            else:
+            elif winner == 1:
                 wins[f'model_{j}'] += 1
+            else:
+                wins[f'model_{i}'] += 0.5
+                wins[f'model_{j}'] += 0.5
 print(wins)
\ No newline at end of file